@@ -97,6 +97,10 @@ _internal_dir = os.path.join(cur_dir, '_internal')
 _db_dir = os.path.join(_internal_dir, 'chromadb')
 _benchmarks_dir = os.path.join(_internal_dir, 'benchmarks')
 _log_path = os.path.join(_internal_dir, "chromadb.log")
+_embedding_cache_path = os.path.join(_internal_dir, "embeddings.sqlite3")
+_lexical_index_path = os.path.join(_internal_dir, "bm25.pkl")
+_conversation_log_path = os.path.join(_internal_dir, "conversation.sqlite3")
+_response_cache_path = os.path.join(_internal_dir, "responses.sqlite3")
 
 os.chdir(cur_dir)
 try:
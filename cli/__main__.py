@@ -65,15 +65,34 @@ def main_loop(user_data: SetupData) -> None:
             break
         
         s = time.time()
-        clean_results = search_engine.search_collection(
-            user_input
+        context = dbm.query_context(user_input)
+        query_data = QueryData(user_input, None, context=context)
+        gpt_response = GPTQuery(
+            dbm, 
+            query_data, 
+            config, 
+            user_data["schema_file"], 
+            instant_request=not config.response.stream, 
+            search_engine=search_engine
         )
-        query_data = QueryData(user_input, clean_results)
-        gpt_response = GPTQuery(dbm, query_data, config, user_data["schema_file"], instant_request=True)
-        print(gpt_response.response)
+        if config.response.stream:
+            for delta in gpt_response.stream_response():
+                print(delta, end="", flush=True)
+            print()
+        else:
+            print(gpt_response.response)
         if DEBUG:
             # gpt_response.save_debug()
             print_debug(query_data, start_time=s, end_time=time.time())
+            print(f"{Fore.CYAN}[DEBUG] Timings: {gpt_response.timings}{CLEAR_STYLING}")
+            if gpt_response.cached:
+                print(f"{Fore.CYAN}[DEBUG] Response from cache ({gpt_response.timings['cache']:.1f} ms){CLEAR_STYLING}")
+            print(f"{Fore.CYAN}[DEBUG] Static prompt prefix: {gpt_response.template.prefix_tokens} tokens, cached by OpenAI: {gpt_response.usage.get('cached_tokens', 0)} tokens{CLEAR_STYLING}")
+            if gpt_response.tokens_per_second:
+                print(f"{Fore.CYAN}[DEBUG] Tokens per second: {gpt_response.tokens_per_second:.1f}{CLEAR_STYLING}")
+            print(f"{Fore.CYAN}[DEBUG] Memories left to compress: {dbm.chat_history.compression_queue_depth}{CLEAR_STYLING}")
+            if gpt_response.packed:
+                print(f"{Fore.CYAN}[DEBUG] Context: {gpt_response.packed.report()}{CLEAR_STYLING}")
 
 
 if __name__ == "__main__":
@@ -124,4 +143,11 @@ if __name__ == "__main__":
 
     log = logger.get_logger()
     print(f"Full log: {Fore.YELLOW}{os.path.realpath(logger._log_path)}{Fore.RESET}")
-    main_loop(data)
\ No newline at end of file
+    main_loop(data)
+    
+    if dbm.chat_history.compression_queue_depth:
+        ProgressMessage(
+            message="Compressing memories",
+            timeout=0.5
+        )
+    dbm.chat_history.flush()
\ No newline at end of file
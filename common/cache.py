@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import (
+    Any,
+    Hashable,
+    Optional
+)
+
+
+class LRUCache:
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl: Optional[float] = None
+    ) -> None:
+        """__init__ Initialises LRUCache
+
+        A small thread-safe in-memory cache which evicts the least
+        recently used entry once it holds `max_size` entries.
+        Entries older than `ttl` seconds are treated as missing.
+
+        Args:
+            max_size (int, optional): Max amount of entries. Defaults to 256.
+            ttl (Optional[float], optional): Time to live in seconds. Defaults to None (forever).
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """get Returns a cached value
+
+        Args:
+            key (Hashable): Key of the entry
+
+        Returns:
+            Optional[Any]: Cached value or None if missing/expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (self.ttl is None or time.monotonic() - entry[0] <= self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """set Caches a value
+
+        Args:
+            key (Hashable): Key of the entry
+            value (Any): Value to cache
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def expire(self) -> int:
+        """expire Removes expired entries
+
+        Entries are checked from the least recently set one
+        and it stops at the first entry that isn't expired yet.
+
+        Returns:
+            int: Amount of removed entries
+        """
+        if self.ttl is None:
+            return 0
+
+        removed = 0
+        now = time.monotonic()
+        with self._lock:
+            while self._entries:
+                key, (timestamp, _) = next(iter(self._entries.items()))
+                if now - timestamp <= self.ttl:
+                    break
+                del self._entries[key]
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        """stats Returns cache statistics
+
+        Returns:
+            dict: Hits, misses, hit rate and amount of entries
+        """
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'entries': len(self._entries)
+        }
@@ -4,15 +4,16 @@ from dataclasses import (
     field,
 )
 from typing import (
+    Optional,
     Union,
     List,
     TypedDict,
     TYPE_CHECKING
 )
-from chromadb.api.types import QueryResult
 
 if TYPE_CHECKING:
-    pass
+    from Athena.core.results import ResultSet
+    from Athena.core.context import QueryContext
 
 
 # Information from https://platform.openai.com/docs/models/compare (last access: 18-08-2025)
@@ -30,6 +31,15 @@ class TextParsings(Enum):
     BY_NEWLINE  = "by_newline"      # Split by newlines
     BY_CHUNK    = "by_chunk"        # Split by chunks
 
+class EmbeddingBackends(Enum):
+    OPENAI      = "openai"          # OpenAI embedding API (needs network)
+    ONNX        = "onnx"            # Local sentence embedding model using onnxruntime
+
+class ShorteningStrategies(Enum):
+    LLM         = "llm"             # Shorten with another OpenAI request
+    EXTRACTIVE  = "extractive"      # Keep the most representative sentences (local, TF-IDF)
+    TRUNCATE    = "truncate"        # Keep the last n characters
+
 @dataclass
 class ResponseConfig:
     model: str              = Models.BALANCED.value
@@ -37,6 +47,7 @@ class ResponseConfig:
     max_output_tokens: int  = 1024
     top_p: float            = 1
     store: bool             = True
+    stream: bool            = True
 
 
 class OutputHeaders:
@@ -80,15 +91,20 @@ class InputTypes(Enum):
     AUTO    = "auto"
     PLAIN   = "txt"
     JSON    = "json"
+    JSONL   = "jsonl"
     MD      = "md"
     PDF     = "pdf"
 
 
+DEFAULT_SESSION = "default"      # session of single-user programs like the CLI
+
 class QueryData:
-    def __init__(self, query: str, data: Union[dict, QueryResult], rsp: Union[str, dict, None] = None) -> None:
+    def __init__(self, query: str, data: Optional['ResultSet'], rsp: Union[str, dict, None] = None, context: Optional['QueryContext'] = None, session_id: str = DEFAULT_SESSION) -> None:
         self.result = data
         self.query = query
         self.rsp = rsp
+        self.context = context
+        self.session_id = session_id
 
 
 @dataclass
@@ -0,0 +1,357 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Union
+)
+
+from Athena.core.config import Config
+from Athena.core.context import QueryContext
+from Athena.core.db import DBManager
+from Athena.core.gpt import GPTQuery
+from Athena.core.results import ResultSet
+from Athena.core.search import SearchEngine
+from Athena.common.logger import (
+    log_event,
+    get_logger
+)
+from Athena.common.types import QueryData
+
+log = get_logger()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def get_executor(config: Config) -> ThreadPoolExecutor:
+    """get_executor Returns the executor for blocking calls
+
+    ChromaDB (and the embedding function) only have blocking APIs,
+    so the async pipeline runs them on one small shared thread pool.
+    The amount of threads stays at `async_workers` no matter how
+    many questions are in flight.
+
+    Args:
+        config (Config): Configuration
+
+    Returns:
+        ThreadPoolExecutor: Shared executor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.async_workers, thread_name_prefix="athena-async")
+        return _executor
+
+
+async def run_blocking(
+    config: Config,
+    func: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any
+) -> Any:
+    """run_blocking Runs a blocking function on the shared executor
+
+    Args:
+        config (Config): Configuration
+        func (Callable[..., Any]): Blocking function
+
+    Returns:
+        Any: Return value of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(config), partial(func, *args, **kwargs))
+
+
+class AsyncRateLimiter:
+    def __init__(self, requests_per_minute: float) -> None:
+        """__init__ Initialises AsyncRateLimiter
+
+        Token bucket which is shared by every request of an event loop.
+        It allows short bursts (up to a second worth of requests) but
+        never more than `requests_per_minute` on average.
+
+        Args:
+            requests_per_minute (float): Max requests per minute, 0 = unlimited
+        """
+        self.rate = requests_per_minute / 60
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """acquire Waits until another request is allowed"""
+        if not self.rate:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                # waiting inside the lock keeps the requests in order
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+class AsyncSearchEngine:
+    def __init__(self, search_engine: SearchEngine) -> None:
+        """__init__ Initialises AsyncSearchEngine
+
+        Async counterpart of the SearchEngine. Every search runs on
+        the shared executor (see get_executor()) so the event loop
+        never blocks. Results, cache and settings are the same as the
+        ones of the wrapped SearchEngine.
+
+        Args:
+            search_engine (SearchEngine): Search engine to wrap
+        """
+        self.search_engine = search_engine
+        self.config = search_engine.config
+
+    async def search_batch(
+        self,
+        queries: List[str],
+        strict_search: Optional[str] = None,
+        filter_key: Union[dict, List[dict], None] = None,
+        contexts: Optional[List[QueryContext]] = None
+    ) -> List[ResultSet]:
+        """search_batch Searches collection for several queries
+
+        See SearchEngine.search_batch().
+
+        Returns:
+            List[ResultSet]: Search results (same order as queries)
+        """
+        return await run_blocking(
+            self.config,
+            self.search_engine.search_batch,
+            queries,
+            strict_search=strict_search,
+            filter_key=filter_key,
+            contexts=contexts
+        )
+
+    async def search_collection(
+        self,
+        *query: str,
+        strict_search: Optional[str] = None,
+        filter_key: Union[dict, List[dict], None] = None,
+        context: Optional[QueryContext] = None
+    ) -> ResultSet:
+        """search_collection Searches collection
+
+        See SearchEngine.search_collection().
+
+        Returns:
+            ResultSet: Search results
+        """
+        return await run_blocking(
+            self.config,
+            self.search_engine.search_collection,
+            *query,
+            strict_search=strict_search,
+            filter_key=filter_key,
+            context=context
+        )
+
+
+class AsyncGPTQuery(GPTQuery):
+    def __init__(
+        self,
+        db: DBManager,
+        data: QueryData,
+        config: Config,
+        schema_path: Optional[str] = None,
+        search_engine: Optional[AsyncSearchEngine] = None,
+        session_id: Optional[str] = None,
+        rate_limiter: Optional[AsyncRateLimiter] = None
+    ) -> None:
+        """__init__ Initialises AsyncGPTQuery
+
+        Async counterpart of GPTQuery. The retrieval legs run
+        concurrently on the shared executor and the request goes
+        through the async OpenAI client, so a single event loop can
+        handle lots of questions at once.
+
+        Cancelling new_response() or stream_response() before the
+        response arrived stops the request and nothing gets added to
+        the memories. After that, caching and saving the response
+        can't be cancelled anymore (see _afinish()), so a cancelled
+        call may still add its (complete) turn to the memories, but
+        never half of it.
+
+        Args:
+            db (DBManager): DBManager for past memories
+            data (QueryData): User input and database results
+            config (Config): Configuration
+            schema_path (Optional[str], optional): Path to JSON schema. Defaults to None.
+            search_engine (Optional[AsyncSearchEngine], optional): Searches VData if data has no results. Defaults to None.
+            session_id (Optional[str], optional): Session of the conversation, replaces data.session_id. Defaults to None.
+            rate_limiter (Optional[AsyncRateLimiter], optional): Limits the requests to OpenAI. Defaults to None.
+        """
+        self.rate_limiter = rate_limiter
+        super().__init__(
+            db,
+            data,
+            config,
+            schema_path,
+            instant_request=False,
+            search_engine=search_engine.search_engine if search_engine else None,
+            session_id=session_id
+        )
+
+    async def _atimed(
+        self,
+        leg: str,
+        func: Callable[..., Any],
+        *args: Any
+    ) -> Any:
+        return await run_blocking(self.config, self._timed, leg, func, *args)
+
+    async def _afinish(
+        self,
+        output_text: str,
+        add_to_memory: bool,
+        status: Optional[str] = "completed",
+        cache: bool = True
+    ) -> Union[dict, str]:
+        """_afinish Caches and saves the finished model output
+
+        Runs GPTQuery._cache_response() and GPTQuery._finish() on the
+        executor. It's shielded from cancellation, so once it started
+        the memories are always written completely.
+
+        Args:
+            output_text (str): Full model output
+            add_to_memory (bool): If user input and model output should be added to memories
+            status (Optional[str], optional): Status of the OpenAI response. Defaults to "completed".
+            cache (bool, optional): If the output should be cached. Defaults to True.
+
+        Returns:
+            Union[dict, str]: Either a dictionary (JSON) or string (Plain-text/Markdown)
+        """
+        def finish() -> Union[dict, str]:
+            if cache:
+                self._cache_response(output_text, status)
+            return self._finish(output_text, add_to_memory, status)
+        
+        self.response = await asyncio.shield(run_blocking(self.config, finish))
+        return self.response
+
+    @log_event("Retrieving search results and memories (async)...")
+    async def aretrieve(self) -> List[dict[str, Any]]:
+        """aretrieve Retrieves everything needed for the prompt
+
+        See GPTQuery.retrieve(). The legs always run concurrently.
+
+        Returns:
+            List[dict[str, Any]]: Chat context (see GPTMemory.response_input())
+        """
+        legs = self._retrieval_legs()
+
+        self.timings = {}
+        start = time.perf_counter()
+        values = await asyncio.gather(*(self._atimed(leg, func, *args) for leg, (func, args) in legs.items()))
+        results = dict(zip(legs, values))
+        self.timings['total'] = (time.perf_counter() - start) * 1000
+
+        log.info(
+            "aretrieve: " + ", ".join(f"{leg} {ms:.1f} ms" for leg, ms in self.timings.items())
+        )
+        return self._build_input(results)
+
+    @log_event("Waiting for OpenAI response (async)...")
+    async def new_response( # type: ignore
+        self,
+        add_to_memory: bool = True
+    ) -> Union[dict, str]:
+        """new_response Sends a request to OpenAI
+
+        See GPTQuery.new_response().
+
+        Returns:
+            Union[dict, str]: Either a dictionary (JSON) or string (Plain-text/Markdown)
+        """
+        params = self._request_params(await self.aretrieve())
+        cached = await run_blocking(self.config, self._cached_response, params)
+        if cached is not None:
+            return await self._afinish(cached, add_to_memory, cache=False)
+        
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        start = time.perf_counter()
+        rsp = await self.db.async_openai_client.responses.create(
+            **params
+        )
+        self.timings['generation'] = (time.perf_counter() - start) * 1000
+        self._record_usage(rsp.usage)
+        return await self._afinish(rsp.output_text, add_to_memory, rsp.status)
+
+    @log_event("Streaming OpenAI response (async)...")
+    async def stream_response( # type: ignore
+        self,
+        add_to_memory: bool = True
+    ) -> AsyncIterator[str]:
+        """stream_response Streams a response from OpenAI
+
+        See GPTQuery.stream_response().
+
+        Raises:
+            RuntimeError: If OpenAI reports an error or the response failed
+
+        Yields:
+            AsyncIterator[str]: Pieces (deltas) of the response text
+        """
+        start = time.perf_counter()
+        params = self._request_params(await self.aretrieve())
+        cached = await run_blocking(self.config, self._cached_response, params)
+        if cached is not None:
+            self.timings['first_token'] = (time.perf_counter() - start) * 1000
+            yield cached
+            await self._afinish(cached, add_to_memory, cache=False)
+            return
+        
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        stream = await self.db.async_openai_client.responses.create(
+            **params,
+            stream=True
+        )
+
+        chunks: List[str] = []
+        first_token: Optional[float] = None
+        output_tokens: Optional[int] = None
+        status: Optional[str] = None
+        try:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                        self.timings['first_token'] = (first_token - start) * 1000
+                    chunks.append(event.delta)
+                    yield event.delta
+                elif event.type in ("response.completed", "response.incomplete"):
+                    status = event.response.status
+                    if event.response.usage:
+                        self._record_usage(event.response.usage)
+                        output_tokens = event.response.usage.output_tokens
+                elif event.type in ("error", "response.failed"):
+                    raise RuntimeError(f"OpenAI stream failed: {self._stream_error(event)}")
+        finally:
+            # also closes the connection if the consumer was cancelled
+            await stream.close()
+
+        output_text = "".join(chunks)
+        self._record_stream(first_token, output_text, output_tokens)
+        await self._afinish(output_text, add_to_memory, status)
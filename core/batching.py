@@ -0,0 +1,181 @@
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    as_completed
+)
+from typing import (
+    List,
+    Optional,
+    TYPE_CHECKING
+)
+
+from chromadb.api.models.Collection import Collection
+from chromadb.api.types import (
+    Documents,
+    EmbeddingFunction,
+    Embeddings,
+    Metadata
+)
+
+from Athena.common.logger import get_logger
+from Athena.common.utils import chars_to_tokens
+
+if TYPE_CHECKING:
+    from Athena.core.config import Config
+
+log = get_logger()
+
+
+class Batch:
+    def __init__(
+        self,
+        ids: List[str],
+        documents: Documents,
+        metadatas: Optional[List[Metadata]] = None
+    ) -> None:
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.embeddings: Embeddings = []
+
+
+class BatchUpserter:
+    def __init__(
+        self,
+        collection: Collection,
+        embedding_function: EmbeddingFunction,
+        config: 'Config'
+    ) -> None:
+        """__init__ Initialises BatchUpserter
+
+        This class upserts large amounts of documents into a
+        ChromaDB collection.
+
+        The documents get split into batches by count and estimated
+        tokens so we never hit the batch limits of the embedding provider.
+        The batches are embedded concurrently on a bounded thread pool
+        and upserted as soon as they're done, in whatever order they finish.
+
+        Args:
+            collection (Collection): ChromaDB collection to upsert into
+            embedding_function (EmbeddingFunction): Embedding function of the collection
+            config (Config): Configuration (batch size, workers, retries)
+        """
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.batch_size = config.ingestion_batch_size
+        self.batch_tokens = config.ingestion_batch_tokens
+        self.workers = config.ingestion_workers
+        self.max_retries = config.ingestion_max_retries
+        self.backoff = 1.0 # seconds
+
+    def split(
+        self,
+        ids: List[str],
+        documents: Documents,
+        metadatas: Optional[List[Metadata]] = None
+    ) -> List[Batch]:
+        """split Splits documents into batches
+
+        Splits the documents into batches with at most `batch_size`
+        documents and `batch_tokens` estimated tokens each.
+        A single document larger than `batch_tokens` gets its own batch.
+
+        Args:
+            ids (List[str]): IDs of the documents
+            documents (Documents): List of documents
+            metadatas (Optional[List[Metadata]], optional): Metadata of the documents. Defaults to None.
+
+        Returns:
+            List[Batch]: List of batches
+        """
+        batches = []
+        start = 0
+        tokens = 0
+
+        for i, doc in enumerate(documents):
+            doc_tokens = chars_to_tokens(len(doc))
+            is_full = (i - start) >= self.batch_size or tokens + doc_tokens > self.batch_tokens
+
+            if is_full and i > start:
+                batches.append(self._batch(ids, documents, metadatas, start, i))
+                start = i
+                tokens = 0
+            tokens += doc_tokens
+
+        if start < len(documents):
+            batches.append(self._batch(ids, documents, metadatas, start, len(documents)))
+        return batches
+
+    def _batch(
+        self,
+        ids: List[str],
+        documents: Documents,
+        metadatas: Optional[List[Metadata]],
+        start: int,
+        stop: int
+    ) -> Batch:
+        return Batch(
+            ids=ids[start:stop],
+            documents=documents[start:stop],
+            metadatas=metadatas[start:stop] if metadatas else None
+        )
+
+    def embed(self, batch: Batch) -> Batch:
+        """embed Embeds a batch
+
+        Embeds every document of the batch and retries with
+        exponential backoff if the embedding provider fails.
+
+        Args:
+            batch (Batch): Batch of documents
+
+        Raises:
+            Exception: Last exception if every retry failed
+
+        Returns:
+            Batch: Same batch, now with embeddings
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch.embeddings = self.embedding_function(batch.documents)
+                return batch
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                log.info(f"embed: Batch of {len(batch.ids)} documents failed ({e}). Retrying in {delay:.1f} s")
+                time.sleep(delay)
+        return batch
+
+    def upsert(
+        self,
+        ids: List[str],
+        documents: Documents,
+        metadatas: Optional[List[Metadata]] = None
+    ) -> None:
+        """upsert Upserts documents in batches
+
+        Splits the documents into batches, embeds them concurrently
+        and upserts every batch with its embeddings into the collection.
+
+        Args:
+            ids (List[str]): IDs of the documents
+            documents (Documents): List of documents
+            metadatas (Optional[List[Metadata]], optional): Metadata of the documents. Defaults to None.
+        """
+        batches = self.split(ids, documents, metadatas)
+        log.info(f"upsert: Upserting {len(documents)} documents in {len(batches)} batches")
+
+        # Upserting happens in this thread so only the embedding
+        # requests run concurrently
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.embed, batch) for batch in batches]
+            for future in as_completed(futures):
+                batch = future.result()
+                self.collection.upsert(
+                    ids =           batch.ids,
+                    documents =     batch.documents,
+                    metadatas =     batch.metadatas,
+                    embeddings =    batch.embeddings
+                )
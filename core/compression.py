@@ -0,0 +1,85 @@
+import atexit
+from queue import Queue
+from threading import (
+    Lock,
+    Thread
+)
+from typing import (
+    Any,
+    Callable,
+    Optional
+)
+
+from Athena.common.logger import get_logger
+
+log = get_logger()
+
+
+class CompressionWorker:
+    def __init__(self, name: str = "memory-compression") -> None:
+        """__init__ Initialises CompressionWorker
+
+        A single background thread which works through a queue of
+        jobs, one after another. GPTMemory uses it to shorten new
+        memories (which needs another request to OpenAI) after the
+        model response was already returned to the user.
+
+        The thread only starts with the first job. On shutdown every
+        queued job is finished first (see flush()).
+
+        Args:
+            name (str, optional): Name of the thread. Defaults to "memory-compression".
+        """
+        self.name = name
+        self.failed = 0
+
+        self._queue: Queue[tuple[Callable[..., Any], tuple]] = Queue()
+        self._pending = 0
+        self._lock = Lock()
+        self._thread: Optional[Thread] = None
+        atexit.register(self.flush)
+
+    @property
+    def depth(self) -> int:
+        """depth Returns the queue depth
+
+        Returns:
+            int: Amount of queued and running jobs
+        """
+        return self._pending
+
+    def submit(
+        self,
+        func: Callable[..., Any],
+        *args: Any
+    ) -> None:
+        """submit Queues a job
+
+        Args:
+            func (Callable[..., Any]): Function to call in the background
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._work, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending += 1
+        self._queue.put((func, args))
+
+    def flush(self) -> None:
+        """flush Waits until every queued job is done"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _work(self) -> None:
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                # the uncompressed memory is already stored, so it's fine to lose this job
+                self.failed += 1
+                log.info(f"_work: Compression job failed ({e}). Keeping uncompressed memory")
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                self._queue.task_done()
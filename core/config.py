@@ -5,7 +5,9 @@ from Athena.common.types import (
     OutputTypes,
     ResponseConfig,
     OutputHeaders,
-    TextParsings
+    TextParsings,
+    EmbeddingBackends,
+    ShorteningStrategies
 )
 
 class Config:
@@ -29,11 +31,70 @@ class Config:
         self.max_entries = 5
         self.max_search_results = 3
         self.tokens_per_memory = 200    # tokens
+        self.background_compression = True  # shorten memories after responding
+        self.memory_shortening = ShorteningStrategies.LLM
+        self.max_sessions = 128
+        self.session_timeout = 3600.0   # seconds until an idle session gets evicted from RAM
         
         # searching chromadb
         self.search_max_tokens = 2048   # tokens
         self.search_max_distance = 1.2
         self.search_max_results = 96
+        self.search_cache_size = 256
+        self.search_cache_ttl = 300.0   # seconds
+        self.search_hybrid = True       # BM25 + vector search
+        self.search_lexical_results = 20
+        self.search_fusion_k = 60
+        
+        # re-ranking
+        self.rerank = False
+        self.rerank_model_path = ""     # onnx cross-encoder folder
+        self.rerank_max_length = 512    # tokens
+        self.rerank_batch_size = 16
+        self.rerank_top_k = 20
+        self.rerank_latency_budget = 150.0  # ms
+        
+        # embedding
+        self.embedding_backend = EmbeddingBackends.OPENAI
+        self.embedding_model = "text-embedding-3-small"
+        self.embedding_model_path = ""  # onnx model folder
+        self.embedding_max_length = 256 # tokens
+        self.embedding_batch_size = 32
+        self.embedding_cache = True
+        self.embedding_cache_size = 512 # MB
+        
+        # response cache
+        self.response_cache = False
+        self.response_cache_size = 1024     # responses
+        self.response_cache_threshold = 0.95    # min cosine similarity of the queries
+        
+        # ingestion
+        self.incremental_ingestion = True
+        self.ingestion_batch_size = 256
+        self.ingestion_batch_tokens = 100000  # tokens
+        self.ingestion_workers = 4
+        self.ingestion_max_retries = 5
+        
+        # memory retention
+        self.retention_max_turns = 1000     # per session, 0 = unlimited
+        self.retention_max_age = 90.0       # days, 0 = unlimited
+        self.retention_merge_threshold = 0.97   # cosine similarity, 0 = never merge
+        self.retention_interval = 50        # turns between retention passes, 0 = never
+        self.retention_compaction_ratio = 0.25  # deleted share of memories that triggers a compaction
+        
+        # retrieval
+        self.concurrent_retrieval = True  # search + memory lookups in parallel
+        
+        # context packing
+        self.context_packing = True
+        self.context_max_tokens = 4096  # input tokens of the whole prompt
+        
+        # async pipeline
+        self.async_workers = 8          # threads for blocking calls (ChromaDB, embeddings)
+        
+        # batch mode
+        self.batch_concurrency = 8      # questions in flight at once
+        self.batch_requests_per_minute = 500.0  # OpenAI requests, 0 = unlimited
         
         cfg = self.check_for_cfg()
         if cfg[1]:
@@ -70,11 +131,14 @@ class Config:
         return ("", False)
     
     def load_values(self) -> None:
+        # options added after the first release fall back to their defaults,
+        # so older config files without them keep working
         self.response.model             = self.parser.get("Response", "ModelName")
         self.response.temperature       = self.parser.getfloat("Response", "Temperature")
         self.response.max_output_tokens = self.parser.getint("Response", "MaxOutputTokens")
         self.response.top_p             = self.parser.getfloat("Response", "TopP")
         self.response.store             = self.parser.getboolean("Response", "Store")
+        self.response.stream            = self.parser.getboolean("Response", "Stream", fallback=self.response.stream)
         
         self.parse_chunk_size           = self.parser.getint("Parsing", "TextParsingChunkSize")
         self.enforce_uniform_chunks     = self.parser.getboolean("Parsing", "EnforceUniformChunks")
@@ -82,7 +146,57 @@ class Config:
         self.max_entries                = self.parser.getint("Memory", "Entries")
         self.tokens_per_memory          = self.parser.getint("Memory", "TokensPerMemory")
         self.max_search_results         = self.parser.getint("Memory", "SearchResults")
+        self.background_compression     = self.parser.getboolean("Memory", "BackgroundCompression", fallback=self.background_compression)
+        self.memory_shortening          = ShorteningStrategies(self.parser.get("Memory", "Shortening", fallback=self.memory_shortening.value))
+        self.max_sessions               = self.parser.getint("Memory", "Sessions", fallback=self.max_sessions)
+        self.session_timeout            = self.parser.getfloat("Memory", "SessionTimeout", fallback=self.session_timeout)
         
         self.search_max_tokens          = self.parser.getint("Search", "MaxTokens")
         self.search_max_distance        = self.parser.getfloat("Search", "MaxDistance")
-        self.search_max_results         = self.parser.getint("Search", "MaxResults")
\ No newline at end of file
+        self.search_max_results         = self.parser.getint("Search", "MaxResults")
+        self.search_cache_size          = self.parser.getint("Search", "CacheSize", fallback=self.search_cache_size)
+        self.search_cache_ttl           = self.parser.getfloat("Search", "CacheTTL", fallback=self.search_cache_ttl)
+        self.search_hybrid              = self.parser.getboolean("Search", "Hybrid", fallback=self.search_hybrid)
+        self.search_lexical_results     = self.parser.getint("Search", "LexicalResults", fallback=self.search_lexical_results)
+        self.search_fusion_k            = self.parser.getint("Search", "FusionK", fallback=self.search_fusion_k)
+        
+        self.rerank                     = self.parser.getboolean("Rerank", "Enabled", fallback=self.rerank)
+        self.rerank_model_path          = self.parser.get("Rerank", "ModelPath", fallback=self.rerank_model_path)
+        self.rerank_max_length          = self.parser.getint("Rerank", "MaxLength", fallback=self.rerank_max_length)
+        self.rerank_batch_size          = self.parser.getint("Rerank", "BatchSize", fallback=self.rerank_batch_size)
+        self.rerank_top_k               = self.parser.getint("Rerank", "TopK", fallback=self.rerank_top_k)
+        self.rerank_latency_budget      = self.parser.getfloat("Rerank", "LatencyBudget", fallback=self.rerank_latency_budget)
+        
+        self.embedding_backend          = EmbeddingBackends(self.parser.get("Embedding", "Backend", fallback=self.embedding_backend.value))
+        self.embedding_model            = self.parser.get("Embedding", "ModelName", fallback=self.embedding_model)
+        self.embedding_model_path       = self.parser.get("Embedding", "ModelPath", fallback=self.embedding_model_path)
+        self.embedding_max_length       = self.parser.getint("Embedding", "MaxLength", fallback=self.embedding_max_length)
+        self.embedding_batch_size       = self.parser.getint("Embedding", "BatchSize", fallback=self.embedding_batch_size)
+        self.embedding_cache            = self.parser.getboolean("Embedding", "Cache", fallback=self.embedding_cache)
+        self.embedding_cache_size       = self.parser.getint("Embedding", "CacheSize", fallback=self.embedding_cache_size)
+        
+        self.response_cache             = self.parser.getboolean("ResponseCache", "Enabled", fallback=self.response_cache)
+        self.response_cache_size        = self.parser.getint("ResponseCache", "Size", fallback=self.response_cache_size)
+        self.response_cache_threshold   = self.parser.getfloat("ResponseCache", "Threshold", fallback=self.response_cache_threshold)
+        
+        self.incremental_ingestion      = self.parser.getboolean("Ingestion", "Incremental", fallback=self.incremental_ingestion)
+        self.ingestion_batch_size       = self.parser.getint("Ingestion", "BatchSize", fallback=self.ingestion_batch_size)
+        self.ingestion_batch_tokens     = self.parser.getint("Ingestion", "BatchTokens", fallback=self.ingestion_batch_tokens)
+        self.ingestion_workers          = self.parser.getint("Ingestion", "Workers", fallback=self.ingestion_workers)
+        self.ingestion_max_retries      = self.parser.getint("Ingestion", "MaxRetries", fallback=self.ingestion_max_retries)
+        
+        self.retention_max_turns        = self.parser.getint("Retention", "MaxTurns", fallback=self.retention_max_turns)
+        self.retention_max_age          = self.parser.getfloat("Retention", "MaxAge", fallback=self.retention_max_age)
+        self.retention_merge_threshold  = self.parser.getfloat("Retention", "MergeThreshold", fallback=self.retention_merge_threshold)
+        self.retention_interval         = self.parser.getint("Retention", "Interval", fallback=self.retention_interval)
+        self.retention_compaction_ratio = self.parser.getfloat("Retention", "CompactionRatio", fallback=self.retention_compaction_ratio)
+        
+        self.concurrent_retrieval       = self.parser.getboolean("Retrieval", "Concurrent", fallback=self.concurrent_retrieval)
+        
+        self.context_packing            = self.parser.getboolean("Context", "Packing", fallback=self.context_packing)
+        self.context_max_tokens         = self.parser.getint("Context", "MaxInputTokens", fallback=self.context_max_tokens)
+        
+        self.async_workers              = self.parser.getint("Async", "Workers", fallback=self.async_workers)
+        
+        self.batch_concurrency          = self.parser.getint("Batch", "Concurrency", fallback=self.batch_concurrency)
+        self.batch_requests_per_minute  = self.parser.getfloat("Batch", "RequestsPerMinute", fallback=self.batch_requests_per_minute)
\ No newline at end of file
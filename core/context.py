@@ -0,0 +1,47 @@
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+
+class QueryContext:
+    def __init__(
+        self,
+        query: str,
+        embedding_function: EmbeddingFunction
+    ) -> None:
+        """__init__ Initialises QueryContext
+
+        This class holds everything about the user query of a
+        single turn that's needed by more than one collection.
+        
+        The query embedding is computed once, the first time
+        it's needed, and then shared by the search in VData and
+        the memory search in MemoryDB. If every search is cached,
+        the query is never embedded at all.
+
+        Args:
+            query (str): User query
+            embedding_function (EmbeddingFunction): Embedding function of the collections
+        """
+        self.query = query
+        self.embedding_function = embedding_function
+        self._embedding: Optional[np.ndarray] = None
+        self._lock = Lock()
+
+    @property
+    def embedding(self) -> np.ndarray:
+        """embedding Returns the query embedding
+
+        Returns:
+            np.ndarray: Embedding of the user query
+        """
+        with self._lock:
+            if self._embedding is None:
+                self._embedding = np.asarray(self.embedding_function([self.query])[0], dtype=np.float32)
+            return self._embedding
+
+    @property
+    def is_embedded(self) -> bool:
+        return self._embedding is not None
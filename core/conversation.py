@@ -0,0 +1,226 @@
+import json
+import sqlite3
+import time
+from threading import Lock
+from typing import (
+    Any,
+    List,
+    Optional,
+    Sequence
+)
+
+from Athena.common.types import DEFAULT_SESSION
+
+
+class ConversationLog:
+    def __init__(self, path: str) -> None:
+        """__init__ Initialises ConversationLog
+
+        An append-only log of every user input and model output.
+        Every message gets a monotonic sequence number and a timestamp,
+        both of them indexed, so the latest N messages or the messages
+        since some point in time are found without reading (or decoding)
+        the rest of the history.
+
+        This replaces fetching the whole MemoryDB collection whenever
+        the most recent memories are needed. The collection is still
+        used for similarity searches.
+
+        Args:
+            path (str): Full path to the SQLite file (or ":memory:")
+        """
+        self.path = path
+
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                memory_id TEXT
+            )
+            """
+        )
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(messages)")]
+        if "session" not in columns:
+            # logs from before there were sessions belong to the default session
+            self._connection.execute(
+                f"ALTER TABLE messages ADD COLUMN session TEXT NOT NULL DEFAULT '{DEFAULT_SESSION}'"
+            )
+        if "encoding" not in columns:
+            # 'text' if the content is stored as it is, 'json' if it was JSON encoded
+            self._connection.execute(
+                "ALTER TABLE messages ADD COLUMN encoding TEXT NOT NULL DEFAULT 'text'"
+            )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (timestamp)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_memory_id ON messages (memory_id)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_session_seq ON messages (session, seq)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_session_timestamp ON messages (session, timestamp)"
+        )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COUNT(*) FROM messages").fetchone()
+        return row[0]
+
+    @property
+    def last_seq(self) -> int:
+        """last_seq Returns the sequence number of the newest message
+
+        Returns:
+            int: Sequence number (0 if the log is empty)
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT COALESCE(MAX(seq), 0) FROM messages").fetchone()
+        return row[0]
+
+    def append(
+        self,
+        messages: Sequence[dict[str, Any]],
+        memory_ids: Optional[Sequence[str]] = None,
+        timestamp: Optional[float] = None,
+        session_id: str = DEFAULT_SESSION
+    ) -> List[int]:
+        """append Appends messages to the log
+
+        Args:
+            messages (Sequence[dict[str, Any]]): Messages ({role: "user", content: ""})
+            memory_ids (Optional[Sequence[str]], optional): IDs of the messages in MemoryDB. Defaults to None.
+            timestamp (Optional[float], optional): UNIX timestamp. Defaults to None (now).
+            session_id (str, optional): Session of the messages. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[int]: Sequence numbers of the messages
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        memory_ids = memory_ids or [None] * len(messages) # type: ignore
+
+        seqs = []
+        with self._lock:
+            for message, memory_id in zip(messages, memory_ids): # type: ignore
+                cursor = self._connection.execute(
+                    "INSERT INTO messages (timestamp, role, content, encoding, memory_id, session) VALUES (?, ?, ?, ?, ?, ?)",
+                    (timestamp, message["role"], *self._encode(message["content"]), memory_id, session_id)
+                )
+                seqs.append(cursor.lastrowid)
+            self._connection.commit()
+        return seqs
+
+    def replace(
+        self,
+        memory_ids: Sequence[str],
+        messages: Sequence[dict[str, Any]]
+    ) -> None:
+        """replace Replaces the content of messages
+
+        Replaces the content of already logged messages (e.g. with
+        their shortened version) without changing their position.
+
+        Args:
+            memory_ids (Sequence[str]): IDs of the messages in MemoryDB
+            messages (Sequence[dict[str, Any]]): New messages ({role: "user", content: ""})
+        """
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE messages SET role = ?, content = ?, encoding = ? WHERE memory_id = ?",
+                [
+                    (message["role"], *self._encode(message["content"]), memory_id)
+                    for memory_id, message in zip(memory_ids, messages)
+                ]
+            )
+            self._connection.commit()
+
+    def delete(self, memory_ids: Sequence[str]) -> None:
+        """delete Deletes messages
+
+        Args:
+            memory_ids (Sequence[str]): IDs of the messages in MemoryDB
+        """
+        with self._lock:
+            # SQLite only allows a limited amount of variables per statement
+            for start in range(0, len(memory_ids), 500):
+                chunk = memory_ids[start:start+500]
+                placeholders = ",".join("?" * len(chunk))
+                self._connection.execute(
+                    f"DELETE FROM messages WHERE memory_id IN ({placeholders})",
+                    list(chunk)
+                )
+            self._connection.commit()
+
+    def last(
+        self,
+        amount: int,
+        session_id: str = DEFAULT_SESSION
+    ) -> List[dict[str, Any]]:
+        """last Returns the latest messages
+
+        Args:
+            amount (int): Amount of messages
+            session_id (str, optional): Session of the messages. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[dict[str, Any]]: The <amount> latest messages (oldest first)
+        """
+        if amount <= 0:
+            return []
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT role, content, encoding FROM messages WHERE session = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, amount)
+            ).fetchall()
+        return [self._decode(row) for row in reversed(rows)]
+
+    def since(
+        self,
+        timestamp: float,
+        limit: Optional[int] = None,
+        session_id: str = DEFAULT_SESSION
+    ) -> List[dict[str, Any]]:
+        """since Returns the messages since a point in time
+
+        Args:
+            timestamp (float): UNIX timestamp
+            limit (Optional[int], optional): Max amount of messages. Defaults to None (all).
+            session_id (str, optional): Session of the messages. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[dict[str, Any]]: Messages since timestamp (oldest first)
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT role, content, encoding FROM messages WHERE session = ? AND timestamp >= ? ORDER BY timestamp, seq LIMIT ?",
+                (session_id, timestamp, -1 if limit is None else limit)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM messages")
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _encode(self, content: Any) -> tuple[str, str]:
+        # strings are stored as they are, anything else as JSON
+        if isinstance(content, str):
+            return content, "text"
+        return json.dumps(content), "json"
+
+    def _decode(self, row: tuple[str, str, str]) -> dict[str, Any]:
+        role, content, encoding = row
+        return {"role": role, "content": json.loads(content) if encoding == "json" else content}
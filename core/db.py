@@ -2,22 +2,43 @@ import chromadb
 import os
 import json
 import shutil
-from openai import OpenAI
+import hashlib
+import uuid
+from itertools import islice
+from openai import (
+    OpenAI,
+    AsyncOpenAI
+)
 from chromadb.api import ClientAPI
 from chromadb.api.models.Collection import Collection
-from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 from datetime import datetime
 from dotenv import load_dotenv
 from typing import (
+    Any,
+    Iterable,
+    Iterator,
     Optional,
     TYPE_CHECKING
 )
 from Athena.core.memory import GPTMemory
+from Athena.core.embeddings import create_embedding_function
+from Athena.core.batching import BatchUpserter
+from Athena.core.loader import JSONStreamLoader
+from Athena.core.lexical import BM25Index
+from Athena.core.context import QueryContext
+from Athena.core.response_cache import (
+    ResponseCache,
+    ids_key
+)
 from Athena.common.logger import log_event
 from Athena.cli.progress import ProgressBar
 from Athena import (
     _db_dir,
-    _internal_dir
+    _internal_dir,
+    _embedding_cache_path,
+    _lexical_index_path,
+    _conversation_log_path,
+    _response_cache_path
 )
 
 if TYPE_CHECKING:
@@ -25,6 +46,8 @@ if TYPE_CHECKING:
 
 load_dotenv()
 
+SOURCE_KEY = "_source"   # metadata key of the input file a document came from
+
 class DBManager:
     @log_event("Loading client, embedding-function and chroma collection")
     def __init__(
@@ -36,19 +59,78 @@ class DBManager:
         self.client = chromadb.PersistentClient(path=os.path.join(_internal_dir, "chromadb/"))
 
         if progress_bar: progress_bar.advance_step()
-        self.openai_ef = OpenAIEmbeddingFunction(
-            api_key=os.getenv("CHROMA_OPENAI_API_KEY"),
-            model_name="text-embedding-3-small"
-        )
+        self.embedding_function = create_embedding_function(config, cache_path=_embedding_cache_path)
 
         if progress_bar: progress_bar.advance_step()
         self.openai_client = OpenAI(api_key=os.getenv("CHROMA_OPENAI_API_KEY"))
+        self._async_openai_client: Optional[AsyncOpenAI] = None
 
         if progress_bar: progress_bar.advance_step()
         self.collection = self.create_collection()
+        self.batcher = BatchUpserter(self.collection, self.embedding_function, config)
+        self.version = 0    # bumped on every change of the collection
+        self.lexical_index: Optional[BM25Index] = None
+        if config.search_hybrid:
+            self.lexical_index = BM25Index(_lexical_index_path)
+            self.sync_lexical_index()
+        self.response_cache: Optional[ResponseCache] = None
+        if config.response_cache:
+            self.response_cache = ResponseCache(
+                _response_cache_path,
+                max_size=config.response_cache_size,
+                threshold=config.response_cache_threshold,
+                fingerprint=self.fingerprint()
+            )
 
         if progress_bar: progress_bar.advance_step()
-        self.chat_history = GPTMemory(self.client, self.openai_client, self.openai_ef, config)
+        self.chat_history = GPTMemory(self.client, self.openai_client, self.embedding_function, config)
+    
+    @property
+    def async_openai_client(self) -> AsyncOpenAI:
+        """async_openai_client Returns the async OpenAI client
+
+        Only created when the async pipeline (see core/asynchronous.py)
+        is used for the first time.
+
+        Returns:
+            AsyncOpenAI: Async OpenAI client
+        """
+        if self._async_openai_client is None:
+            self._async_openai_client = AsyncOpenAI(api_key=os.getenv("CHROMA_OPENAI_API_KEY"))
+        return self._async_openai_client
+    
+    def query_context(self, query: str) -> QueryContext:
+        """query_context Creates the context of a user query
+
+        Creates a QueryContext which embeds the user query once
+        and shares it between every collection in this turn.
+
+        Args:
+            query (str): User query
+
+        Returns:
+            QueryContext: Context of the user query
+        """
+        return QueryContext(query, self.embedding_function)
+    
+    def new_session(self) -> str:
+        """new_session Starts a new conversation
+
+        Returns:
+            str: ID of the new session (pass it to QueryData or GPTQuery)
+        """
+        return uuid.uuid4().hex
+    
+    def end_session(self, session_id: str) -> None:
+        """end_session Ends a conversation
+
+        Frees the recent memories of a session from RAM.
+        Its memories stay in MemoryDB.
+
+        Args:
+            session_id (str): ID of the session
+        """
+        self.chat_history.end_session(session_id)
     
     def get_client(self) -> ClientAPI:
         """get_client Returns the Client
@@ -81,32 +163,261 @@ class DBManager:
         """
         return self.client.get_or_create_collection(
             name = "VData",
-            embedding_function=self.openai_ef, # type: ignore
+            embedding_function=self.embedding_function, # type: ignore
             metadata = {
                 'description': 'Database for data input',
                 'created': str(datetime.now())
             }
         )
     
+    @log_event("Synchronising BM25 index with collection")
+    def sync_lexical_index(self) -> None:
+        """sync_lexical_index Rebuilds the BM25 index if necessary
+
+        Rebuilds the BM25 index from the collection if it doesn't
+        contain the same documents (e.g. if the database was deleted,
+        changed without saving the index or the index is new).
+        Both are compared by a hash of their document IDs.
+        """
+        if self.lexical_index is None:
+            return
+        if ids_key(self.lexical_index.ids()) == ids_key(self.collection_ids()):
+            return
+        
+        self.lexical_index.clear()
+        page_size = 1000
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add(page["ids"], page["documents"] or [])
+            offset += len(page["ids"])
+        self.lexical_index.save()
+    
+    def collection_ids(self) -> Iterator[str]:
+        """collection_ids Yields the ID of every document
+
+        Yields:
+            Iterator[str]: Document IDs (read page by page)
+        """
+        page_size = 1000
+        offset = 0
+        while True:
+            ids = self.collection.get(include=[], limit=page_size, offset=offset)["ids"]
+            if not ids:
+                break
+            yield from ids
+            offset += len(ids)
+    
+    def bump_version(self) -> None:
+        """bump_version Marks the collection as changed
+
+        Increments the collection version so caches keyed on it
+        (like the search result cache) don't return stale results
+        and clears the response cache.
+        """
+        self.version += 1
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self.fingerprint())
+    
+    def fingerprint(self) -> str:
+        """fingerprint Identifies the state of the collection
+
+        Persistent caches (like the response cache) compare it on
+        startup, in case the collection was changed without them.
+
+        Returns:
+            str: ID and amount of documents of the collection
+        """
+        return f"{self.collection.id}:{self.collection.count()}"
+    
+    def _metadata(
+        self,
+        obj: Any,
+        source: Optional[str] = None
+    ) -> Optional[dict]:
+        """_metadata Creates the metadata of a document
+
+        Uses the flat fields of a JSON object as metadata, so
+        searches can be filtered by them (see SearchEngine.build_where()).
+        Numbers and booleans keep their type (so range filters like
+        `$gte` work), nested values are skipped as ChromaDB can't store them.
+
+        Args:
+            obj (Any): Pythonic JSON object or string
+            source (Optional[str], optional): Full path to the input file. Defaults to None.
+
+        Returns:
+            Optional[dict]: Metadata or None if there's nothing to store
+        """
+        metadata = {}
+        if isinstance(obj, dict):
+            metadata = {
+                key: value for key, value in obj.items()
+                if isinstance(key, str) and isinstance(value, (str, int, float, bool))
+            }
+        if source:
+            metadata[SOURCE_KEY] = source
+        return metadata or None
+    
+    def _windows(
+        self,
+        json_obj: Iterable[Any]
+    ) -> Iterator[list[Any]]:
+        """_windows Splits objects into windows
+
+        Splits any iterable into lists that are just large enough
+        to keep every embedding worker busy, so streamed input
+        never has to be held in RAM at once.
+
+        Args:
+            json_obj (Iterable[Any]): List or iterator of objects
+
+        Yields:
+            Iterator[list[Any]]: Lists of objects
+        """
+        size = self.batcher.batch_size * self.batcher.workers
+        objects = iter(json_obj)
+        while window := list(islice(objects, size)):
+            yield window
+    
     @log_event("Upserting JSON-data into collection")
     def insert_json(
         self, 
-        json_obj: list[dict]
+        json_obj: Iterable[Any]
     ) -> None:
         """_insert_json Inserts JSON into DB
 
         Inserts all the data from the JSON file into the DB
 
         Args:
-            json_obj (list[dict]): List of dictionaries (Pythonic JSON objects)
+            json_obj (Iterable[Any]): List or iterator of dictionaries (Pythonic JSON objects)
         """
-        docs = [json.dumps(obj) for obj in json_obj]
+        offset = 0
+        for window in self._windows(json_obj):
+            ids = [f"doc{offset+i+1}" for i in range(len(window))]
+            docs = [json.dumps(obj) for obj in window]
+            self.batcher.upsert(
+                ids = ids,
+                documents = docs,
+                metadatas = [self._metadata(obj) for obj in window]
+            )
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, docs)
+            offset += len(window)
+            self.bump_version()
         
-        self.collection.upsert(
-            ids = [f"doc{i+1}" for i in range(len(json_obj))],
-            documents = docs,
-            metadatas = json_obj if type(json_obj) is dict else None
-        )
+        if self.lexical_index is not None:
+            self.lexical_index.save()
+
+    def _content_id(
+        self,
+        doc: str,
+        source: str,
+        occurrences: dict[bytes, int]
+    ) -> str:
+        """_content_id Creates a content-addressed ID
+
+        Creates a stable ID for a document by hashing its
+        source file and content, so the ID doesn't change when
+        other documents are inserted before it.
+        
+        Identical documents from the same source also get
+        their occurrence hashed so their IDs are still unique.
+
+        Args:
+            doc (str): Document
+            source (str): Full path to the input file
+            occurrences (dict[bytes, int]): Occurrences of every document so far
+
+        Returns:
+            str: ID of the document
+        """
+        content = hashlib.sha256(doc.encode("UTF-8")).digest()
+        occurrence = occurrences.get(content, 0)
+        occurrences[content] = occurrence + 1
+        digest = hashlib.sha256(f"{source}\0{occurrence}\0{doc}".encode("UTF-8")).hexdigest()
+        return f"doc-{digest}"
+    
+    @log_event("Synchronising JSON-data with collection")
+    def sync_json(
+        self,
+        json_obj: Iterable[Any],
+        source: str
+    ) -> tuple[int, int]:
+        """sync_json Incrementally inserts JSON into DB
+
+        Inserts the data from the input file into the DB, but
+        only embeds and upserts documents that aren't stored yet.
+        Documents of the same source that don't appear in the input
+        anymore get deleted.
+
+        Args:
+            json_obj (Iterable[Any]): List or iterator of dictionaries or strings
+            source (str): Full path to the input file
+
+        Returns:
+            tuple[int, int]: Amount of inserted and deleted documents
+        """
+        source = os.path.realpath(source)
+        stored = self.collection.get(where={SOURCE_KEY: source}, include=[])
+        stored_ids = set(stored["ids"])
+        
+        seen_ids: set[str] = set()
+        occurrences: dict[bytes, int] = {}
+        inserted = 0
+        
+        for window in self._windows(json_obj):
+            docs = [json.dumps(obj) for obj in window]
+            ids = [self._content_id(doc, source, occurrences) for doc in docs]
+            seen_ids.update(ids)
+            
+            new = [i for i, doc_id in enumerate(ids) if doc_id not in stored_ids]
+            if new:
+                self.batcher.upsert(
+                    ids =       [ids[i] for i in new],
+                    documents = [docs[i] for i in new],
+                    metadatas = [self._metadata(window[i], source) for i in new]
+                )
+                if self.lexical_index is not None:
+                    self.lexical_index.add([ids[i] for i in new], [docs[i] for i in new])
+                self.bump_version()
+            inserted += len(new)
+        
+        deleted = list(stored_ids.difference(seen_ids))
+        if deleted:
+            self.collection.delete(ids=deleted)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(deleted)
+            self.bump_version()
+        
+        if self.lexical_index is not None:
+            self.lexical_index.save()
+        return inserted, len(deleted)
+
+    def iter_json(
+        self,
+        filename: str
+    ) -> Iterator[Any]:
+        """iter_json Streams the content of a JSON
+
+        Yields the objects of a JSON or JSONL file one by one
+        without loading the entire file into RAM.
+        Note that the filename should be the full file path.
+
+        Args:
+            filename (str): Full path to the file
+
+        Yields:
+            Iterator[Any]: Dictionaries (Pythonic JSON objects)
+        """
+        if filename:
+            loader = JSONStreamLoader(filename)
+            if filename.lower().endswith(".jsonl"):
+                yield from loader.iter_lines()
+            else:
+                yield from loader.iter_array()
 
     def load_json(
         self,
@@ -123,16 +434,7 @@ class DBManager:
         Returns:
             list: List of Dictionaries (Pythonic JSON objects)
         """
-        if filename:
-            with open(filename) as file:
-                log_event("Loading JSON to RAM...")
-                json_file = json.load(file)
-                if not isinstance(json_file, list):
-                    return [json_file]
-                else:
-                    return json_file
-        else:
-            return []
+        return list(self.iter_json(filename))
 
 def _verify_chromadb_path(path: str) -> bool:
     """_verify_chromadb_path Confirms the path of the chroma database
@@ -182,4 +484,11 @@ def annihilate_db() -> None:
         try:
             shutil.rmtree(path)
         except:
-            raise FileNotFoundError("ChromaDB folder does not exist")
\ No newline at end of file
+            raise FileNotFoundError("ChromaDB folder does not exist")
+    if os.path.exists(_lexical_index_path):
+        os.remove(_lexical_index_path)
+    if os.path.exists(_response_cache_path):
+        os.remove(_response_cache_path)
+    for path in (_conversation_log_path, f"{_conversation_log_path}-wal", f"{_conversation_log_path}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
\ No newline at end of file
@@ -0,0 +1,445 @@
+import hashlib
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    TYPE_CHECKING
+)
+
+import numpy as np
+from chromadb.api.types import (
+    Documents,
+    EmbeddingFunction,
+    Embeddings
+)
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+
+from Athena.common.logger import get_logger
+from Athena.common.types import EmbeddingBackends
+
+if TYPE_CHECKING:
+    from Athena.core.config import Config
+
+log = get_logger()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(
+        self,
+        embedding_function: EmbeddingFunction,
+        model_name: str,
+        path: str,
+        max_size: int = 512 * 1024 * 1024
+    ) -> None:
+        """__init__ Initialises CachedEmbeddingFunction
+
+        This is a wrapper around any ChromaDB embedding function
+        (usually the OpenAIEmbeddingFunction) which stores every
+        embedding on disk so the same text never gets embedded twice.
+
+        Every embedding is keyed by the model name and the SHA-256 hash
+        of the text. The store is capped at `max_size` bytes and evicts
+        the least recently used embeddings once the cap is reached.
+
+        Args:
+            embedding_function (EmbeddingFunction): Embedding function to wrap
+            model_name (str): Name of the embedding model (part of the key)
+            path (str): Full path to the SQLite cache file
+            max_size (int, optional): Max size of stored vectors in bytes. Defaults to 512 MB.
+        """
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.path = path
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._connection.commit()
+        self._size = self._stored_size()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """__call__ Embeds documents
+
+        Looks up every document in the cache and only sends
+        the missing ones to the wrapped embedding function.
+
+        Args:
+            input (Documents): List of strings
+
+        Returns:
+            Embeddings: One embedding per document (same order as input)
+        """
+        keys = [self._hash(text) for text in input]
+        embeddings: List[Optional[np.ndarray]] = self._lookup(keys)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            new_embeddings = self.embedding_function([input[i] for i in missing])
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = np.asarray(embedding, dtype=np.float32)
+            self._store({keys[i]: embeddings[i] for i in missing})
+
+        with self._lock:
+            self.hits += len(input) - len(missing)
+            self.misses += len(missing)
+        return embeddings # type: ignore
+
+    def name(self) -> str: # type: ignore
+        # The cache doesn't change the vectors, so ChromaDB should
+        # treat this exactly like the wrapped embedding function.
+        return self.embedding_function.name()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.embedding_function.get_config()
+
+    def build_from_config(self, config: Dict[str, Any]) -> EmbeddingFunction: # type: ignore
+        return self.embedding_function.build_from_config(config)
+
+    def default_space(self): # type: ignore
+        return self.embedding_function.default_space()
+
+    def supported_spaces(self): # type: ignore
+        return self.embedding_function.supported_spaces()
+
+    @property
+    def stats(self) -> dict:
+        """stats Returns cache statistics
+
+        Returns:
+            dict: Hits, misses, hit rate, amount of entries and size in bytes
+        """
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'entries': self._count(),
+            'size': self._size
+        }
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(text.encode("UTF-8")).hexdigest()
+
+    def _stored_size(self) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return row[0]
+
+    def _count(self) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return row[0]
+
+    def _lookup(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """_lookup Loads cached embeddings
+
+        Loads the embeddings of every key and marks them
+        as recently used.
+
+        Args:
+            keys (List[str]): List of text hashes
+
+        Returns:
+            List[Optional[np.ndarray]]: Embedding or None for every key
+        """
+        found: Dict[str, np.ndarray] = {}
+        unique_keys = list(set(keys))
+        now = time.time()
+
+        with self._lock:
+            # SQLite only allows a limited amount of variables per statement
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start+500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_name, *chunk]
+                ).fetchall()
+                for hash, vector in rows:
+                    found[hash] = np.frombuffer(vector, dtype=np.float32)
+
+            if found:
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, self.model_name, hash) for hash in found]
+                )
+                self._connection.commit()
+        return [found.get(key) for key in keys]
+
+    def _store(self, embeddings: Dict[str, np.ndarray]) -> None:
+        """_store Stores new embeddings
+
+        Inserts new embeddings into the cache and evicts the
+        least recently used ones if the cache got too large.
+        Embeddings that are already stored (e.g. by another thread
+        in the meantime) are kept as they are and don't count twice.
+
+        Args:
+            embeddings (Dict[str, np.ndarray]): Text hashes and their embeddings
+        """
+        now = time.time()
+        rows = [
+            (self.model_name, hash, embedding.tobytes(), now)
+            for hash, embedding in embeddings.items()
+        ]
+        with self._lock:
+            for row in rows:
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                    row
+                )
+                if cursor.rowcount > 0:
+                    self._size += len(row[2])
+            self._connection.commit()
+
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """_evict Evicts least recently used embeddings
+
+        Deletes the least recently used embeddings until
+        the cache is at 90% of its max size again, so we don't
+        evict on every single insert.
+        """
+        target = int(self.max_size * 0.9)
+
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used ASC"
+            )
+            evicted = []
+            size = self._size
+            for rowid, length in cursor:
+                if size <= target:
+                    break
+                evicted.append((rowid,))
+                size -= length
+
+            self._connection.executemany("DELETE FROM embeddings WHERE rowid = ?", evicted)
+            self._connection.commit()
+            self._size = size
+        log.info(f"_evict: Evicted {len(evicted)} embeddings from cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def load_onnx_model(
+    model_path: str,
+    max_length: int
+) -> tuple[Any, Any]:
+    """load_onnx_model Loads an ONNX model and its tokenizer
+
+    Loads `model.onnx` and `tokenizer.json` from a model folder.
+    The session uses every CPU core and inputs get truncated and
+    padded to `max_length` tokens.
+
+    Args:
+        model_path (str): Full path to the model folder
+        max_length (int): Max amount of tokens per input
+
+    Returns:
+        tuple[Any, Any]: Tokenizer and onnxruntime InferenceSession
+    """
+    # only imported when a local model is actually used
+    import onnxruntime
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=max_length)
+    tokenizer.enable_padding(length=max_length)
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = os.cpu_count() or 1
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(
+        os.path.join(model_path, "model.onnx"),
+        sess_options=options,
+        providers=["CPUExecutionProvider"]
+    )
+    return tokenizer, session
+
+
+def encode_inputs(
+    tokenizer: Any,
+    inputs: list
+) -> Dict[str, np.ndarray]:
+    """encode_inputs Tokenizes model inputs
+
+    Args:
+        tokenizer (Any): Tokenizer of the model
+        inputs (list): Strings or (string, string) pairs
+
+    Returns:
+        Dict[str, np.ndarray]: input_ids, attention_mask and token_type_ids
+    """
+    encodings = tokenizer.encode_batch(inputs)
+    return {
+        'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+        'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64)
+    }
+
+
+class ONNXEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(
+        self,
+        model_path: str,
+        max_length: int = 256,
+        batch_size: int = 32
+    ) -> None:
+        """__init__ Initialises ONNXEmbeddingFunction
+
+        This is a local embedding function which runs a sentence
+        embedding model (e.g. all-MiniLM-L6-v2 exported to ONNX)
+        through onnxruntime, so embedding doesn't need any network
+        round trip at all.
+
+        The model folder must contain a `model.onnx` and the
+        `tokenizer.json` of the model.
+
+        Args:
+            model_path (str): Full path to the model folder
+            max_length (int, optional): Every input gets truncated/padded to this many tokens. Defaults to 256.
+            batch_size (int, optional): Amount of documents per inference. Defaults to 32.
+        """
+        self.model_path = model_path
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+        self.tokenizer, self.session = load_onnx_model(model_path, max_length)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """__call__ Embeds documents
+
+        Args:
+            input (Documents): List of strings
+
+        Returns:
+            Embeddings: One normalized embedding per document
+        """
+        embeddings: List[np.ndarray] = []
+        for start in range(0, len(input), self.batch_size):
+            embeddings.extend(self._embed_batch(input[start:start+self.batch_size]))
+        return embeddings # type: ignore
+
+    def _embed_batch(self, documents: Documents) -> np.ndarray:
+        """_embed_batch Embeds a single batch
+
+        Tokenizes the batch, runs the model and mean-pools the
+        token embeddings (ignoring padding) into one normalized
+        embedding per document.
+
+        Args:
+            documents (Documents): Batch of strings
+
+        Returns:
+            np.ndarray: Embeddings with shape (documents, dimensions)
+        """
+        inputs = encode_inputs(self.tokenizer, list(documents))
+        output = self.session.run(
+            None,
+            {name: value for name, value in inputs.items() if name in self.input_names}
+        )[0]
+
+        if output.ndim == 3:
+            # token embeddings, so mean-pool them
+            mask = inputs["attention_mask"][..., np.newaxis].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return (output / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    @staticmethod
+    def name() -> str:
+        return "athena_onnx"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            'model_path': self.model_path,
+            'max_length': self.max_length,
+            'batch_size': self.batch_size
+        }
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> EmbeddingFunction:
+        return ONNXEmbeddingFunction(
+            model_path=config["model_path"],
+            max_length=config.get("max_length", 256),
+            batch_size=config.get("batch_size", 32)
+        )
+
+
+def create_embedding_function(
+    config: 'Config',
+    cache_path: Optional[str] = None
+) -> EmbeddingFunction:
+    """create_embedding_function Creates the embedding function
+
+    Creates the embedding function of the in the config file
+    defined backend and wraps it in the embedding cache
+    if the cache is enabled.
+
+    NOTE: Every backend creates different embeddings, so collections
+    created with another backend have to be deleted first (see tools/rm.py)
+
+    Args:
+        config (Config): Configuration
+        cache_path (Optional[str], optional): Full path to the cache file. Defaults to None (no cache).
+
+    Raises:
+        ValueError: If the backend is unknown
+
+    Returns:
+        EmbeddingFunction: Embedding function for ChromaDB collections
+    """
+    match config.embedding_backend.value:
+        case EmbeddingBackends.OPENAI.value:
+            embedding_function: EmbeddingFunction = OpenAIEmbeddingFunction(
+                api_key=os.getenv("CHROMA_OPENAI_API_KEY"),
+                model_name=config.embedding_model
+            )
+            model_name = config.embedding_model
+        case EmbeddingBackends.ONNX.value:
+            embedding_function = ONNXEmbeddingFunction(
+                model_path=config.embedding_model_path,
+                max_length=config.embedding_max_length,
+                batch_size=config.embedding_batch_size
+            )
+            model_name = f"onnx:{os.path.basename(os.path.normpath(config.embedding_model_path))}:{config.embedding_max_length}"
+        case _:
+            raise ValueError(f"Unknown embedding backend: {config.embedding_backend}")
+
+    if config.embedding_cache and cache_path:
+        embedding_function = CachedEmbeddingFunction(
+            embedding_function=embedding_function,
+            model_name=model_name,
+            path=cache_path,
+            max_size=config.embedding_cache_size * 1024 * 1024
+        )
+    return embedding_function
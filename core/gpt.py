@@ -1,21 +1,46 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime
 from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
     Union,
     Optional,
-    List
-)
-from chromadb.api.types import (
-    Document,
-    Documents
+    TYPE_CHECKING
 )
 from Athena.core.db import DBManager
 from Athena.core.config import *
-from Athena.common.logger import log_event
+from Athena.common.logger import (
+    log_event,
+    get_logger
+)
 from Athena.common.types import QueryData
+from Athena.core.packer import (
+    ContextPacker,
+    PackedContext,
+    count_tokens,
+    group_turns,
+    MESSAGE_OVERHEAD
+)
+from Athena.core.response_cache import (
+    config_key,
+    ids_key
+)
+from Athena.core.prompts import (
+    PromptTemplate,
+    get_template,
+    load_schema
+)
+
+if TYPE_CHECKING:
+    from Athena.core.search import SearchEngine
 
 load_dotenv()
+log = get_logger()
 
 class GPTQuery:
     def __init__(
@@ -24,7 +49,9 @@ class GPTQuery:
         data: QueryData,
         config: Config,
         schema_path: Optional[str] = None, 
-        instant_request: bool = True
+        instant_request: bool = True,
+        search_engine: Optional['SearchEngine'] = None,
+        session_id: Optional[str] = None
     ) -> None:
         """__init__ Initialises GPTQuery
 
@@ -37,6 +64,10 @@ class GPTQuery:
         model response (like max tokens, model & more), schema path for
         the response JSON schema and instant request boolean to immediately
         send a request when initialised.
+        
+        If the QueryData has no search results yet, the search engine
+        searches VData while the memories are looked up (see retrieve()).
+        Only memories of the session of the QueryData are used.
 
         Args:
             db (db.DBManager): DBManager for past memories
@@ -44,15 +75,28 @@ class GPTQuery:
             config (Config): Configuration
             schema_path (Optional[str], optional): Path to JSON schema. Defaults to None.
             instant_request (bool, optional): Automatically send request to OpenAI. Defaults to True.
+            search_engine (Optional[SearchEngine], optional): Searches VData if data has no results. Defaults to None.
+            session_id (Optional[str], optional): Session of the conversation, replaces data.session_id. Defaults to None.
         """
         self.db = db
         self.data = data
         self.config = config
+        if session_id:
+            self.data.session_id = session_id
+        self.search_engine = search_engine
+        self.timings: dict[str, float] = {}     # ms per retrieval leg
+        self.packed: Optional[PackedContext] = None
+        self.tokens_per_second: Optional[float] = None  # streaming only
+        self.usage: dict[str, int] = {}         # input/output/total tokens reported by OpenAI
+        self.cached = False                     # response came from the response cache
+        self._cache_key: Optional[tuple[str, str, Any]] = None
+        self._content: Optional[str] = None     # rendered once the retrieval is done
         
         if schema_path:
             self.schema = self.get_schema(schema_path)
         else:
             self.schema = {}
+        self.template: PromptTemplate = get_template(config.output_type, config.output_header.header, schema_path)
         if instant_request:
             self.response = self.new_response()
     
@@ -60,70 +104,43 @@ class GPTQuery:
     def _prompt_content(self) -> str:
         """_prompt_content Returns the content of the prompt
 
-        Returns the JSON schema, search results from
-        ChromaDB, recent memories and latest user query
-        as a partially formatted large string.
+        Returns the search results from ChromaDB, recent
+        memories and latest user query as a partially formatted
+        large string. The header and JSON schema are part of the
+        system message instead (see core/prompts.py).
+        
+        It's only rendered once per retrieval.
 
         Returns:
             str: Prompt body content
         """
-        json_schema = ""
-        
-        if self.config.output_type == OutputTypes.JSON:
-            json_schema = self._stringize_prompt_schema()
-        
-        query = self.data.query
-        documents: List[Documents] = self.data.result["documents"] or [[]]
-        context: Document = "\n".join(documents[0])
-        
-        return f"""
-        JSON-Schema:
-        {json_schema}
-        
-        Search results from database: 
-        {context}
-        Most recent memories:
-        {self.db.chat_history.stringize_recent_memories}
-        Latest User-Query: {query}
-        """
+        if self._content is None:
+            if self.packed:
+                # the packed recent memories are already part of the chat input
+                self._content = self.template.render(self.packed.contents('search'), None, self.data.query)
+            else:
+                self._content = self.template.render(
+                    self.data.result.documents if self.data.result else [],
+                    self.db.chat_history.stringize_recent_memories(self.data.session_id),
+                    self.data.query
+                )
+        return self._content
     
     @property
     def prompt(self) -> str:
         """prompt Returns the full prompt to OpenAI
 
-        Joins the header and body content of the prompt
-        and returns it
+        Joins the static prefix (header and JSON schema) and
+        body content of the prompt and returns it
 
         Returns:
             str: Entire OpenAI prompt
         """
-        llm_head = self.config.output_header.header
+        llm_head = self.template.system
         llm_content = self._prompt_content
         
         return "".join([llm_head, llm_content])
     
-    @log_event("Turning JSON-Schema into string...")
-    def _stringize_prompt_schema(self) -> str:
-        """_stringize_prompt_schema Turns the JSON schema into a string
-
-        Turns the JSON schema into a string. Each key contains
-        a name, data type and description so the AI won't mess up the schema.
-
-        Returns:
-            str: JSON schema as string
-        """
-        cleaned_properties_list = []
-        
-        properties = self.schema["format"]["schema"]["properties"]
-        for property_name, definition in properties.items():
-            property_type = definition['type']
-            property_description = definition['description']
-            
-            cleaned_properties_list.append(
-                f"'{property_name}' [{property_type}]: {property_description}"
-            )
-        return "\n".join(cleaned_properties_list)
-    
     @log_event("Converting JSON-Schema structured output into string...")
     def _validate_json_schema(self) -> dict:
         """_validate_json_schema Returns schema if necessary
@@ -147,6 +164,7 @@ class GPTQuery:
 
         Loads the file of a given path and interprets
         it as a JSON file, loading it as a dictionary.
+        Every file is only read once per process (see core/prompts.py).
 
         Args:
             path (str): Full path to the JSON schema
@@ -158,19 +176,169 @@ class GPTQuery:
         Returns:
             dict: _description_
         """
-        path = os.path.realpath(path)
-        if os.path.exists(path):
-            try:
-                with open(path, "r") as j:
-                    return json.load(j)
-            except:
-                raise Exception("Couldn't load JSON file. Check if path is correct.")
+        schema = load_schema(path)
+        if schema is not None:
+            return schema
         else:
+            path = os.path.realpath(path)
             if self.config.output_type == OutputTypes.JSON.name:
                 raise ValueError(f"Couldn't find file at '{path}'.")
             else:
                 return {}
     
+    def _timed(
+        self,
+        leg: str,
+        func: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any
+    ) -> Any:
+        """_timed Calls a function and saves its duration
+
+        Args:
+            leg (str): Name of the retrieval leg
+            func (Callable[..., Any]): Function to call
+
+        Returns:
+            Any: Return value of the function
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.timings[leg] = (time.perf_counter() - start) * 1000
+    
+    def _search(self) -> None:
+        self.data.result = self.search_engine.search_collection( # type: ignore
+            self.data.query,
+            context=self.data.context
+        )
+    
+    @log_event("Retrieving search results and memories...")
+    def retrieve(self) -> List[dict[str, Any]]:
+        """retrieve Retrieves everything needed for the prompt
+
+        Runs the VData search (if there are no search results yet),
+        the memory similarity search and the recent memory lookup.
+        None of them depend on each other, so with concurrent retrieval
+        they run in parallel and the time until the prompt is ready is
+        the time of the slowest leg instead of the sum of all legs.
+        
+        The duration of every leg (and the total) is saved
+        in `self.timings` in milliseconds.
+
+        Returns:
+            List[dict[str, Any]]: Chat context (see GPTMemory.response_input())
+        """
+        legs = self._retrieval_legs()
+        
+        self.timings = {}
+        start = time.perf_counter()
+        if self.config.concurrent_retrieval:
+            with ThreadPoolExecutor(max_workers=len(legs)) as executor:
+                futures = {
+                    leg: executor.submit(self._timed, leg, func, *args)
+                    for leg, (func, args) in legs.items()
+                }
+                results = {leg: future.result() for leg, future in futures.items()}
+        else:
+            results = {leg: self._timed(leg, func, *args) for leg, (func, args) in legs.items()}
+        self.timings['total'] = (time.perf_counter() - start) * 1000
+        
+        log.info(
+            "retrieve: " + ", ".join(f"{leg} {ms:.1f} ms" for leg, ms in self.timings.items())
+        )
+        return self._build_input(results)
+    
+    def _retrieval_legs(self) -> dict[str, tuple[Callable[..., Any], tuple]]:
+        """_retrieval_legs Returns the independent retrieval steps
+
+        Returns:
+            dict[str, tuple[Callable[..., Any], tuple]]: Name, function and arguments of every leg
+        """
+        memory = self.db.chat_history
+        legs: dict[str, tuple[Callable[..., Any], tuple]] = {
+            'memory_similar': (memory.similar_responses, (self.data.query, self.data.context, self.data.session_id)),
+            # every memory is a user input and a model output
+            'memory_recent': (memory.recent_responses, (2 * self.config.max_entries, self.data.session_id))
+        }
+        if self.data.result is None and self.search_engine:
+            legs['search'] = (self._search, ())
+        return legs
+    
+    def _build_input(self, results: dict[str, Any]) -> List[dict[str, Any]]:
+        """_build_input Builds the chat context from the retrieval results
+
+        Args:
+            results (dict[str, Any]): Return value of every retrieval leg
+
+        Returns:
+            List[dict[str, Any]]: Chat context (see GPTMemory.response_input())
+        """
+        self._content = None
+        if self.config.context_packing:
+            return self.pack(results['memory_recent'], results['memory_similar'])
+        return self.db.chat_history.build_response_input(
+            self.template.system,
+            results['memory_recent'],
+            [memory for memory, _ in results['memory_similar']]
+        )
+    
+    def pack(
+        self,
+        recent_inputs: List[dict[str, Any]],
+        filtered_inputs: List[tuple[dict[str, Any], float]]
+    ) -> List[dict[str, Any]]:
+        """pack Fits the retrieved context into the input token budget
+
+        Search results, recent memories and similar memories all
+        compete for the tokens that are left after the system prompt,
+        schema and user query (see core/packer.py). What's kept is
+        saved in `self.packed`, which also reports what was dropped.
+        
+        Search results and similar memories are scored by their
+        relevance to the query, recent memories by their age. Recent
+        memories are packed per turn, so a reply is never sent
+        without its question.
+
+        Args:
+            recent_inputs (List[dict[str, Any]]): Most recent responses (oldest first)
+            filtered_inputs (List[tuple[dict[str, Any], float]]): Responses relevant to the user query and their distance to it (see GPTMemory.similar_responses())
+
+        Returns:
+            List[dict[str, Any]]: Chat context (see GPTMemory.build_response_input())
+        """
+        packer = ContextPacker(self.config.context_max_tokens)
+        similar = [(rsp, distance) for rsp, distance in filtered_inputs if rsp not in recent_inputs]
+        result = self.data.result
+        candidates = (
+            packer.candidates(
+                'search',
+                result.documents if result else [],
+                result.relevance() if result else None
+            )
+            + packer.candidates('recent', group_turns(recent_inputs)[::-1])    # newest first
+            + packer.candidates(
+                'similar',
+                [rsp for rsp, _ in similar],
+                [1 / (1 + max(distance, 0.0)) for _, distance in similar]
+            )
+        )
+        fixed_tokens = (
+            self.template.prefix_tokens
+            + count_tokens(self.template.render([], None, self.data.query))
+            + 2 * MESSAGE_OVERHEAD
+        )
+        self.packed = packer.pack(candidates, fixed_tokens)
+        
+        report = self.packed.report()
+        log.info(f"pack: Packed {report['tokens']}/{report['budget']} tokens, sources: {report['sources']}")
+        return self.db.chat_history.build_response_input(
+            self.template.system,
+            [message for turn in self.packed.contents('recent')[::-1] for message in turn],
+            self.packed.contents('similar')
+        )
+    
     @log_event("Waiting for OpenAI response...")
     def new_response(
         self, 
@@ -196,8 +364,33 @@ class GPTQuery:
         Returns:
             Union[dict, str]: Either a dictionary (JSON) or string (Plain-text/Markdown)
         """
+        params = self._request_params()
+        cached = self._cached_response(params)
+        if cached is not None:
+            return self._finish(cached, add_to_memory)
+        
+        start = time.perf_counter()
+        rsp = self.db.openai_client.responses.create(
+            **params
+        )
+        self.timings['generation'] = (time.perf_counter() - start) * 1000
+        self._record_usage(rsp.usage)
+        self._cache_response(rsp.output_text, rsp.status)
+        return self._finish(rsp.output_text, add_to_memory, rsp.status)
+    
+    def _request_params(self, chat_input: Optional[List[dict[str, Any]]] = None) -> dict:
+        """_request_params Returns the parameters of the OpenAI request
+
+        Retrieves the chat context (if not given) and appends the prompt.
+
+        Args:
+            chat_input (Optional[List[dict[str, Any]]], optional): Already retrieved chat context. Defaults to None.
+
+        Returns:
+            dict: Parameters for responses.create()
+        """
         base_params = self.config.base_params
-        base_params["input"] = self.db.chat_history.response_input(self.config.output_header.header, self.data.query)
+        base_params["input"] = self.retrieve() if chat_input is None else chat_input
         base_params["input"].append(
             {
                 "role": "user",
@@ -207,25 +400,219 @@ class GPTQuery:
         
         if self.config.output_type == OutputTypes.JSON:
             base_params["text"] = self._validate_json_schema()
+        return base_params
+    
+    def _cached_response(self, params: dict) -> Optional[str]:
+        """_cached_response Looks up the response cache
+
+        Needs the retrieval to be done, as the retrieved documents
+        are part of the key (see core/response_cache.py).
         
-        rsp = self.db.openai_client.responses.create(
-            **base_params
-        )
+        Turns with memories in the chat input are only cached for
+        their own session (the session is part of the key), so the
+        memories of one session never leak into another one, while
+        repeated questions within a session still hit the cache.
+        Turns without memories are shared by every session, and
+        they're also used for turns with memories if the session
+        has no response of its own yet.
+
+        Args:
+            params (dict): Parameters for responses.create()
+
+        Returns:
+            Optional[str]: Cached model output or None
+        """
+        cache = self.db.response_cache
+        self._cache_key = None
+        if cache is None or self.data.context is None:
+            return None
         
+        # everything between the system message and the prompt are memories
+        session = self.data.session_id if params['input'][1:-1] else None
+        start = time.perf_counter()
+        shared = config_key({**params, 'system': self.template.system, 'session': None})
+        self._cache_key = (
+            config_key({**params, 'system': self.template.system, 'session': session}) if session else shared,
+            ids_key(self.data.result.ids if self.data.result else []),
+            self.data.context.embedding
+        )
+        cached = cache.get(*self._cache_key, fallback_config=shared if session else None)
+        self.timings['cache'] = (time.perf_counter() - start) * 1000
+        self.cached = cached is not None
+        if self.cached:
+            log.info(f"_cached_response: Cache hit in {self.timings['cache']:.1f} ms")
+        return cached
+    
+    def _cache_response(
+        self,
+        output_text: str,
+        status: Optional[str]
+    ) -> None:
+        # incomplete (e.g. cut off by max_output_tokens) or failed responses are never cached
+        if status != "completed":
+            return
+        if self.db.response_cache is not None and self._cache_key is not None and output_text:
+            self.db.response_cache.set(*self._cache_key, output_text)
+    
+    def _finish(
+        self,
+        output_text: str,
+        add_to_memory: bool,
+        status: Optional[str] = "completed"
+    ) -> Union[dict, str]:
+        """_finish Handles the finished model output
+
+        Adds the output to the memories (if wanted) and
+        decodes it if using the JSON output_type. Incomplete
+        outputs (e.g. cut off by max_output_tokens) are never
+        added to the memories.
+
+        Args:
+            output_text (str): Full model output
+            add_to_memory (bool): If user input and model output should be added to memories
+            status (Optional[str], optional): Status of the OpenAI response. Defaults to "completed".
+
+        Returns:
+            Union[dict, str]: Either a dictionary (JSON) or string (Plain-text/Markdown)
+        """
+        if add_to_memory and status != "completed":
+            log.info(f"_finish: Response is {status}, not adding it to the memories")
+            add_to_memory = False
         if add_to_memory:
-            self.data.rsp = rsp.output_text
+            self.data.rsp = output_text
             self.db.chat_history.add_context(self.data)
         if self.config.output_type == OutputTypes.JSON:
             try:
-                return json.loads(rsp.output_text)
+                return json.loads(output_text)
             except json.JSONDecodeError:
                 log_event(
                     f"JSON decoding failed. Mayhaps not sufficient tokens\n"
                     f"(max_output_tokens={self.config.response.max_output_tokens}). Returning plain-text instead!"
                 )
-                return rsp.output_text
+                return output_text
         else:
-            return rsp.output_text
+            return output_text
+    
+    @log_event("Streaming OpenAI response...")
+    def stream_response(
+        self,
+        add_to_memory: bool = True
+    ) -> Iterator[str]:
+        """stream_response Streams a response from OpenAI
+
+        Works like new_response() but yields the text of the
+        response piece by piece as soon as OpenAI sends it, so it
+        can be shown right away. Once the stream is done, the full
+        response is saved in `self.response` (and added to the memories).
+        
+        The time until the first piece of text (since calling this
+        method, so including the retrieval) and the generation time
+        are saved in `self.timings` as 'first_token' and 'generation'
+        in milliseconds, the output speed in `self.tokens_per_second`.
+
+        Args:
+            add_to_memory (bool, optional): If user input and model output 
+            should be added to memories. Defaults to True.
+
+        Raises:
+            RuntimeError: If OpenAI reports an error or the response failed
+
+        Yields:
+            Iterator[str]: Pieces (deltas) of the response text
+        """
+        start = time.perf_counter()
+        params = self._request_params()
+        cached = self._cached_response(params)
+        if cached is not None:
+            self.timings['first_token'] = (time.perf_counter() - start) * 1000
+            yield cached
+            self.response = self._finish(cached, add_to_memory)
+            return
+        
+        stream = self.db.openai_client.responses.create(
+            **params,
+            stream=True
+        )
+        
+        chunks: List[str] = []
+        first_token: Optional[float] = None
+        output_tokens: Optional[int] = None
+        status: Optional[str] = None
+        try:
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                        self.timings['first_token'] = (first_token - start) * 1000
+                    chunks.append(event.delta)
+                    yield event.delta
+                elif event.type in ("response.completed", "response.incomplete"):
+                    status = event.response.status
+                    if event.response.usage:
+                        self._record_usage(event.response.usage)
+                        output_tokens = event.response.usage.output_tokens
+                elif event.type in ("error", "response.failed"):
+                    raise RuntimeError(f"OpenAI stream failed: {self._stream_error(event)}")
+        finally:
+            # also closes the connection if the consumer stopped early
+            stream.close()
+        
+        output_text = "".join(chunks)
+        self._record_stream(first_token, output_text, output_tokens)
+        self._cache_response(output_text, status)
+        self.response = self._finish(output_text, add_to_memory, status)
+    
+    @staticmethod
+    def _stream_error(event: Any) -> str:
+        """_stream_error Returns the error message of a stream event
+
+        Args:
+            event (Any): "error" or "response.failed" event
+
+        Returns:
+            str: Error message
+        """
+        if event.type == "error":
+            return f"{event.message} (code: {event.code})"
+        error = getattr(event.response, 'error', None)
+        return f"{error.message} (code: {error.code})" if error else "response failed"
+    
+    def _record_usage(self, usage: Any) -> None:
+        """_record_usage Saves the token usage of a response
+
+        Args:
+            usage (Any): Usage of the OpenAI response (None if not reported)
+        """
+        if usage is None:
+            return
+        details = getattr(usage, 'input_tokens_details', None)
+        self.usage = {
+            'input_tokens': usage.input_tokens,
+            'cached_tokens': getattr(details, 'cached_tokens', 0) or 0,
+            'output_tokens': usage.output_tokens,
+            'total_tokens': usage.total_tokens
+        }
+    
+    def _record_stream(
+        self,
+        first_token: Optional[float],
+        output_text: str,
+        output_tokens: Optional[int]
+    ) -> None:
+        """_record_stream Saves generation time and output speed of a stream
+
+        Args:
+            first_token (Optional[float]): perf_counter() at the first delta (None if there was none)
+            output_text (str): Full model output
+            output_tokens (Optional[int]): Output tokens reported by OpenAI
+        """
+        if first_token is not None:
+            generation = time.perf_counter() - first_token
+            self.timings['generation'] = generation * 1000
+            if output_tokens is None:
+                output_tokens = count_tokens(output_text)
+            self.tokens_per_second = output_tokens / generation if generation > 0 else None
+        log.info(f"_record_stream: first token {self.timings.get('first_token', 0):.0f} ms, {self.tokens_per_second or 0:.1f} tokens/s")
     
     @log_event("Saving debug message...")
     def save_debug(self) -> None:
@@ -242,9 +629,9 @@ class GPTQuery:
         """
         debug_info = {
             'query': self.data.query,
-            'search_results': json.dumps(self.data.result["documents"]),
+            'search_results': json.dumps(self.data.result.documents),
             'output_type': f"{self.config.output_type.name} --> {self.config.output_type.value}",
-            'prompt_header': self.config.output_header.header,
+            'prompt_header': self.template.system,
             'prompt_content': self._prompt_content,
             'json_schema': json.dumps(self.schema),
             'response': self.response
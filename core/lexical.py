@@ -0,0 +1,315 @@
+import json
+import math
+import os
+import pickle
+import re
+from threading import Lock
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence
+)
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+INDEX_VERSION = 2    # bump whenever documents get tokenized differently, old index files are rebuilt
+
+
+def document_text(document: str) -> str:
+    """document_text Returns the text of a stored document
+
+    JSON documents are stored with escaped non-ASCII characters
+    (e.g. 'M\\u00fcller'), which would end up as terms. This
+    decodes them back into readable JSON. Other documents are
+    returned as they are.
+
+    Args:
+        document (str): Stored document
+
+    Returns:
+        str: Document text to tokenize
+    """
+    if "\\u" not in document or document.lstrip()[:1] not in ("{", "["):
+        return document
+    try:
+        return json.dumps(json.loads(document), ensure_ascii=False)
+    except json.JSONDecodeError:
+        return document
+
+
+def tokenize(text: str) -> List[str]:
+    """tokenize Splits text into lexical terms
+
+    Splits text into lowercase words. Compound identifiers like
+    SKUs, error codes or versions (e.g. 'ERR-404', 'v1.2.3') are
+    kept as a whole *and* split into their parts, so both exact
+    and partial lookups match.
+
+    Args:
+        text (str): Any string
+
+    Returns:
+        List[str]: List of terms
+    """
+    terms = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(match)
+        if not match.isalnum():
+            terms.extend(part for part in re.split(r"[-./:]", match) if part)
+    return terms
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]],
+    k: int = 60
+) -> List[tuple[str, float]]:
+    """reciprocal_rank_fusion Fuses several rankings
+
+    Fuses rankings of document IDs by summing 1 / (k + rank)
+    for every ranking a document appears in.
+
+    Args:
+        rankings (Sequence[Sequence[str]]): Rankings of document IDs (best first)
+        k (int, optional): Damping constant. Defaults to 60.
+
+    Returns:
+        List[tuple[str, float]]: Document IDs and fused scores (best first)
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75
+    ) -> None:
+        """__init__ Initialises BM25Index
+
+        An in-process inverted index which ranks documents
+        with Okapi BM25. This finds exact identifiers, SKUs and
+        error codes which the vector search often misses.
+
+        If a saved index exists at `path` it gets loaded.
+
+        Args:
+            path (Optional[str], optional): Full path to the index file. Defaults to None (not persisted).
+            k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+            b (float, optional): Document length normalization. Defaults to 0.75.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self.doc_ids: List[Optional[str]] = []              # None if removed
+        self.doc_terms: List[Optional[Dict[str, int]]] = []
+        self.doc_lengths: List[int] = []
+        self.positions: Dict[str, int] = {}                 # doc id -> position
+        self.postings: Dict[str, Dict[int, int]] = {}       # term -> {position: term frequency}
+        self.total_length = 0
+
+        self._lengths: Optional[np.ndarray] = None
+        self._lock = Lock()
+
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def ids(self) -> List[str]:
+        """ids Returns the IDs of every indexed document
+
+        Returns:
+            List[str]: Document IDs
+        """
+        with self._lock:
+            return list(self.positions)
+
+    def add(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str]
+    ) -> None:
+        """add Adds documents to the index
+
+        Documents with an ID that's already indexed get replaced.
+        JSON documents are decoded first (see document_text()).
+
+        Args:
+            ids (Sequence[str]): IDs of the documents
+            documents (Sequence[str]): Documents
+        """
+        with self._lock:
+            for doc_id, doc in zip(ids, documents):
+                self._remove(doc_id)
+
+                terms: Dict[str, int] = {}
+                for term in tokenize(document_text(doc)):
+                    terms[term] = terms.get(term, 0) + 1
+
+                position = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self.doc_terms.append(terms)
+                self.doc_lengths.append(sum(terms.values()))
+                self.positions[doc_id] = position
+                self.total_length += self.doc_lengths[position]
+
+                for term, frequency in terms.items():
+                    self.postings.setdefault(term, {})[position] = frequency
+            self._lengths = None
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """remove Removes documents from the index
+
+        Args:
+            ids (Iterable[str]): IDs of the documents
+        """
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+            self._lengths = None
+
+    def _remove(self, doc_id: str) -> None:
+        position = self.positions.pop(doc_id, None)
+        if position is None:
+            return
+
+        for term in self.doc_terms[position] or {}:
+            postings = self.postings[term]
+            del postings[position]
+            if not postings:
+                del self.postings[term]
+
+        self.total_length -= self.doc_lengths[position]
+        self.doc_ids[position] = None
+        self.doc_terms[position] = None
+        self.doc_lengths[position] = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self.doc_ids, self.doc_terms, self.doc_lengths = [], [], []
+            self.positions, self.postings = {}, {}
+            self.total_length = 0
+            self._lengths = None
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 10
+    ) -> List[tuple[str, float]]:
+        """search Searches the index
+
+        Args:
+            query (str): User query
+            n_results (int, optional): Max amount of results. Defaults to 10.
+
+        Returns:
+            List[tuple[str, float]]: Document IDs and BM25 scores (best first)
+        """
+        with self._lock:
+            count = len(self.positions)
+            if not count:
+                return []
+
+            if self._lengths is None:
+                self._lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+            average_length = self.total_length / count
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+
+                positions = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                frequencies = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[positions] / average_length)
+                scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+            matches = np.flatnonzero(scores)
+            if len(matches) > n_results:
+                matches = matches[np.argpartition(-scores[matches], n_results)[:n_results]]
+            matches = matches[np.argsort(-scores[matches], kind="stable")]
+            return [(self.doc_ids[i], float(scores[i])) for i in matches] # type: ignore
+
+    def save(self) -> None:
+        """save Saves the index
+
+        Saves the index (without removed documents) to its path.
+        The file gets replaced atomically so a crash never leaves
+        a half-written index behind.
+        """
+        if not self.path:
+            return
+
+        with self._lock:
+            self._compact()
+            state = {
+                'version': INDEX_VERSION,
+                'k1': self.k1,
+                'b': self.b,
+                'doc_ids': self.doc_ids,
+                'doc_terms': self.doc_terms,
+            }
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "wb") as file:
+                pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+
+    def load(self) -> None:
+        """load Loads the index from its path
+
+        Index files of an older version aren't loaded, so the
+        index stays empty and gets rebuilt from the collection
+        (see DBManager.sync_lexical_index()).
+        """
+        with open(self.path, "rb") as file: # type: ignore
+            state = pickle.load(file)
+        if state.get("version") != INDEX_VERSION:
+            return
+
+        with self._lock:
+            self.k1 = state["k1"]
+            self.b = state["b"]
+            self.doc_ids = state["doc_ids"]
+            self.doc_terms = state["doc_terms"]
+            self._rebuild()
+
+    def _compact(self) -> None:
+        """_compact Drops removed documents
+
+        Removed documents leave holes in the positions, so this
+        rebuilds the index without them once there are any.
+        """
+        if len(self.doc_ids) == len(self.positions):
+            return
+
+        kept = [i for i, doc_id in enumerate(self.doc_ids) if doc_id is not None]
+        self.doc_ids = [self.doc_ids[i] for i in kept]
+        self.doc_terms = [self.doc_terms[i] for i in kept]
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.positions = {}
+        self.postings = {}
+        self.doc_lengths = []
+        for position, (doc_id, terms) in enumerate(zip(self.doc_ids, self.doc_terms)):
+            terms = terms or {}
+            self.doc_lengths.append(sum(terms.values()))
+            if doc_id is None:
+                continue
+            self.positions[doc_id] = position
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, {})[position] = frequency
+        self.total_length = sum(self.doc_lengths)
+        self._lengths = None
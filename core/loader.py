@@ -0,0 +1,127 @@
+import codecs
+import json
+import os
+from typing import (
+    Any,
+    Iterator
+)
+
+
+class JSONStreamLoader:
+    def __init__(
+        self,
+        filename: str,
+        chunk_size: int = 1024 * 1024
+    ) -> None:
+        """__init__ Initialises JSONStreamLoader
+
+        This class loads JSON and JSONL files object by object
+        instead of loading the entire file into RAM, so the memory
+        usage stays flat no matter how large the file is.
+
+        Args:
+            filename (str): Full path to the file
+            chunk_size (int, optional): Bytes read from the file at once. Defaults to 1 MB.
+        """
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.size = os.path.getsize(filename)
+        self.position = 0   # bytes read so far
+
+    @property
+    def progress(self) -> float:
+        """progress Returns the loading progress
+
+        Returns:
+            float: Progress between 0.0 and 1.0
+        """
+        return self.position / self.size if self.size else 1.0
+
+    def iter_array(self) -> Iterator[Any]:
+        """iter_array Yields every object of a JSON file
+
+        Yields the objects of a top-level JSON array one by one.
+        If the top-level value isn't an array, the value itself is
+        the only object yielded.
+
+        Raises:
+            json.JSONDecodeError: If the file isn't valid JSON
+
+        Yields:
+            Iterator[Any]: Pythonic JSON objects
+        """
+        json_decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("UTF-8")()
+        buffer = ""
+        index = 0
+        eof = False
+
+        with open(self.filename, "rb") as file:
+            def read(size: int) -> bool:
+                nonlocal buffer, index, eof
+                data = file.read(size)
+                self.position += len(data)
+                eof = not data
+                # throw away everything we already parsed
+                buffer = buffer[index:] + text_decoder.decode(data, final=eof)
+                index = 0
+                return not eof
+
+            def skip(chars: str) -> None:
+                nonlocal index
+                while True:
+                    while index < len(buffer) and buffer[index] in chars:
+                        index += 1
+                    if index < len(buffer) or not read(self.chunk_size):
+                        return
+
+            skip(" \t\r\n\ufeff")
+            if index >= len(buffer):
+                return
+
+            if buffer[index] != "[":
+                # not an array, so there's only one object in the file
+                while read(self.chunk_size):
+                    pass
+                yield json.loads(buffer[index:])
+                return
+            index += 1
+
+            while True:
+                skip(" \t\r\n,")
+                if index >= len(buffer):
+                    raise json.JSONDecodeError("Unterminated JSON array", buffer, index)
+                if buffer[index] == "]":
+                    return
+
+                try:
+                    obj, end = json_decoder.raw_decode(buffer, index)
+                    # a number right at the end of the buffer might be cut off
+                    if end < len(buffer) or eof:
+                        index = end
+                        yield obj
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                # object is larger than the buffer, grow it geometrically
+                # so large objects don't get re-parsed over and over
+                read(max(self.chunk_size, len(buffer) - index))
+
+    def iter_lines(self) -> Iterator[Any]:
+        """iter_lines Yields every object of a JSONL file
+
+        Yields the objects of a JSON-lines file one by one.
+        Blank lines are skipped.
+
+        Raises:
+            json.JSONDecodeError: If any line isn't valid JSON
+
+        Yields:
+            Iterator[Any]: Pythonic JSON objects
+        """
+        with open(self.filename, "rb") as file:
+            for line in file:
+                self.position += len(line)
+                if line.strip():
+                    yield json.loads(line)
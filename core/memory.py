@@ -1,19 +1,24 @@
 import json
 import os
 from ast import literal_eval
+import time
 from datetime import datetime
+from threading import Lock
 from typing import (
+    Dict,
     List,
     Any,
+    Optional,
     Union,
     TYPE_CHECKING
 )
 
 from chromadb.api import ClientAPI
 from chromadb.api.types import (
-    Document
+    Document,
+    Metadata
 )
-from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from chromadb.api.types import EmbeddingFunction
 from openai import OpenAI
 
 import Athena.common.utils as utils
@@ -21,22 +26,35 @@ import chromadb
 from Athena.common.logger import log_event
 from Athena.common.types import (
     QueryData,
-    OutputTypes
+    OutputTypes,
+    ShorteningStrategies,
+    DEFAULT_SESSION
 )
 from Athena.core.config import (
+    Config,
     InputTypes
 )
+from Athena.core.embeddings import create_embedding_function
+from Athena.core.conversation import ConversationLog
+from Athena.core.compression import CompressionWorker
+from Athena.core.summarizer import ExtractiveSummarizer
+from Athena.core.retention import MemoryRetention
+from Athena.common.cache import LRUCache
+from Athena import _conversation_log_path
 
 if TYPE_CHECKING:
-    from config import Config
+    from Athena.core.context import QueryContext
+
+DECODED_CACHE_SIZE = 4096    # decoded memories kept in RAM
 
 class GPTMemory:
     def __init__(
         self, 
         chroma_client: ClientAPI,
         openai_client: OpenAI,
-        openai_embedding: OpenAIEmbeddingFunction,
+        embedding_function: EmbeddingFunction,
         config: 'Config',
+        log_path: Optional[str] = None
     ) -> None:
         """__init__ Initialises GPTMemory
 
@@ -46,35 +64,199 @@ class GPTMemory:
         to filter out irrelevant information for the OpenAI model
         to save tokens and time.
         
-        Additionally, we use another OpenAI client and embedding
-        function to shorten input data to save even more tokens
-        while maintaining good understanding.
+        Additionally, we use another OpenAI client to shorten
+        input data to save even more tokens while maintaining
+        good understanding. The embedding function is the same
+        one the DBManager uses for its collection.
+        
+        Every memory is also appended to an ordered conversation
+        log (see core/conversation.py) which serves the most
+        recent memories without scanning the whole collection.
+        
+        Memories belong to a session (see QueryData.session_id), so one
+        GPTMemory can serve many conversations at once. Every session
+        has its own buffer of recent memories in RAM. Buffers of idle
+        sessions get evicted and reloaded from the log when needed.
 
         Args:
             chroma_client (ClientAPI): ChromaDB ClientAPI
             openai_client (OpenAI): OpenAI Client
-            openai_embedding (OpenAIEmbeddingFunction): OpenAI EF
+            embedding_function (EmbeddingFunction): Embedding function (see core/embeddings.py)
             config (Config): Configuration (model, max tokens etc.)
+            log_path (Optional[str], optional): Full path to the conversation log. Defaults to None (./_internal/conversation.sqlite3).
         """
         self.config = config
         self.openai_client = openai_client
         self.chroma_client = chroma_client
-        self.openai_ef = openai_embedding
+        self.embedding_function = embedding_function
         
         self.chroma_collection = self.chroma_client.get_or_create_collection(
             name="MemoryDB",
-            embedding_function=self.openai_ef, # type: ignore
+            embedding_function=self.embedding_function, # type: ignore
             metadata = {
                 'description': 'Testing with AI',
                 'created': str(datetime.now())
             }
         )
         
-        self.most_recent_memories: List[QueryData] = []
+        self.decoded_memories = LRUCache(DECODED_CACHE_SIZE)   # memory id -> {role, content}
+        self.log = ConversationLog(log_path or _conversation_log_path)
+        if not len(self.log) and self.chroma_collection.count():
+            self._backfill_log()
+        
+        self.compressor = CompressionWorker()
+        self.summarizer = ExtractiveSummarizer(self.config.tokens_per_memory)
+        
+        self.sessions = LRUCache(self.config.max_sessions, ttl=self.config.session_timeout)   # session id -> recent memories
+        
+        self.retention = MemoryRetention(self, self.config)
+        if self.retention.needs_compaction():
+            self.retention.compact()
+        
+        self._lock = Lock()
+        self._next_memory, self._next_turns = self._next_indices()
+        
         self.max_entries = self.config.max_entries
         self.max_search_results = self.config.max_search_results
         self.tokens_per_memory = self.config.tokens_per_memory
     
+    def _backfill_log(self) -> None:
+        """_backfill_log Fills the conversation log from MemoryDB
+
+        Copies memories which were stored before there was a
+        conversation log, in the order they were added.
+        """
+        all_data = self.chroma_collection.get(include=["documents", "metadatas"]) # type: ignore
+        memories = sorted(
+            zip(all_data["ids"], all_data["documents"] or [], all_data["metadatas"] or []),
+            key=lambda memory: int(memory[0].removeprefix("memory") or 0)
+        )
+        ids = [memory_id for memory_id, _, _ in memories]
+        messages = [self._decode(*memory) for memory in memories]
+        valid = [i for i, message in enumerate(messages) if isinstance(message, dict)]
+        self.log.append(
+            [messages[i] for i in valid],
+            [ids[i] for i in valid]
+        )
+        
+        # memories from before there were sessions belong to the default session
+        untagged = [i for i, (_, _, metadata) in enumerate(memories) if not metadata or "session" not in metadata]
+        if untagged:
+            self.chroma_collection.update(
+                ids =       [ids[i] for i in untagged],
+                metadatas = [{**(memories[i][2] or {}), 'session': DEFAULT_SESSION} for i in untagged]
+            )
+    
+    def _next_indices(self) -> tuple[int, Dict[str, int]]:
+        """_next_indices Returns the index of the next memory ID and turns
+
+        Memories get deleted (see core/retention.py), so the amount
+        of memories isn't a free ID (or turn) anymore. Turns are
+        counted per session.
+
+        Returns:
+            tuple[int, Dict[str, int]]: Highest memory index + 1 and highest turn + 1 of every session
+        """
+        records = self.chroma_collection.get(include=["metadatas"]) # type: ignore
+        indices = [int(memory_id.removeprefix("memory")) for memory_id in records["ids"] if memory_id.removeprefix("memory").isdigit()]
+        
+        turns: Dict[str, int] = {}
+        for metadata in records["metadatas"] or []:
+            if metadata and isinstance(metadata.get('turn'), int):
+                session_id = str(metadata.get('session', DEFAULT_SESSION))
+                turns[session_id] = max(turns.get(session_id, 0), metadata['turn'] + 1) # type: ignore
+        return (max(indices) + 1 if indices else 0), turns
+    
+    def _to_record(
+        self,
+        response: dict[str, Any],
+        turn: int,
+        session_id: str = DEFAULT_SESSION
+    ) -> tuple[Document, Metadata]:
+        """_to_record Converts a response to a MemoryDB record
+
+        The content is the document itself (so it's what gets embedded)
+        and role, turn, token amount, session and creation time are 
+        stored as metadata.
+
+        Args:
+            response (dict[str, Any]): User input or model output ({role: "user", content: ""})
+            turn (int): Turn of the conversation
+            session_id (str, optional): Session of the memory. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            tuple[Document, Metadata]: Document and its metadata
+        """
+        content = response["content"]
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        
+        metadata = {
+            'role': response["role"],
+            'turn': turn,
+            'tokens': utils.words_to_tokens(len(content.split())),
+            'session': session_id,
+            'created': time.time()
+        }
+        return content, metadata
+    
+    def _decode(
+        self,
+        memory_id: str,
+        document: Document,
+        metadata: Optional[Metadata]
+    ) -> Any:
+        """_decode Converts a MemoryDB record to a response
+
+        Every decoded memory is cached by its ID, so memories
+        which are found again are just looked up.
+        
+        Memories stored before there was any metadata are strings
+        of dictionaries and still get parsed once.
+
+        Args:
+            memory_id (str): ID of the memory
+            document (Document): Document of the memory
+            metadata (Optional[Metadata]): Metadata of the memory
+
+        Returns:
+            Any: Response ({role: "user", content: ""})
+        """
+        memory = self.decoded_memories.get(memory_id)
+        if memory is not None:
+            return memory
+        
+        if metadata and "role" in metadata:
+            memory = {"role": metadata["role"], "content": document}
+        else:
+            memory = self._convert_from_string([document])[0]
+        self.decoded_memories.set(memory_id, memory)
+        return memory
+    
+    def _store(
+        self,
+        ids: List[str],
+        responses: List[dict[str, Any]],
+        turn: int,
+        session_id: str = DEFAULT_SESSION
+    ) -> None:
+        """_store Upserts responses into MemoryDB
+
+        Args:
+            ids (List[str]): IDs of the memories
+            responses (List[dict[str, Any]]): User input and model output
+            turn (int): Turn of the conversation
+            session_id (str, optional): Session of the memories. Defaults to DEFAULT_SESSION.
+        """
+        records = [self._to_record(response, turn, session_id) for response in responses]
+        self.chroma_collection.upsert(
+            ids =       ids,
+            documents = [document for document, _ in records],
+            metadatas = [metadata for _, metadata in records]
+        )
+        for memory_id, (document, metadata) in zip(ids, records):
+            self.decoded_memories.set(memory_id, {"role": metadata["role"], "content": document})
+    
     @property
     def responses(self) -> List[Document]:
         """responses Returns all responses
@@ -93,18 +275,69 @@ class GPTMemory:
             return []
     
     @property
+    def most_recent_memories(self) -> List[QueryData]:
+        return self.recent_memories(DEFAULT_SESSION)
+    
+    def recent_memories(self, session_id: str = DEFAULT_SESSION) -> List[QueryData]:
+        """recent_memories Returns the recent memories of a session
+
+        Returns the buffer of the most recent memories of a session.
+        If the session was evicted (or is new), the buffer gets
+        reloaded from the conversation log.
+
+        Args:
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[QueryData]: Most recent memories (oldest first)
+        """
+        memories = self.sessions.get(session_id)
+        if memories is None:
+            memories = self._load_session(session_id)
+        self.sessions.set(session_id, memories)     # marks the session as active
+        return memories
+    
+    def _load_session(self, session_id: str) -> List[QueryData]:
+        """_load_session Loads the recent memories of a session from the log
+
+        Args:
+            session_id (str): Session
+
+        Returns:
+            List[QueryData]: Most recent memories (oldest first)
+        """
+        messages = self.log.last(2 * self.max_entries, session_id)
+        memories = []
+        for user, assistant in zip(messages, messages[1:]):
+            if user["role"] == "user" and assistant["role"] == "assistant":
+                memories.append(QueryData(user["content"], None, assistant["content"], session_id=session_id))
+        return memories[-self.max_entries:]
+    
+    def end_session(self, session_id: str) -> None:
+        """end_session Drops the recent memories of a session from RAM
+
+        The memories themselves stay in MemoryDB and the log.
+
+        Args:
+            session_id (str): Session
+        """
+        self.sessions.pop(session_id)
+    
     @log_event("Turning recent memories into strings...")
-    def stringize_recent_memories(self) -> str:
+    def stringize_recent_memories(self, session_id: str = DEFAULT_SESSION) -> str:
         """stringize_recent_memories Transforms memories into strings
 
-        Turns all the most recent memories into strings that can be
-        passed to the OpenAI model.
+        Turns all the most recent memories of a session into 
+        strings that can be passed to the OpenAI model.
+
+        Args:
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
 
         Returns:
             str: string of every recent user input and model output
         """
         memory_strings = []
-        for memory in self.most_recent_memories:
+        for memory in list(self.recent_memories(session_id)):
             responses = self.create_response_dicts(memory, shorten=False)
             memory_strings.append("\n".join(str(rsp) for rsp in responses))
         return "".join(memory_strings)
@@ -136,45 +369,111 @@ class GPTMemory:
 
     def filter_responses_by_query(
         self, 
-        user_query: str
+        user_query: str,
+        context: Optional['QueryContext'] = None,
+        session_id: str = DEFAULT_SESSION
     ) -> List[dict[str, Any]]:
         """filter_responses_by_query Filters database data
 
+        Same as similar_responses() without the distances.
+
+        Args:
+            user_query (str): User's query.
+            context (Optional[QueryContext], optional): Context of the user query. Defaults to None.
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[dict[str, Any]]: List of model inputs/outputs ({role: "user", content: ""})
+        """
+        return [memory for memory, _ in self.similar_responses(user_query, context, session_id)]
+    
+    def similar_responses(
+        self, 
+        user_query: str,
+        context: Optional['QueryContext'] = None,
+        session_id: str = DEFAULT_SESSION
+    ) -> List[tuple[dict[str, Any], float]]:
+        """similar_responses Filters database data
+
         This method uses the user query to filter relevant
         information from the database to save input tokens
         while at the same time not neglecting the quality of the model 
+        
+        If there's a query context, its embedding is reused
+        instead of embedding the user query again. Only memories
+        of the given session are searched.
 
         Args:
             user_query (str): User's query.
+            context (Optional[QueryContext], optional): Context of the user query. Defaults to None.
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
 
         Returns:
-            List[dict[str, Any]]: List of model inputs/outputs ({role: "user", content: ""})
+            List[tuple[dict[str, Any], float]]: Model inputs/outputs ({role: "user", content: ""}) and their distance to the query
         """
-        rsp = self.chroma_collection.query(
-            query_texts=[user_query],
-            n_results=3
-        )
-        if rsp and rsp["documents"]:
-            return self._convert_from_string(rsp["documents"][0])
+        if context:
+            rsp = self.chroma_collection.query(
+                query_embeddings=[context.embedding],
+                n_results=3,
+                where={"session": session_id},
+                include=["documents", "metadatas", "distances"] # type: ignore
+            )
+        else:
+            rsp = self.chroma_collection.query(
+                query_texts=[user_query],
+                n_results=3,
+                where={"session": session_id},
+                include=["documents", "metadatas", "distances"] # type: ignore
+            )
+        if rsp and rsp["ids"] and rsp["ids"][0]:
+            return [
+                (self._decode(memory_id, document, metadata), float(distance))
+                for memory_id, document, metadata, distance in zip(
+                    rsp["ids"][0],
+                    rsp["documents"][0], # type: ignore
+                    rsp["metadatas"][0], # type: ignore
+                    rsp["distances"][0] # type: ignore
+                )
+            ]
         else:
             return []
     
     def recent_responses(
         self, 
-        amount: int = 5
+        amount: int = 5,
+        session_id: str = DEFAULT_SESSION
     ) -> List[dict[str, Any]]:
         """recent_responses Returns recent responses
 
-        Returns the n most recent user input and model output.
+        Returns the n most recent user input and model output
+        of a session from the conversation log.
 
         Args:
             amount (int, optional): The <amount> latest responses. Defaults to 5.
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
 
         Returns:
             List[dict[str, Any]]: List of user input and model output dictionaries.
         """
-        rsps = self.get_all_responses()
-        return rsps[-amount:] # get n latest responses
+        return self.log.last(amount, session_id)
+    
+    def responses_since(
+        self,
+        timestamp: float,
+        limit: Optional[int] = None,
+        session_id: str = DEFAULT_SESSION
+    ) -> List[dict[str, Any]]:
+        """responses_since Returns responses since a point in time
+
+        Args:
+            timestamp (float): UNIX timestamp
+            limit (Optional[int], optional): Max amount of responses. Defaults to None (all).
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[dict[str, Any]]: List of user input and model output dictionaries.
+        """
+        return self.log.since(timestamp, limit, session_id)
     
     def get_all_responses(self) -> List[dict[str, Any]]:
         """get_all_responses Returns every response
@@ -185,13 +484,23 @@ class GPTMemory:
         Returns:
             List[dict[str, Any]]: List of user input and model output
         """
-        return self._convert_from_string(self.responses)
+        all_data = self.chroma_collection.get(include=["documents", "metadatas"]) # type: ignore
+        return [
+            self._decode(memory_id, document, metadata)
+            for memory_id, document, metadata in zip(
+                all_data["ids"],
+                all_data["documents"] or [],
+                all_data["metadatas"] or []
+            )
+        ]
     
     @log_event("Building response input...")
     def response_input(
         self, 
         system_prompt: str, 
-        user_query: str
+        user_query: str,
+        context: Optional['QueryContext'] = None,
+        session_id: str = DEFAULT_SESSION
     ) -> List[dict[str, Any]]:
         """response_input Returns user prompt input
 
@@ -206,13 +515,36 @@ class GPTMemory:
         Args:
             system_prompt (str): Straightening thread for the model lol
             user_query (str): User query ???
+            context (Optional[QueryContext], optional): Context of the user query. Defaults to None.
+            session_id (str, optional): Session. Defaults to DEFAULT_SESSION.
+
+        Returns:
+            List[dict[str, Any]]: List of responses (chat context)
+        """
+        recent_inputs = self.recent_responses(2 * self.max_entries, session_id)
+        filtered_inputs = self.filter_responses_by_query(user_query, context, session_id)
+        return self.build_response_input(system_prompt, recent_inputs, filtered_inputs)
+    
+    def build_response_input(
+        self,
+        system_prompt: str,
+        recent_inputs: List[dict[str, Any]],
+        filtered_inputs: List[dict[str, Any]]
+    ) -> List[dict[str, Any]]:
+        """build_response_input Joins the chat context
+
+        Joins already fetched recent and relevant responses
+        behind the system prompt. This is used when the memory
+        lookups ran concurrently (see GPTQuery.retrieve()).
+
+        Args:
+            system_prompt (str): System prompt
+            recent_inputs (List[dict[str, Any]]): Most recent responses
+            filtered_inputs (List[dict[str, Any]]): Responses relevant to the user query
 
         Returns:
             List[dict[str, Any]]: List of responses (chat context)
         """
-        recent_inputs = self.recent_responses()
-        filtered_inputs = self.filter_responses_by_query(user_query)
-        
         rsp_input = recent_inputs + filtered_inputs
         rsp_input.insert(0, {"role": "system", "content": [{"type": "input_text", "text": system_prompt}]})
         return rsp_input
@@ -246,11 +578,36 @@ class GPTMemory:
             shortened.append(item[start:])
         return shortened
     
+    @log_event("Summarizing in- and output locally...")
+    def _shorten_data_extractive(
+        self,
+        data: List[str]
+    ) -> List[str]:
+        """_shorten_data_extractive Shortens data locally
+
+        Keeps the most representative sentences of every string
+        within `tokens_per_memory` tokens (see core/summarizer.py).
+        This takes milliseconds and doesn't need any network.
+
+        Args:
+            data (List[str]): List of strings (data)
+
+        Returns:
+            List[str]: List of shortened strings
+        """
+        return [self.summarizer.summarize(item) for item in data]
+    
     @log_event("Shortening user input and model output...")
     def shorten_data(self, data: List[str]) -> List[str]:
         if len(data) != 2:
             raise ValueError(f"Input must be exactly 2 lines. Not {len(data)}")
         
+        match self.config.memory_shortening.value:
+            case ShorteningStrategies.EXTRACTIVE.value:
+                return self._shorten_data_extractive(data)
+            case ShorteningStrategies.TRUNCATE.value:
+                return self._shorten_data_fallback(data)
+        
         base_params = self.config.base_params.copy()
         base_params["max_output_tokens"] = len(data) * self.tokens_per_memory
         base_params["input"] = [
@@ -373,9 +730,18 @@ class GPTMemory:
         Args:
             data (QueryData): Data to be appended to the list of memories.
         """
-        if len(self.most_recent_memories) >= self.max_entries:
-            self.most_recent_memories.pop(0)
-        self.most_recent_memories.append(data)
+        memories = self.recent_memories(data.session_id)
+        if len(memories) >= self.max_entries:
+            memories.pop(0)
+        memories.append(data)
+    
+    @property
+    def compression_queue_depth(self) -> int:
+        return self.compressor.depth
+    
+    def flush(self) -> None:
+        """flush Waits until every new memory is shortened"""
+        self.compressor.flush()
     
     @log_event("Adding context to memories...")
     def add_context(self, data: QueryData) -> None:
@@ -383,34 +749,80 @@ class GPTMemory:
 
         Uses the QueryData object to store user input and model output/response
         to construct chat context to add into the Database.
+        
+        With background compression the memory is stored as it is
+        right away and the shortened version replaces it as soon as
+        it's ready (see _compress_memory()), so the user doesn't have to
+        wait for the shortening request.
 
         Args:
             data (QueryData): User input, model output and database results.
         """
-        responses = self.create_response_dicts(data)
-        length = self.chroma_collection.count()
+        background = self.config.background_compression
+        responses = self.create_response_dicts(data, shorten=not background)
+        with self._lock:
+            length = self._next_memory
+            self._next_memory += len(responses)
+            turn = self._next_turns.get(data.session_id, 0)
+            self._next_turns[data.session_id] = turn + 1
+        ids = [f"memory{length+i}" for i in range(len(responses))]
         
-        self.chroma_collection.upsert(
-            ids =       [f"memory{length+i}" for i in range(len(responses))],
-            documents = [str(self.to_document(response)) for response in responses]
-        )
+        # before logging, so a reloaded session doesn't get this memory twice
         self.add_newest_memory(data)
+        self._store(ids, responses, turn, data.session_id)
+        self.log.append(responses, ids, session_id=data.session_id)
+        self.sessions.expire()
+        self.retention.on_turn()
+        
+        if background:
+            self.compressor.submit(self._compress_memory, data, ids, turn)
+    
+    def _compress_memory(
+        self,
+        data: QueryData,
+        ids: List[str],
+        turn: int
+    ) -> None:
+        """_compress_memory Replaces a memory with its shortened version
+
+        Runs on the compression worker. The QueryData itself stays
+        untouched (the caller might still use it), a shortened copy
+        replaces it in the most recent memories instead.
+
+        Args:
+            data (QueryData): User input, model output and database results.
+            ids (List[str]): IDs of the memory in MemoryDB
+            turn (int): Turn of the conversation
+        """
+        shortened = QueryData(data.query, data.result, data.rsp, data.context, data.session_id)
+        responses = self.create_response_dicts(shortened)
+        
+        self._store(ids, responses, turn, data.session_id)
+        self.log.replace(ids, responses)
+        memories = self.sessions.get(data.session_id) or []
+        for i, memory in enumerate(memories):
+            if memory is data:
+                memories[i] = shortened
 
 if __name__ == "__main__":
+    config = Config(InputTypes.PLAIN, OutputTypes.MD)
     a = GPTMemory(
         chroma_client=chromadb.Client(),
         openai_client=OpenAI(api_key=os.getenv("CHROMA_OPENAI_API_KEY")),
-        openai_embedding=OpenAIEmbeddingFunction(
-            api_key=os.getenv("CHROMA_OPENAI_API_KEY"),
-            model_name="text-embedding-3-small"
-        ),
-        config=Config(InputTypes.PLAIN, OutputTypes.MD)
+        embedding_function=create_embedding_function(config),
+        config=config
     )
+    session = "demo"
     a.add_context(
         QueryData(
-            data={},
+            data=None,
             query="What is the capital of France?",
-            rsp="The capital of France is Paris."
+            rsp="The capital of France is Paris.",
+            session_id=session
         )
     )
-    print(a.stringize_recent_memories)
\ No newline at end of file
+    a.flush()
+    print(a.stringize_recent_memories(session))
+    print(a.recent_responses(2, session))
+    print(a.filter_responses_by_query("Which city is France's capital?", session_id=session))
+    a.end_session(session)
\ No newline at end of file
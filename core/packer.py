@@ -0,0 +1,235 @@
+import math
+from dataclasses import (
+    dataclass,
+    field
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence
+)
+
+import numpy as np
+
+import Athena.common.utils as utils
+
+MESSAGE_OVERHEAD = 4        # tokens every chat message costs on top of its content
+MAX_CAPACITY_UNITS = 2048   # token budgets get scaled down to this many units for the knapsack
+
+# relevance of the best candidate of every source
+SOURCE_WEIGHTS = {
+    'search': 1.0,
+    'recent': 1.0,
+    'similar': 0.8
+}
+
+
+def count_tokens(text: str) -> int:
+    # rule of thumb: 3/4 words = 1 token
+    return utils.words_to_tokens(len(text.split()))
+
+
+def message_tokens(message: Any) -> int:
+    """message_tokens Counts the tokens of a candidate's content
+
+    Args:
+        message (Any): Document (str), chat message (dict) or turn (list of chat messages)
+
+    Returns:
+        int: Tokens (including the overhead of every chat message)
+    """
+    if isinstance(message, list):
+        return sum(message_tokens(part) for part in message)
+    if isinstance(message, dict):
+        return count_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD
+    return count_tokens(str(message))
+
+
+def group_turns(messages: Sequence[dict[str, Any]]) -> List[List[dict[str, Any]]]:
+    """group_turns Groups chat messages into turns
+
+    A turn is a user input and the model outputs after it,
+    so the packer keeps or drops them together.
+
+    Args:
+        messages (Sequence[dict[str, Any]]): Chat messages (oldest first)
+
+    Returns:
+        List[List[dict[str, Any]]]: Turns (oldest first)
+    """
+    turns: List[List[dict[str, Any]]] = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+@dataclass
+class Candidate:
+    source: str             # search, recent or similar
+    rank: int               # position within its source (0 = most relevant)
+    content: Any            # document, chat message or turn
+    tokens: int
+    score: float
+
+
+@dataclass
+class PackedContext:
+    budget: int
+    fixed_tokens: int
+    selected: List[Candidate] = field(default_factory=list)
+    dropped: List[Candidate] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return self.fixed_tokens + sum(candidate.tokens for candidate in self.selected)
+
+    def contents(self, source: str) -> List[Any]:
+        """contents Returns the selected contents of a source
+
+        Args:
+            source (str): search, recent or similar
+
+        Returns:
+            List[Any]: Documents/messages in their original order
+        """
+        return [candidate.content for candidate in sorted(self.selected, key=lambda c: c.rank) if candidate.source == source]
+
+    def report(self) -> Dict[str, Any]:
+        """report Returns what was kept and dropped
+
+        Returns:
+            Dict[str, Any]: Budget, used tokens and kept/dropped amount and tokens per source
+        """
+        sources: Dict[str, Dict[str, int]] = {}
+        for kind, candidates in (('kept', self.selected), ('dropped', self.dropped)):
+            for candidate in candidates:
+                stats = sources.setdefault(candidate.source, {'kept': 0, 'kept_tokens': 0, 'dropped': 0, 'dropped_tokens': 0})
+                stats[kind] += 1
+                stats[f"{kind}_tokens"] += candidate.tokens
+        return {
+            'budget': self.budget,
+            'tokens': self.tokens,
+            'fixed_tokens': self.fixed_tokens,
+            'sources': sources
+        }
+
+
+def knapsack(
+    weights: np.ndarray,
+    values: np.ndarray,
+    capacity: int
+) -> np.ndarray:
+    """knapsack Solves the 0/1 knapsack problem
+
+    Dynamic programming over the capacity, one vectorized
+    row per item.
+
+    Args:
+        weights (np.ndarray): Integer weight of every item
+        values (np.ndarray): Value of every item
+        capacity (int): Max total weight
+
+    Returns:
+        np.ndarray: Boolean mask of the chosen items
+    """
+    best = np.zeros(capacity + 1, dtype=np.float64)
+    taken = np.zeros((len(weights), capacity + 1), dtype=bool)
+
+    for i, (weight, value) in enumerate(zip(weights, values)):
+        if weight > capacity:
+            continue
+        with_item = np.full(capacity + 1, -np.inf)
+        with_item[weight:] = best[:capacity + 1 - weight] + value
+        taken[i] = with_item > best
+        best = np.where(taken[i], with_item, best)
+
+    chosen = np.zeros(len(weights), dtype=bool)
+    remaining = capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if taken[i, remaining]:
+            chosen[i] = True
+            remaining -= weights[i]
+    return chosen
+
+
+class ContextPacker:
+    def __init__(self, max_tokens: int) -> None:
+        """__init__ Initialises ContextPacker
+
+        Fills one input token budget with the most relevant
+        search results, recent memories and similar memories.
+
+        Every candidate gets a score from its source weight and
+        its relevance (similarity to the query, fusion or re-ranking
+        score). Recent turns have no similarity, so their score
+        drops with their age instead. The candidates
+        with the highest total score that fit into the budget
+        (what's left after the fixed parts like the system prompt,
+        schema and user query) are picked with a 0/1 knapsack.
+
+        Args:
+            max_tokens (int): Input token budget of the whole prompt
+        """
+        self.max_tokens = max_tokens
+
+    def candidates(
+        self,
+        source: str,
+        contents: Sequence[Any],
+        relevance: Optional[Sequence[float]] = None
+    ) -> List[Candidate]:
+        """candidates Turns contents of a source into candidates
+
+        Args:
+            source (str): search, recent or similar
+            contents (Sequence[Any]): Documents (str), chat messages (dict) or turns (list), most relevant first
+            relevance (Optional[Sequence[float]], optional): Relevance of every content between 0 and 1, by rank if None. Defaults to None.
+
+        Returns:
+            List[Candidate]: Candidates
+        """
+        weight = SOURCE_WEIGHTS[source]
+        candidates = []
+        for rank, content in enumerate(contents):
+            score = weight * float(relevance[rank]) if relevance is not None else weight / (rank + 1)
+            candidates.append(Candidate(source, rank, content, message_tokens(content), score))
+        return candidates
+
+    def pack(
+        self,
+        candidates: List[Candidate],
+        fixed_tokens: int = 0
+    ) -> PackedContext:
+        """pack Picks the candidates for the prompt
+
+        Args:
+            candidates (List[Candidate]): Candidates of every source
+            fixed_tokens (int, optional): Tokens of the parts that are always sent. Defaults to 0.
+
+        Returns:
+            PackedContext: Selected and dropped candidates
+        """
+        packed = PackedContext(self.max_tokens, fixed_tokens)
+        capacity = self.max_tokens - fixed_tokens
+        if capacity <= 0 or not candidates:
+            packed.dropped = list(candidates)
+            return packed
+
+        tokens = np.asarray([candidate.tokens for candidate in candidates], dtype=np.int64)
+        if tokens.sum() <= capacity:
+            packed.selected = list(candidates)
+            return packed
+
+        # a coarser token unit keeps the table small, weights are rounded up so nothing overshoots
+        unit = max(1, math.ceil(capacity / MAX_CAPACITY_UNITS))
+        weights = -(-tokens // unit)
+        values = np.asarray([candidate.score for candidate in candidates], dtype=np.float64)
+        chosen = knapsack(weights, values, capacity // unit)
+
+        packed.selected = [candidate for candidate, keep in zip(candidates, chosen) if keep]
+        packed.dropped = [candidate for candidate, keep in zip(candidates, chosen) if not keep]
+        return packed
@@ -0,0 +1,161 @@
+import json
+import os
+from threading import Lock
+from typing import (
+    Dict,
+    List,
+    Optional
+)
+
+from chromadb.api.types import Document
+
+from Athena.core.packer import count_tokens
+from Athena.common.logger import get_logger
+from Athena.common.types import OutputTypes
+
+log = get_logger()
+
+_schemas: Dict[tuple[str, int], dict] = {}
+_templates: Dict[tuple[str, str, Optional[tuple[str, int]]], 'PromptTemplate'] = {}
+_lock = Lock()
+
+
+def load_schema(path: str) -> Optional[dict]:
+    """load_schema Loads a JSON schema
+
+    Every schema file is only read once per process (and again
+    after it was modified).
+
+    Args:
+        path (str): Full path to the JSON schema
+
+    Raises:
+        Exception: If the file isn't valid JSON
+
+    Returns:
+        Optional[dict]: JSON schema or None if there's no file on that path
+    """
+    key = _schema_key(path)
+    if key is None:
+        return None
+
+    with _lock:
+        if key not in _schemas:
+            try:
+                with open(key[0], "r") as j:
+                    _schemas[key] = json.load(j)
+            except:
+                raise Exception("Couldn't load JSON file. Check if path is correct.")
+        return _schemas[key]
+
+
+def _schema_key(path: Optional[str]) -> Optional[tuple[str, int]]:
+    if not path:
+        return None
+    path = os.path.realpath(path)
+    if not os.path.exists(path):
+        return None
+    return path, os.stat(path).st_mtime_ns
+
+
+def stringize_schema(schema: dict) -> str:
+    """stringize_schema Turns the JSON schema into a string
+
+    Each key contains a name, data type and description
+    so the AI won't mess up the schema.
+
+    Args:
+        schema (dict): JSON schema (structured output format)
+
+    Returns:
+        str: JSON schema as string
+    """
+    cleaned_properties_list = []
+
+    properties = schema["format"]["schema"]["properties"]
+    for property_name, definition in properties.items():
+        property_type = definition['type']
+        property_description = definition['description']
+
+        cleaned_properties_list.append(
+            f"'{property_name}' [{property_type}]: {property_description}"
+        )
+    return "\n".join(cleaned_properties_list)
+
+
+class PromptTemplate:
+    def __init__(
+        self,
+        header: str,
+        schema_text: str = ""
+    ) -> None:
+        """__init__ Initialises PromptTemplate
+
+        A compiled prompt. Everything that's the same for every
+        request (the header and the JSON schema) is joined into the
+        system message once, everything that changes (search results,
+        memories and the user query) goes behind it.
+
+        So the start of every request is byte-identical, which
+        OpenAI caches automatically (prompt caching, cheaper and
+        faster input tokens for prefixes of at least 1024 tokens).
+
+        Use get_template() instead of creating templates yourself,
+        so they're only compiled once per process.
+
+        Args:
+            header (str): System prompt of the output type
+            schema_text (str, optional): Stringized JSON schema (see stringize_schema()). Defaults to "".
+        """
+        self.system = f"{header}\n{schema_text}\n" if schema_text else header
+        self.prefix_tokens = count_tokens(self.system)
+
+    def render(
+        self,
+        documents: List[Document],
+        recent_memories: Optional[str],
+        query: str
+    ) -> str:
+        """render Formats the volatile part of the prompt
+
+        Args:
+            documents (List[Document]): Search results
+            recent_memories (Optional[str]): Recent memories as string (None leaves the section out)
+            query (str): User query
+
+        Returns:
+            str: Prompt body content
+        """
+        context: Document = "\n".join(documents)
+        memories = "" if recent_memories is None else f"Most recent memories:\n{recent_memories}\n\n"
+        return f"Search results from database:\n{context}\n\n{memories}Latest User-Query: {query}\n"
+
+
+def get_template(
+    output_type: OutputTypes,
+    header: str,
+    schema_path: Optional[str] = None
+) -> PromptTemplate:
+    """get_template Returns the compiled prompt template
+
+    Compiles the template of every output type, header and
+    schema file only once per process.
+
+    Args:
+        output_type (OutputTypes): Output type (the schema is only used for JSON)
+        header (str): System prompt of the output type
+        schema_path (Optional[str], optional): Full path to the JSON schema. Defaults to None.
+
+    Returns:
+        PromptTemplate: Compiled template
+    """
+    schema_key = _schema_key(schema_path) if output_type == OutputTypes.JSON else None
+    key = (output_type.value, header, schema_key)
+    template = _templates.get(key)
+    if template is None:
+        schema = load_schema(schema_path) if schema_key else None # type: ignore
+        template = PromptTemplate(header, stringize_schema(schema) if schema else "")
+        with _lock:
+            template = _templates.setdefault(key, template)
+        log.info(f"get_template: Compiled {output_type.value} template, static prefix of {template.prefix_tokens} tokens")
+    return template
@@ -0,0 +1,102 @@
+import time
+from typing import (
+    List,
+    TYPE_CHECKING
+)
+
+import numpy as np
+
+from Athena.core.embeddings import (
+    encode_inputs,
+    load_onnx_model
+)
+from Athena.core.results import ResultSet
+from Athena.common.logger import log_event
+
+if TYPE_CHECKING:
+    from Athena.core.config import Config
+
+
+class CrossEncoderReranker:
+    def __init__(self, config: 'Config') -> None:
+        """__init__ Initialises CrossEncoderReranker
+
+        This class re-ranks search results with a small local
+        cross-encoder (e.g. ms-marco-MiniLM-L-6-v2 exported to ONNX)
+        which scores every (query, document) pair directly.
+        That's much more precise than the distance of two embeddings
+        and way faster than asking another chat model.
+
+        The model folder must contain a `model.onnx` and the
+        `tokenizer.json` of the model.
+
+        Args:
+            config (Config): Configuration (model path, top-k, latency budget...)
+        """
+        self.model_path = config.rerank_model_path
+        self.batch_size = config.rerank_batch_size
+        self.top_k = config.rerank_top_k
+        self.latency_budget = config.rerank_latency_budget / 1000  # ms --> s
+
+        self.tokenizer, self.session = load_onnx_model(self.model_path, config.rerank_max_length)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def score(
+        self,
+        query: str,
+        documents: List[str]
+    ) -> np.ndarray:
+        """score Scores (query, document) pairs
+
+        Args:
+            query (str): User query
+            documents (List[str]): Documents
+
+        Returns:
+            np.ndarray: Relevance score of every document (higher is better)
+        """
+        inputs = encode_inputs(self.tokenizer, [(query, doc) for doc in documents])
+        logits = self.session.run(
+            None,
+            {name: value for name, value in inputs.items() if name in self.input_names}
+        )[0]
+        # models either return one logit or (irrelevant, relevant) logits
+        return logits.reshape(len(documents), -1)[:, -1].astype(np.float32)
+
+    @log_event("Re-ranking search results...")
+    def rerank(
+        self,
+        query: str,
+        results: ResultSet
+    ) -> ResultSet:
+        """rerank Re-ranks search results
+
+        Scores the results batch by batch in their current order
+        and keeps the `top_k` best ones. Once the latency budget is
+        used up, the remaining results aren't scored anymore and
+        stay behind the scored ones in their current order.
+        
+        The scores are kept as relevance scores (sigmoid of the
+        logits, 0 for results that weren't scored).
+
+        Args:
+            query (str): User query
+            results (ResultSet): Search results
+
+        Returns:
+            ResultSet: Best `top_k` results, best first
+        """
+        if not len(results):
+            return results
+
+        start = time.perf_counter()
+        scores = np.full(len(results), -np.inf, dtype=np.float32)
+
+        for i in range(0, len(results), self.batch_size):
+            scores[i:i+self.batch_size] = self.score(query, results.documents[i:i+self.batch_size])
+            if time.perf_counter() - start > self.latency_budget:
+                break
+
+        order = np.argsort(-scores, kind="stable")[:self.top_k]
+        relevance = 1 / (1 + np.exp(-scores[order].astype(np.float64)))
+        return results.select(order).with_scores(relevance)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional
+)
+
+import numpy as np
+
+from Athena.common.logger import get_logger
+
+log = get_logger()
+
+
+def config_key(params: Dict[str, Any]) -> str:
+    """config_key Hashes the model config of a request
+
+    Args:
+        params (Dict[str, Any]): Parameters for responses.create() (the input is ignored)
+
+    Returns:
+        str: SHA-256 hash of model, sampling params, output format etc.
+    """
+    settings = {key: value for key, value in params.items() if key != "input"}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("UTF-8")).hexdigest()
+
+
+def ids_key(ids: Iterable[Any]) -> str:
+    """ids_key Hashes a set of document IDs
+
+    Args:
+        ids (Iterable[Any]): Retrieved document IDs (order doesn't matter)
+
+    Returns:
+        str: SHA-256 hash of the sorted IDs
+    """
+    return hashlib.sha256("\0".join(sorted(str(i) for i in ids)).encode("UTF-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 1024,
+        threshold: float = 0.95,
+        fingerprint: str = ""
+    ) -> None:
+        """__init__ Initialises ResponseCache
+
+        Semantic cache for model responses. A stored response is
+        returned for a new query if
+        * the model config (model, sampling params, schema, ...) is the same
+        * the retrieved documents are the same (same set of IDs)
+        * the cosine similarity of the query embeddings is at least `threshold`
+
+        So paraphrased questions skip the OpenAI request entirely.
+        Only completed responses get cached, and responses to turns
+        with memories only for their own session (see GPTQuery._cached_response()).
+
+        The cache keeps `max_size` responses (least recently used ones
+        get evicted) in RAM and on disk. Every change of the collection
+        clears it (see invalidate()), and so does a different
+        `fingerprint` of the collection on startup.
+
+        Args:
+            path (str): Full path to the SQLite cache file
+            max_size (int, optional): Max amount of responses. Defaults to 1024.
+            threshold (float, optional): Min cosine similarity of the queries. Defaults to 0.95.
+            fingerprint (str, optional): Identifies the state of the collection. Defaults to "".
+        """
+        self.path = path
+        self.max_size = max_size
+        self.threshold = threshold
+
+        self.hits = 0
+        self.misses = 0
+
+        # rowid -> (bucket, normalized query embedding, response)
+        self._entries: OrderedDict[int, tuple[tuple[str, str, int], np.ndarray, str]] = OrderedDict()
+        self._buckets: Dict[tuple[str, str, int], List[int]] = {}
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                config TEXT NOT NULL,
+                ids TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+        stored = self._connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if stored is None or stored[0] != fingerprint:
+            self.invalidate(fingerprint)
+        else:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        rows = self._connection.execute(
+            "SELECT rowid, config, ids, vector, response FROM responses ORDER BY last_used DESC LIMIT ?",
+            (self.max_size,)
+        ).fetchall()
+        for rowid, config, ids, vector, response in reversed(rows):
+            self._add(rowid, config, ids, np.frombuffer(vector, dtype=np.float32), response)
+        self._connection.execute(
+            "DELETE FROM responses WHERE rowid NOT IN (SELECT rowid FROM responses ORDER BY last_used DESC LIMIT ?)",
+            (self.max_size,)
+        )
+        self._connection.commit()
+        log.info(f"_load: Loaded {len(self._entries)} cached responses")
+
+    def _add(
+        self,
+        rowid: int,
+        config: str,
+        ids: str,
+        vector: np.ndarray,
+        response: str
+    ) -> None:
+        bucket = (config, ids, len(vector))
+        self._entries[rowid] = (bucket, vector, response)
+        self._buckets.setdefault(bucket, []).append(rowid)
+
+    def _remove(self, rowid: int) -> None:
+        bucket = self._entries.pop(rowid)[0]
+        members = self._buckets[bucket]
+        members.remove(rowid)
+        if not members:
+            del self._buckets[bucket]
+
+    def _normalize(self, embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(
+        self,
+        config: str,
+        ids: str,
+        embedding: Any,
+        fallback_config: Optional[str] = None
+    ) -> Optional[str]:
+        """get Looks up a response
+
+        Args:
+            config (str): Model config (see config_key())
+            ids (str): Retrieved documents (see ids_key())
+            embedding (Any): Embedding of the query
+            fallback_config (Optional[str], optional): Model config to try if there's nothing for `config`. Defaults to None.
+
+        Returns:
+            Optional[str]: Cached response or None
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            for key in (config, fallback_config):
+                members = self._buckets.get((key, ids, len(vector))) if key else None # type: ignore
+                if not members:
+                    continue
+                similarities = np.stack([self._entries[rowid][1] for rowid in members]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    rowid = members[best]
+                    self._entries.move_to_end(rowid)
+                    self._connection.execute("UPDATE responses SET last_used = ? WHERE rowid = ?", (time.time(), rowid))
+                    self._connection.commit()
+                    self.hits += 1
+                    return self._entries[rowid][2]
+
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        config: str,
+        ids: str,
+        embedding: Any,
+        response: str
+    ) -> None:
+        """set Caches a response
+
+        Args:
+            config (str): Model config (see config_key())
+            ids (str): Retrieved documents (see ids_key())
+            embedding (Any): Embedding of the query
+            response (str): Full model output
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO responses (config, ids, vector, response, last_used) VALUES (?, ?, ?, ?, ?)",
+                (config, ids, vector.tobytes(), response, time.time())
+            )
+            self._add(cursor.lastrowid, config, ids, vector, response) # type: ignore
+
+            evicted = []
+            while len(self._entries) > self.max_size:
+                rowid = next(iter(self._entries))
+                self._remove(rowid)
+                evicted.append((rowid,))
+            self._connection.executemany("DELETE FROM responses WHERE rowid = ?", evicted)
+            self._connection.commit()
+
+    def invalidate(self, fingerprint: str) -> None:
+        """invalidate Clears the cache
+
+        Called whenever the collection changes, as the
+        cached responses may be based on outdated documents.
+
+        Args:
+            fingerprint (str): Identifies the new state of the collection
+        """
+        with self._lock:
+            if self._entries:
+                log.info(f"invalidate: Dropping {len(self._entries)} cached responses")
+            self._entries.clear()
+            self._buckets.clear()
+            self._connection.execute("DELETE FROM responses")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                (fingerprint,)
+            )
+            self._connection.commit()
+
+    @property
+    def stats(self) -> dict:
+        """stats Returns cache statistics
+
+        Returns:
+            dict: Hits, misses, hit rate and amount of entries
+        """
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'entries': len(self._entries)
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,217 @@
+import numpy as np
+from chromadb.api.types import (
+    Document,
+    Metadata,
+    QueryResult
+)
+from typing import (
+    Any,
+    List,
+    Optional,
+    Sequence,
+    Union
+)
+
+
+class ResultSet:
+    __slots__ = ("ids", "distances", "documents", "metadatas", "scores")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        distances: np.ndarray,
+        documents: List[Document],
+        metadatas: List[Optional[Metadata]],
+        scores: Optional[np.ndarray] = None
+    ) -> None:
+        """__init__ Initialises ResultSet
+
+        This is a compact container for the search results of
+        a single query. Distances and IDs are NumPy arrays so the
+        filters can work on the whole result at once instead of
+        popping list entries one by one.
+
+        A ResultSet is never modified, every filter returns a new one.
+        
+        Fusion and re-ranking also give every document a relevance
+        score between 0 and 1 (see relevance()).
+
+        Args:
+            ids (np.ndarray): IDs of the documents
+            distances (np.ndarray): Distances to the query
+            documents (List[Document]): Documents
+            metadatas (List[Optional[Metadata]]): Metadata of the documents
+            scores (Optional[np.ndarray], optional): Relevance scores (higher is better). Defaults to None.
+        """
+        self.ids = ids
+        self.distances = distances
+        self.documents = documents
+        self.metadatas = metadatas
+        self.scores = scores
+
+    @classmethod
+    def from_query_result(
+        cls,
+        result: QueryResult,
+        index: int = 0
+    ) -> 'ResultSet':
+        """from_query_result Creates a ResultSet from a QueryResult
+
+        Args:
+            result (QueryResult): ChromaDB search results
+            index (int, optional): Index of the query text in the result. Defaults to 0.
+
+        Returns:
+            ResultSet: Search results of that query text
+        """
+        ids = result["ids"][index] if result.get("ids") else []
+        amount = len(ids)
+        distances = result["distances"][index] if result.get("distances") else [0.0] * amount
+        documents = result["documents"][index] if result.get("documents") else [""] * amount
+        metadatas = result["metadatas"][index] if result.get("metadatas") else [None] * amount
+
+        return cls(
+            ids=np.asarray(ids, dtype=np.str_),
+            distances=np.asarray(distances, dtype=np.float32),
+            documents=list(documents),
+            metadatas=list(metadatas)
+        )
+
+    @classmethod
+    def empty(cls) -> 'ResultSet':
+        return cls(np.asarray([], dtype=np.str_), np.asarray([], dtype=np.float32), [], [])
+
+    @classmethod
+    def merge(cls, results: Sequence['ResultSet']) -> 'ResultSet':
+        """merge Merges several ResultSets
+
+        Merges the results of several queries into one ResultSet
+        sorted by distance. Documents found by several queries
+        only keep their closest distance.
+
+        Args:
+            results (Sequence[ResultSet]): Search results
+
+        Returns:
+            ResultSet: Merged search results
+        """
+        if not results:
+            return cls.empty()
+
+        ids = np.concatenate([result.ids for result in results])
+        distances = np.concatenate([result.distances for result in results])
+        documents = [doc for result in results for doc in result.documents]
+        metadatas = [metadata for result in results for metadata in result.metadatas]
+        scores = None
+        if all(result.scores is not None for result in results):
+            scores = np.concatenate([result.scores for result in results]) # type: ignore
+
+        order = np.argsort(distances, kind="stable")
+        _, first = np.unique(ids[order], return_index=True)
+        keep = order[np.sort(first)]
+        return cls(ids, distances, documents, metadatas, scores).select(keep)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return f"ResultSet(ids={self.ids.tolist()}, distances={self.distances.tolist()})"
+
+    def relevance(self) -> np.ndarray:
+        """relevance Returns the relevance of every document
+
+        Uses the fusion/re-ranking scores if there are any,
+        otherwise 1 / (1 + distance). Documents without a
+        distance (NaN) have no relevance.
+
+        Returns:
+            np.ndarray: Relevance between 0 and 1 (higher is better)
+        """
+        if self.scores is not None:
+            return self.scores
+        return np.nan_to_num(1 / (1 + np.maximum(self.distances, 0)), nan=0.0)
+
+    def with_scores(self, scores: np.ndarray) -> 'ResultSet':
+        """with_scores Returns a copy with relevance scores
+
+        Args:
+            scores (np.ndarray): Relevance score of every document (between 0 and 1)
+
+        Returns:
+            ResultSet: New ResultSet with the scores
+        """
+        return ResultSet(self.ids, self.distances, self.documents, self.metadatas, np.asarray(scores, dtype=np.float32))
+
+    def select(self, indices: Union[np.ndarray, slice]) -> 'ResultSet':
+        """select Returns a subset of the results
+
+        Args:
+            indices (Union[np.ndarray, slice]): Boolean mask, index array or slice
+
+        Returns:
+            ResultSet: New ResultSet with the selected results
+        """
+        if isinstance(indices, slice):
+            return ResultSet(
+                self.ids[indices],
+                self.distances[indices],
+                self.documents[indices],
+                self.metadatas[indices],
+                self.scores[indices] if self.scores is not None else None
+            )
+
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        return ResultSet(
+            self.ids[indices],
+            self.distances[indices],
+            [self.documents[i] for i in indices],
+            [self.metadatas[i] for i in indices],
+            self.scores[indices] if self.scores is not None else None
+        )
+
+    def filter_by_distance(self, max_distance: float) -> 'ResultSet':
+        """filter_by_distance Filters results by distance
+
+        Args:
+            max_distance (float): Max distance to the query
+
+        Returns:
+            ResultSet: Results with a distance of at most max_distance
+        """
+        return self.select(self.distances <= max_distance)
+
+    def filter_by_tokens(
+        self,
+        max_tokens: float,
+        token_counts: np.ndarray
+    ) -> 'ResultSet':
+        """filter_by_tokens Filters results by tokens
+
+        Keeps the results (in their current order) until their
+        total token amount would exceed max_tokens.
+
+        Args:
+            max_tokens (float): Max token amount
+            token_counts (np.ndarray): Token amount of every document
+
+        Returns:
+            ResultSet: Results that fit into max_tokens
+        """
+        cutoff = np.searchsorted(np.cumsum(token_counts), max_tokens, side="right")
+        return self.select(slice(0, int(cutoff)))
+
+    def to_dict(self) -> dict[str, Any]:
+        """to_dict Returns a JSON-serializable dictionary
+
+        Returns:
+            dict[str, Any]: IDs, distances, documents, metadata and scores
+        """
+        return {
+            'ids': self.ids.tolist(),
+            'distances': self.distances.tolist(),
+            'documents': self.documents,
+            'metadatas': self.metadatas,
+            'scores': self.scores.tolist() if self.scores is not None else None
+        }
@@ -0,0 +1,253 @@
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    TYPE_CHECKING
+)
+
+import numpy as np
+
+from Athena.common.logger import get_logger
+from Athena.common.types import DEFAULT_SESSION
+
+if TYPE_CHECKING:
+    from Athena.core.config import Config
+    from Athena.core.memory import GPTMemory
+
+log = get_logger()
+
+DELETED_KEY = "deleted"    # collection metadata key counting deleted memories since the last compaction
+
+
+class MemoryRetention:
+    def __init__(
+        self,
+        memory: 'GPTMemory',
+        config: 'Config'
+    ) -> None:
+        """__init__ Initialises MemoryRetention
+
+        This keeps MemoryDB from growing forever. Every `retention_interval`
+        turns a retention pass runs on the compression worker which deletes
+        * memories older than `retention_max_age` days
+        * memories of a session beyond its `retention_max_turns` latest turns
+        * older near-duplicate turns (cosine similarity of both their user
+          input and model output of at least `retention_merge_threshold`),
+          the newest one is kept
+
+        ChromaDB doesn't shrink its index when deleting, so once enough
+        memories were deleted the collection gets rewritten (see compact()).
+        That happens on startup, when nothing else uses the collection.
+
+        Args:
+            memory (GPTMemory): Memory to maintain
+            config (Config): Configuration
+        """
+        self.memory = memory
+        self.config = config
+        self.turns = 0
+
+    def on_turn(self) -> None:
+        """on_turn Counts a turn and queues a retention pass if it's time"""
+        self.turns += 1
+        if self.config.retention_interval and self.turns >= self.config.retention_interval:
+            self.turns = 0
+            self.memory.compressor.submit(self.apply)
+
+    def apply(self) -> Dict[str, int]:
+        """apply Runs a retention pass
+
+        Returns:
+            Dict[str, int]: Amount of expired, trimmed and merged memories
+        """
+        collection = self.memory.chroma_collection
+        records = collection.get(include=["embeddings", "metadatas"]) # type: ignore
+        ids: List[str] = records["ids"]
+        if not ids:
+            return {'expired': 0, 'trimmed': 0, 'merged': 0}
+
+        metadatas = [metadata or {} for metadata in records["metadatas"]] # type: ignore
+        embeddings = np.asarray(records["embeddings"], dtype=np.float32)
+
+        expired = self._expired(metadatas)
+        trimmed = self._trimmed(metadatas) - expired
+        removed = expired | trimmed
+        merged, merge_counts = self._duplicates(embeddings, metadatas, removed)
+
+        if removed or merged:
+            # deleted memories also leave the conversation log
+            self.memory.log.delete([ids[i] for i in removed | merged])
+        if merge_counts:
+            collection.update(
+                ids =       [ids[i] for i in merge_counts],
+                metadatas = [
+                    {**metadatas[i], 'merged': int(metadatas[i].get('merged', 0)) + count}
+                    for i, count in merge_counts.items()
+                ]
+            )
+        self.delete([ids[i] for i in removed | merged])
+
+        stats = {'expired': len(expired), 'trimmed': len(trimmed), 'merged': len(merged)}
+        log.info(f"apply: Retention pass removed {stats}")
+        return stats
+
+    def _expired(self, metadatas: List[dict[str, Any]]) -> set[int]:
+        if not self.config.retention_max_age:
+            return set()
+
+        cutoff = time.time() - self.config.retention_max_age * 86400
+        # memories from before there were timestamps never expire
+        return {i for i, metadata in enumerate(metadatas) if metadata.get('created', cutoff) < cutoff}
+
+    def _trimmed(self, metadatas: List[dict[str, Any]]) -> set[int]:
+        if not self.config.retention_max_turns:
+            return set()
+
+        turns: Dict[str, set[int]] = {}
+        for metadata in metadatas:
+            turns.setdefault(metadata.get('session', DEFAULT_SESSION), set()).add(metadata.get('turn', 0))
+        oldest_kept = {
+            session: sorted(session_turns)[-self.config.retention_max_turns]
+            for session, session_turns in turns.items()
+            if len(session_turns) > self.config.retention_max_turns
+        }
+        return {
+            i for i, metadata in enumerate(metadatas)
+            if metadata.get('turn', 0) < oldest_kept.get(metadata.get('session', DEFAULT_SESSION), -1)
+        }
+
+    def _duplicates(
+        self,
+        embeddings: np.ndarray,
+        metadatas: List[dict[str, Any]],
+        removed: set[int]
+    ) -> tuple[set[int], Dict[int, int]]:
+        """_duplicates Finds near-duplicate turns
+
+        Turns (user input and model output) of the same session are
+        compared, newest first. A turn whose memories are all too
+        similar to the ones of a newer turn that's kept is a duplicate,
+        so turns are always merged as a whole. Memories without a turn
+        number are never merged.
+
+        Args:
+            embeddings (np.ndarray): Embeddings of the memories
+            metadatas (List[dict[str, Any]]): Metadata of the memories
+            removed (set[int]): Memories which get deleted anyway
+
+        Returns:
+            tuple[set[int], Dict[int, int]]: Duplicates and how many duplicates every kept memory absorbed
+        """
+        threshold = self.config.retention_merge_threshold
+        if not threshold or not len(embeddings):
+            return set(), {}
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        vectors = embeddings / np.maximum(norms, 1e-12)
+
+        # session -> turn -> role -> memory
+        sessions: Dict[str, Dict[int, Dict[str, int]]] = {}
+        for i, metadata in enumerate(metadatas):
+            if i in removed or metadata.get('turn') is None:
+                continue
+            roles = sessions.setdefault(metadata.get('session', DEFAULT_SESSION), {}).setdefault(metadata['turn'], {})
+            # a role twice in one turn can't be merged safely, '' marks the turn as unmergeable
+            roles[metadata.get('role', "") if metadata.get('role', "") not in roles else ""] = i
+
+        duplicates: set[int] = set()
+        merge_counts: Dict[int, int] = {}
+        for turns in sessions.values():
+            kept: List[Dict[str, int]] = []
+            for turn in sorted(turns, reverse=True):
+                roles = turns[turn]
+                newer = None if "" in roles else next((
+                    other for other in kept
+                    if other.keys() == roles.keys()
+                    and all(float(vectors[other[role]] @ vectors[i]) >= threshold for role, i in roles.items())
+                ), None)
+                if newer is None:
+                    kept.append(roles)
+                    continue
+                duplicates.update(roles.values())
+                for i in newer.values():
+                    merge_counts[i] = merge_counts.get(i, 0) + 1
+        return duplicates, merge_counts
+
+    def delete(self, ids: List[str]) -> None:
+        """delete Deletes memories from MemoryDB
+
+        Args:
+            ids (List[str]): IDs of the memories
+        """
+        if not ids:
+            return
+
+        collection = self.memory.chroma_collection
+        batch_size = self.memory.chroma_client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            collection.delete(ids=ids[start:start+batch_size])
+        for memory_id in ids:
+            self.memory.decoded_memories.pop(memory_id)
+
+        metadata = dict(collection.metadata or {})
+        metadata[DELETED_KEY] = int(metadata.get(DELETED_KEY, 0)) + len(ids)
+        collection.modify(metadata=metadata)
+
+    def needs_compaction(self) -> bool:
+        """needs_compaction Checks if the collection should be rewritten
+
+        Returns:
+            bool: If more than `retention_compaction_ratio` of the stored memories were deleted
+        """
+        collection = self.memory.chroma_collection
+        deleted = int((collection.metadata or {}).get(DELETED_KEY, 0))
+        return deleted > 0 and deleted >= self.config.retention_compaction_ratio * (collection.count() + deleted)
+
+    def compact(self) -> int:
+        """compact Rewrites MemoryDB
+
+        Copies every memory (with its embedding, so nothing gets embedded
+        again) into a new collection and replaces the old one with it.
+        The new collection's index only contains live memories.
+
+        NOTE: Nothing else may use the collection meanwhile.
+
+        Returns:
+            int: Amount of memories in the new collection
+        """
+        client = self.memory.chroma_client
+        old = self.memory.chroma_collection
+        name = old.name
+
+        temp_name = f"{name}_compaction"
+        try:
+            client.delete_collection(temp_name)    # left over from an interrupted compaction
+        except Exception:
+            pass
+
+        metadata = dict(old.metadata or {})
+        metadata[DELETED_KEY] = 0
+        new = client.create_collection(
+            name=temp_name,
+            embedding_function=self.memory.embedding_function, # type: ignore
+            metadata=metadata
+        )
+
+        records = old.get(include=["embeddings", "documents", "metadatas"]) # type: ignore
+        batch_size = client.get_max_batch_size()
+        for start in range(0, len(records["ids"]), batch_size):
+            end = start + batch_size
+            new.add(
+                ids =           records["ids"][start:end],
+                embeddings =    records["embeddings"][start:end], # type: ignore
+                documents =     records["documents"][start:end], # type: ignore
+                metadatas =     records["metadatas"][start:end] # type: ignore
+            )
+
+        client.delete_collection(name)
+        new.modify(name=name)
+        self.memory.chroma_collection = new
+
+        log.info(f"compact: Rewrote {name} with {new.count()} memories")
+        return new.count()
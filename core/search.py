@@ -1,17 +1,25 @@
 import json
+import numpy as np
 from colorama import Fore
-from chromadb import QueryResult
 from chromadb.api.types import Document
 from typing import (
     Any,
     List,
     Dict,
-    Optional
+    Optional,
+    Union
 )
 import Athena.core.db as db
 from Athena.core.config import Config
+from Athena.core.results import ResultSet
+from Athena.core.lexical import reciprocal_rank_fusion
+from Athena.core.rerank import CrossEncoderReranker
+from Athena.core.context import QueryContext
+from Athena.common.cache import LRUCache
 from Athena.common.logger import log_event
 
+RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")    # ChromaDB only compares numbers with these
+
 class SearchEngine:
     def __init__(
         self, 
@@ -30,62 +38,92 @@ class SearchEngine:
         self.config = config
         self.db_manager = db_manager
         self.collection = self.db_manager.get_collection()
+        self.reranker = CrossEncoderReranker(self.config) if self.config.rerank else None
+        self.cache = LRUCache(
+            max_size=self.config.search_cache_size,
+            ttl=self.config.search_cache_ttl
+        )
+    
+    @property
+    def cache_stats(self) -> dict:
+        """cache_stats Returns search cache statistics
+
+        Returns:
+            dict: Hits, misses, hit rate and amount of entries
+        """
+        return self.cache.stats
+    
+    def _cache_key(
+        self,
+        query: tuple[str, ...],
+        query_args: Dict[str, Any]
+    ) -> tuple:
+        """_cache_key Returns the search cache key
+
+        The key consists of the normalized queries (case and whitespace
+        don't matter), the filters, every search setting and the
+        collection version, so any upsert or delete invalidates it.
+
+        Args:
+            query (tuple[str, ...]): User queries
+            query_args (Dict[str, Any]): Arguments for the ChromaDB query
+
+        Returns:
+            tuple: Hashable cache key
+        """
+        return (
+            tuple(" ".join(q.lower().split()) for q in query),
+            json.dumps(query_args.get("where"), sort_keys=True),
+            json.dumps(query_args.get("where_document"), sort_keys=True),
+            self.config.search_max_results,
+            self.config.search_max_distance,
+            self.config.search_max_tokens,
+            self.db_manager.version
+        )
     
     def jsonify_results(
         self, 
-        result: QueryResult, 
-        key: str
+        result: ResultSet, 
+        key: str = "documents"
     ) -> List:
-        """jsonify_results Converts ChromaDB's QueryResult
+        """jsonify_results Converts documents of a ResultSet
 
-        Converts a ChromaDB QueryResult into a JSON-serializable format
+        Converts the JSON-strings of a ResultSet into a JSON-serializable format
         
         Dude im tired of writing docs already.......
 
         Args:
-            result (QueryResult): Result of the search query
-            key (str): Key in QueryResult to be converted
+            result (ResultSet): Result of the search query
+            key (str, optional): Attribute of the ResultSet to be converted. Defaults to "documents".
 
         Returns:
             List: Converted list
         """
-        data = result.get(key, None)
-        if data and isinstance(data, list):
-            json_strs = data[0]
-            
-            if len(json_strs) >= 1:
-                return [json.loads(string) for string in json_strs]
-            else:
-                return []
-        else:
-            return []
+        return [json.loads(string) for string in getattr(result, key)]
     
     def clean_results(
         self, 
-        result: QueryResult
+        result: ResultSet
     ) -> dict[str, Any]:
-        """clean_results Returns cleaned QueryResults
+        """clean_results Returns cleaned results
 
-        Returns a rather clean QueryResult dictionary.
+        Returns a rather clean, JSON-serializable dictionary.
         This is mainly for convenience and doesn't really have
         another meaning, it's just more clean imo.
 
         Args:
-            result (QueryResult): Search results from ChromaDB
+            result (ResultSet): Search results
 
         Returns:
             dict[str, Any]: Cleaned dictionary
         """
-        return {
-            'distances': result.get("distances"),
-            'documents': self.jsonify_results(result, "documents"),
-            'ids': result.get("ids"),
-            'metadatas': result.get("metadatas")
-        }
+        cleaned = result.to_dict()
+        cleaned["documents"] = self.jsonify_results(result, "documents")
+        return cleaned
     
     def _highlight_documents(
         self, 
-        documents: List[List[Document]], 
+        documents: List[Document], 
         query: str
     ) -> List[Document]:
         """_highlight_documents Highlights user query
@@ -94,13 +132,13 @@ class SearchEngine:
         the data input.
 
         Args:
-            documents (List[List[Document]]): Inserted Documents in ChromaDB
+            documents (List[Document]): Documents of the search results
             query (str): User query
 
         Returns:
             List[Document]: List of highlighted documents
         """
-        highlighted_docs = documents[0]
+        highlighted_docs = list(documents)
         
         for word in query.split():
             for i, doc in enumerate(highlighted_docs):
@@ -109,7 +147,7 @@ class SearchEngine:
     
     def pprint_documents(
         self, 
-        result: QueryResult, 
+        result: ResultSet, 
         query: str
     ) -> None:
         """pprint_documents Pretty-Prints documents
@@ -119,20 +157,14 @@ class SearchEngine:
         user input in a rather pretty way.
         
         Args:
-            result (QueryResult): Search results dadada you know the drill
+            result (ResultSet): Search results dadada you know the drill
             query (str): User queryyyyy
         """
-        documents = result["documents"]
-        distances = result["distances"]
-        
-        if documents and distances:
-            highlighted_docs = self._highlight_documents(documents, query)
-            for i, doc in enumerate(highlighted_docs):
-                print(
-                    f"\t\t{i+1}. dst: {distances[0][i]}\n\n{doc}\n"
-                )
-        else:
-            return
+        highlighted_docs = self._highlight_documents(result.documents, query)
+        for i, doc in enumerate(highlighted_docs):
+            print(
+                f"\t\t{i+1}. dst: {result.distances[i]}\n\n{doc}\n"
+            )
     
     def calculate_token_amount(
         self, 
@@ -152,116 +184,283 @@ class SearchEngine:
     
     def filter_by_tokens(
         self, 
-        results: QueryResult, 
+        results: ResultSet, 
         max_tokens: int
-    ) -> QueryResult:
+    ) -> ResultSet:
         """filter_by_tokens Filters results
 
         Filters the results by a set amount of max_tokens
         to save tokens later when using the OpenAI models
 
         Args:
-            results (QueryResult): Search results from database
+            results (ResultSet): Search results from database
             max_tokens (int): Max token amount
 
         Returns:
-            QueryResult: Filtered results
+            ResultSet: Filtered results
         """
-        documents = results["documents"] or [[]]
-        distances = results["distances"] or [[]]
-        metadatas = results["metadatas"] or [[]]
-        ids = results.get("ids", [[]])
-        
-        tokens_used = 0
-        cutoff_iteration = len(documents[0])
-        
-        for iteration, doc in enumerate(documents[0]):
-            tokens_used += self.calculate_token_amount(doc)
-            if tokens_used > max_tokens:
-                cutoff_iteration = iteration
-                break
-            else:
-                continue
-        
-        if cutoff_iteration:
-            loop_count = len(documents[0]) - cutoff_iteration
-            for _ in range(loop_count):
-                documents[0].pop(cutoff_iteration)
-                distances[0].pop(cutoff_iteration)
-                metadatas[0].pop(cutoff_iteration)
-                ids[0].pop(cutoff_iteration)
-        else:
-            pass
-        return results
+        token_counts = np.fromiter(
+            (self.calculate_token_amount(doc) for doc in results.documents),
+            dtype=np.float64,
+            count=len(results)
+        )
+        return results.filter_by_tokens(max_tokens, token_counts)
     
     def filter_by_distance(
         self, 
-        results: QueryResult, 
+        results: ResultSet, 
         max_distance: float
-    ) -> QueryResult:
+    ) -> ResultSet:
         """filter_by_distance Filters results
 
         Same as the filter_by_tokens() function but
         with the distances rather than token length
 
         Args:
-            results (QueryResult): Search results
+            results (ResultSet): Search results
             max_distance (float): max distance
 
         Returns:
-            QueryResult: Filtered results
+            ResultSet: Filtered results
+        """
+        return results.filter_by_distance(max_distance)
+    
+    def build_where(
+        self,
+        filter_key: Union[dict, List[dict], None]
+    ) -> Optional[dict]:
+        """build_where Builds a ChromaDB where-filter
+
+        ChromaDB only allows one key per where-filter, so this
+        combines several metadata predicates with `$and`.
+        
+        For example:\n
+        {'city': 'Paris', 'year': {'$gte': 2020}}\n
+        gets turned into\n
+        {'$and': [{'city': 'Paris'}, {'year': {'$gte': 2020}}]}
+        
+        Numeric fields are stored as numbers (see DBManager._metadata()),
+        and ChromaDB only compares numbers with `$gt`, `$gte`, `$lt` and
+        `$lte`, so numeric strings like '2020' are turned into numbers
+        for these operators. Filters that already are ChromaDB operators
+        (like `$or`) are passed through untouched.
+
+        Args:
+            filter_key (Union[dict, List[dict], None]): Metadata predicate(s)
+
+        Returns:
+            Optional[dict]: where-filter or None if there's nothing to filter
+        """
+        if not filter_key:
+            return None
+        
+        filters = filter_key if isinstance(filter_key, list) else [filter_key]
+        predicates = []
+        for f in filters:
+            for key, value in f.items():
+                if isinstance(value, dict) and not key.startswith("$"):
+                    value = {
+                        operator: self._number(operand) if operator in RANGE_OPERATORS else operand
+                        for operator, operand in value.items()
+                    }
+                predicates.append({key: value})
+        
+        if len(predicates) == 1:
+            return predicates[0]
+        else:
+            return {"$and": predicates}
+    
+    @staticmethod
+    def _number(value: Any) -> Any:
+        # numeric strings become int/float, anything else stays as it is
+        if not isinstance(value, str):
+            return value
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    
+    def _query_args(
+        self,
+        strict_search: Optional[str] = None,
+        filter_key: Union[dict, List[dict], None] = None
+    ) -> Dict[str, Any]:
+        query_args: Dict[str, Any] = {
+            "n_results": self.config.search_max_results
+        }
+        
+        where = self.build_where(filter_key)
+        if strict_search:
+            query_args["where_document"] = {"$contains": strict_search}
+        if where:
+            query_args["where"] = where
+        return query_args
+    
+    @log_event("Fusing BM25 and vector results...")
+    def fuse_lexical(
+        self,
+        queries: List[str],
+        results: List[ResultSet],
+        query_args: Dict[str, Any]
+    ) -> List[ResultSet]:
+        """fuse_lexical Fuses vector results with BM25 results
+
+        Searches the BM25 index for every query and fuses both
+        rankings with reciprocal rank fusion. Documents that only
+        the BM25 index found are loaded from the collection with the
+        same filters as the vector search and have no distance (NaN).
+        The fused scores are kept as relevance scores (see ResultSet.relevance()).
+
+        Args:
+            queries (List[str]): User queries
+            results (List[ResultSet]): Vector search results of every query
+            query_args (Dict[str, Any]): Arguments of the ChromaDB query (filters)
+
+        Returns:
+            List[ResultSet]: Fused search results of every query
+        """
+        lexical_index = self.db_manager.lexical_index
+        hits = [
+            [doc_id for doc_id, _ in lexical_index.search(query, self.config.search_lexical_results)] # type: ignore
+            for query in queries
+        ]
+        
+        # every document of the vector results already passed the filters
+        documents: Dict[str, tuple] = {}
+        for result in results:
+            for doc_id, doc, metadata in zip(result.ids.tolist(), result.documents, result.metadatas):
+                documents[doc_id] = (doc, metadata)
+        
+        missing_ids = list({doc_id for query_hits in hits for doc_id in query_hits if doc_id not in documents})
+        if missing_ids:
+            fetched = self.collection.get(
+                ids=missing_ids,
+                where=query_args.get("where"),
+                where_document=query_args.get("where_document"),
+                include=["documents", "metadatas"]
+            )
+            fetched_documents = fetched["documents"] or [""] * len(fetched["ids"])
+            fetched_metadatas = fetched["metadatas"] or [None] * len(fetched["ids"])
+            for doc_id, doc, metadata in zip(fetched["ids"], fetched_documents, fetched_metadatas):
+                documents[doc_id] = (doc, metadata)
+        
+        fused_results = []
+        for result, query_hits in zip(results, hits):
+            distances = dict(zip(result.ids.tolist(), result.distances.tolist()))
+            fused = reciprocal_rank_fusion(
+                [list(distances), [doc_id for doc_id in query_hits if doc_id in documents]],
+                k=self.config.search_fusion_k
+            )
+            ids = [doc_id for doc_id, _ in fused]
+            # a document at the top of both rankings scores 2 / (k + 1)
+            best_score = 2 / (self.config.search_fusion_k + 1)
+            fused_results.append(ResultSet(
+                ids=np.asarray(ids, dtype=np.str_),
+                distances=np.asarray([distances.get(doc_id, np.nan) for doc_id in ids], dtype=np.float32),
+                documents=[documents[doc_id][0] for doc_id in ids],
+                metadatas=[documents[doc_id][1] for doc_id in ids],
+                scores=np.asarray([score / best_score for _, score in fused], dtype=np.float32)
+            ))
+        return fused_results
+    
+    @log_event("Searching in collection (batch)")
+    def search_batch(
+        self,
+        queries: List[str],
+        strict_search: Optional[str] = None,
+        filter_key: Union[dict, List[dict], None] = None,
+        contexts: Optional[List[QueryContext]] = None
+    ) -> List[ResultSet]:
+        """search_batch Searches collection for several queries
+
+        Same as search_collection(), but for many queries at once.
+        Every query that isn't cached yet gets embedded and searched
+        in one single ChromaDB query and every query gets its own
+        distance- and token-filtered results.
+        
+        If there are query contexts, their (shared) embeddings are
+        used instead of embedding the queries again.
+
+        Args:
+            queries (List[str]): User queries
+            strict_search (Optional[str], optional): Searches for a strict key word. Defaults to None.
+            filter_key (Union[dict, List[dict], None], optional): Filters by metadata keys (see build_where()). Defaults to None.
+            contexts (Optional[List[QueryContext]], optional): Context of every query. Defaults to None.
+
+        Returns:
+            List[ResultSet]: Search results (same order as queries)
         """
-        # I genuinely don't know how to do this. This is ugly as fuck
-        distances = results.get("distances") or [[]]
-        documents = results.get("documents") or [[]]
-        ids = results.get("ids") or [[]]
-        metadatas = results.get("metadatas") or [[]]
-
-        for i in reversed(range(len(distances[0]))):
-            if distances[0][i] > max_distance:
-                distances[0].pop(i)
-                documents[0].pop(i)
-                ids[0].pop(i)
-                metadatas[0].pop(i)
+        query_args = self._query_args(strict_search, filter_key)
+        keys = [self._cache_key((query,), query_args) for query in queries]
+        
+        # ResultSets are never modified, so they can be cached as they are
+        results: List[Optional[ResultSet]] = [self.cache.get(key) for key in keys]
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            if contexts:
+                query_args["query_embeddings"] = [contexts[i].embedding for i in missing]
             else:
-                continue
-        return results
+                query_args["query_texts"] = [queries[i] for i in missing]
+            batch_results = self.collection.query(**query_args)
+            vector_results = [
+                self.filter_by_distance(
+                    results=ResultSet.from_query_result(batch_results, index),
+                    max_distance=self.config.search_max_distance
+                )
+                for index in range(len(missing))
+            ]
+            if self.db_manager.lexical_index is not None:
+                vector_results = self.fuse_lexical([queries[i] for i in missing], vector_results, query_args)
+            if self.reranker is not None:
+                vector_results = [
+                    self.reranker.rerank(queries[i], result)
+                    for i, result in zip(missing, vector_results)
+                ]
+            
+            for i, result in zip(missing, vector_results):
+                result = self.filter_by_tokens(results=result, max_tokens=self.config.search_max_tokens)
+                self.cache.set(keys[i], result)
+                results[i] = result
+        return results # type: ignore
     
     @log_event("Searching in collection")
     def search_collection(
         self,
         *query: str,
         strict_search: Optional[str] = None,
-        filter_key: Optional[dict] = None
-    ) -> QueryResult:
+        filter_key: Union[dict, List[dict], None] = None,
+        context: Optional[QueryContext] = None
+    ) -> ResultSet:
         """search_collection Searches collection
 
         This function sends a query to the database which returns
         the most relevant data for the corresponding user input.
         This then gets filtered but a few functions to save tokens
         and only use the most relevant information.
+        
+        Both filters are applied by ChromaDB itself, so only matching
+        documents are returned. If there are several queries, every
+        query gets filtered on its own (see search_batch()) and the
+        results are merged by distance.
 
         Args:
             strict_search (Optional[str], optional): Searches for a strict key word. Defaults to None.
-            filter_key (Optional[dict], optional): Filters by a specific metadata key. Defaults to None.
+            filter_key (Union[dict, List[dict], None], optional): Filters by metadata keys (see build_where()). Defaults to None.
+            context (Optional[QueryContext], optional): Context of the query, replaces `query`. Defaults to None.
 
         Returns:
-            QueryResult: Search results
+            ResultSet: Search results
         """
-        query_args: Dict[str, Any] = {
-            "query_texts": list(query),
-            "n_results": self.config.search_max_results
-        }
-        
-        if strict_search:
-            query_args["where_document"] = {"$contains": strict_search}
-        if filter_key:
-            query_args["where"] = filter_key
-        
-        results = self.collection.query(
-            query_texts=query_args["query_texts"],
-            n_results=query_args["n_results"]
-        )
-        
-        filtered_results = self.filter_by_distance(results=results, max_distance=self.config.search_max_distance)
-        return self.filter_by_tokens(results=filtered_results, max_tokens=self.config.search_max_tokens)
\ No newline at end of file
+        if context:
+            results = self.search_batch([context.query], strict_search=strict_search, filter_key=filter_key, contexts=[context])
+        else:
+            results = self.search_batch(list(query), strict_search=strict_search, filter_key=filter_key)
+        if len(results) == 1:
+            return results[0]
+        else:
+            return ResultSet.merge(results)
@@ -0,0 +1,117 @@
+import re
+from typing import (
+    Dict,
+    List,
+    Optional
+)
+
+import numpy as np
+
+import Athena.common.utils as utils
+from Athena.core.lexical import tokenize
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+
+
+def split_sentences(text: str) -> List[str]:
+    """split_sentences Splits text into sentences
+
+    Splits after '.', '!' and '?' followed by whitespace and
+    at every line break.
+
+    Args:
+        text (str): Any string
+
+    Returns:
+        List[str]: List of non-empty sentences
+    """
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+
+class ExtractiveSummarizer:
+    def __init__(self, max_tokens: int = 200) -> None:
+        """__init__ Initialises ExtractiveSummarizer
+
+        A local summarizer which shortens text by keeping its
+        most representative sentences. Every sentence is turned
+        into a TF-IDF vector and scored by its cosine similarity to
+        the centroid of all sentences. The best sentences are packed
+        into the token budget and returned in their original order.
+
+        It doesn't need any network or model and always gives the
+        same output for the same text.
+
+        Args:
+            max_tokens (int, optional): Max tokens of a summary. Defaults to 200.
+        """
+        self.max_tokens = max_tokens
+
+    def summarize(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """summarize Summarizes text
+
+        Args:
+            text (str): Any string
+            max_tokens (Optional[int], optional): Max tokens of the summary. Defaults to None (self.max_tokens).
+
+        Returns:
+            str: Summary (a single line)
+        """
+        max_chars = utils.tokens_to_chars(max_tokens or self.max_tokens)
+        sentences = split_sentences(text)
+        if not sentences:
+            return ""
+
+        lengths = np.asarray([len(sentence) for sentence in sentences])
+        if lengths.sum() + len(sentences) - 1 <= max_chars:
+            return " ".join(sentences)
+
+        scores = self.score(sentences)
+        chosen = []
+        seen = set()
+        used = 0
+        for i in np.argsort(-scores, kind="stable"):
+            length = lengths[i] + (1 if chosen else 0)
+            if sentences[i] not in seen and used + length <= max_chars:
+                chosen.append(i)
+                seen.add(sentences[i])
+                used += length
+
+        if not chosen:
+            # not even the best sentence fits, so cut it off
+            return sentences[int(np.argmax(scores))][:max_chars]
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+    def score(self, sentences: List[str]) -> np.ndarray:
+        """score Scores sentences
+
+        Args:
+            sentences (List[str]): List of sentences
+
+        Returns:
+            np.ndarray: Cosine similarity of every sentence to the centroid
+        """
+        vocabulary: Dict[str, int] = {}
+        rows, columns = [], []
+        for row, sentence in enumerate(sentences):
+            for term in tokenize(sentence):
+                rows.append(row)
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+
+        if not vocabulary:
+            return np.zeros(len(sentences), dtype=np.float32)
+
+        counts = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+        np.add.at(counts, (rows, columns), 1)
+
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+        vectors = counts * idf
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        centroid = vectors.mean(axis=0)
+        centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+        return vectors @ centroid
@@ -6,7 +6,12 @@ from Athena.core.config import (
 )
 from Athena.processor.validator import Validator
 from Athena.processor.serializer import Serializer
-from typing import TYPE_CHECKING
+from typing import (
+    Any,
+    List,
+    Optional,
+    TYPE_CHECKING
+)
 
 if TYPE_CHECKING:
     from Athena.cli.progress import ProgressBar
@@ -39,9 +44,32 @@ class Processor:
         self.validator = Validator(self.config, self.db_manager, self.filename, progress_bar=self.progress_bar)
         self.serializer = Serializer()
         
-        self.data = self.validator.validate_input()
         if insert_json:
-            self.db_manager.insert_json(self.data)
+            # JSON inputs are streamed straight into the database
+            # so they never have to be held in RAM at once
+            data = self.validator.stream_input()
+            if self.config.incremental_ingestion:
+                self.db_manager.sync_json(data, source=self.filename)
+            else:
+                self.db_manager.insert_json(data)
+            self._data: Optional[List[Any]] = data if isinstance(data, list) else None
+        else:
+            self._data = self.validator.validate_input()
+    
+    @property
+    def data(self) -> List[Any]:
+        """data Returns the validated input data
+
+        Streamed JSON inputs aren't kept in RAM after inserting
+        them, so they're only validated (and loaded) again the
+        first time this is used.
+
+        Returns:
+            List[Any]: JSON objects or documents
+        """
+        if self._data is None:
+            self._data = self.validator.validate_input()
+        return self._data
 
 if __name__ == "__main__":
     c = Config(InputTypes.MD, OutputTypes.PLAIN)
@@ -1,3 +1,4 @@
+import numpy as np
 from typing import Any
 from dataclasses import fields
 
@@ -32,6 +33,10 @@ class Serializer:
         
         if hasattr(value, "__dataclass_fields__"):
             return self.dataclass_to_dict(value, visited)
+        elif hasattr(value, "to_dict"):
+            return self._convert_nested_attr(value.to_dict(), visited)
+        elif isinstance(value, np.ndarray):
+            return value.tolist()
         elif hasattr(value, "__dict__"):
             return self.class_to_dict(value, visited)
         elif isinstance(value, list):
@@ -2,10 +2,13 @@ import os
 from typing import (
     List,
     Any,
+    Iterable,
+    Iterator,
     TYPE_CHECKING
 )
 from Athena.core.config import Config
 from Athena.core.db import DBManager
+from Athena.core.loader import JSONStreamLoader
 from Athena.processor.normalizer import DocumentNormalizer
 from Athena.processor.parser import DocumentParser
 from Athena.common.types import InputTypes
@@ -31,42 +34,61 @@ class Validator:
         self.normalizer = DocumentNormalizer(self.config)
         self.parser = DocumentParser(self.config, self.filename)
     
-    def _stringize_data(
+    def _validate_object(
         self,
-        progress_bar: 'ProgressBar' = None
-    ) -> None:
-        """_stringize_data Converts objects to strings
+        obj: dict,
+        keys: List[str]
+    ) -> dict:
+        """_validate_object Validates a single JSON object
 
-        Converts any non-string in the JSON to string
-        """
-        if progress_bar:
-            progress_bar.steps = len(self.data)
+        Checks if the keys of the object are consistent with
+        the keys of the first object and converts any value of
+        the object to string, except for numbers and booleans, so
+        they're stored as numbers in the metadata and range filters
+        (like `$gte`) work on them (see DBManager._metadata()).
 
-        for i in range(len(self.data)):
-            if progress_bar: progress_bar.advance_step()
+        Args:
+            obj (dict): Pythonic JSON object
+            keys (List[str]): Keys of the first object
+
+        Raises:
+            KeyError: If JSON schema is not consistent
 
-            dictionary: dict = self.data[i]
-            for key, value in dictionary.items():
-                if not isinstance(value, str):
-                    self.data[i][key] = str(value)
+        Returns:
+            dict: Validated object
+        """
+        if list(obj.keys()) != keys:
+            raise KeyError("JSON schema must be consistent for every object.")
+        
+        for key, value in obj.items():
+            if not isinstance(value, (str, int, float, bool)):
+                obj[key] = str(value)
+        return obj
     
-    def _check_keys(self) -> None:
-        """_check_keys Checks for key-consistency
+    def stream_json(self) -> Iterator[dict]:
+        """stream_json Streams validated JSON input data
 
-        Checks if all the keys in every object are consistent
+        Loads the JSON or JSONL input data object by object and
+        validates every object in the same pass, so the input file
+        never has to be loaded into RAM at once.
 
-        Raises:
-            KeyError: If JSON schema is not consistent
+        Yields:
+            Iterator[dict]: Validated Pythonic JSON objects
         """
-        previous_keys = []
+        loader = JSONStreamLoader(self.filename)
+        if self._resolve_input_type().value == InputTypes.JSONL.value:
+            objects = loader.iter_lines()
+        else:
+            objects = loader.iter_array()
+        
+        keys: List[str] = []
+        for obj in objects:
+            if not keys:
+                keys = list(obj.keys())
+            if self.progress_bar: self.progress_bar.set_progress(min(loader.progress, 0.99))
+            yield self._validate_object(obj, keys)
         
-        for obj in self.data:
-            keys = list(obj.keys())
-            if not previous_keys:
-                previous_keys = keys
-            else:
-                if previous_keys != keys:
-                    raise KeyError("JSON schema must be consistent for every object.")
+        if self.progress_bar: self.progress_bar.set_progress(1.0)
     
     def validate_json(self) -> None:
         """validate_json Validates JSON input data
@@ -74,9 +96,7 @@ class Validator:
         Validates the JSON input data and then upserts it into
         the ChromaDB database.
         """
-        self.data = self.db_manager.load_json(self.filename)
-        self._check_keys()
-        self._stringize_data(self.progress_bar)
+        self.data = list(self.stream_json())
     
     def validate_txt(self) -> None:
         """validate_txt Validates Plain-text input data
@@ -107,6 +127,50 @@ class Validator:
         if self.config.enforce_uniform_chunks:
             self.data = self.normalizer.normalize_document_lengths(self.data, self.progress_bar)
     
+    def _resolve_input_type(self) -> InputTypes:
+        """_resolve_input_type Returns the input type
+
+        Returns the configured input type or, if it's set to AUTO,
+        the input type matching the file extension.
+
+        Raises:
+            ValueError: If the file extension is unknown
+
+        Returns:
+            InputTypes: Input type of the file
+        """
+        if self.config.input_type.value != InputTypes.AUTO.value:
+            return self.config.input_type
+        
+        ext = os.path.splitext(self.filename)[1].lower()
+        match ext:
+            case ".json":
+                return InputTypes.JSON
+            case ".jsonl":
+                return InputTypes.JSONL
+            case ".txt":
+                return InputTypes.PLAIN
+            case ".md":
+                return InputTypes.MD
+            case ".pdf":
+                return InputTypes.PDF
+            case _:
+                raise ValueError(f"Invalid file extension \"{ext}\" in \"{self.filename}\"")
+    
+    def stream_input(self) -> Iterable[Any]:
+        """stream_input Validates the input file lazily
+
+        Same as validate_input(), but JSON and JSONL inputs
+        are validated while they're being consumed instead of
+        being loaded into RAM first.
+
+        Returns:
+            Iterable[Any]: Iterator of JSON objects or list of documents
+        """
+        if self._resolve_input_type().value in (InputTypes.JSON.value, InputTypes.JSONL.value):
+            return self.stream_json()
+        return self.validate_input()
+    
     @log_event("Validating input file...")
     def validate_input(self) -> List[Any]:
         """validate_input Validates the input file
@@ -114,21 +178,8 @@ class Validator:
         Pretty self-explanatory, check individual methods
         for more info.
         """
-        match self.config.input_type.value:
-            case InputTypes.AUTO.value:
-                ext = os.path.splitext(self.filename)[1].lower()
-                match ext:
-                    case ".json":
-                        self.validate_json()
-                    case ".txt":
-                        self.validate_txt()
-                    case ".md":
-                        self.validate_md()
-                    case ".pdf":
-                        self.validate_pdf()
-                    case _:
-                        raise ValueError(f"Invalid file extension \"{ext}\" in \"{self.filename}\"")
-            case InputTypes.JSON.value:
+        match self._resolve_input_type().value:
+            case InputTypes.JSON.value | InputTypes.JSONL.value:
                 self.validate_json()
             case InputTypes.PLAIN.value:
                 self.validate_txt()
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import re
+from typing import (
+    Any,
+    List
+)
+
+import numpy as np
+import pytest
+from chromadb.api.types import (
+    Documents,
+    EmbeddingFunction
+)
+
+import Athena.core.db as db_module
+from Athena.core.config import Config
+from Athena.core.db import DBManager
+from Athena.common.types import (
+    InputTypes,
+    OutputTypes,
+    ShorteningStrategies
+)
+
+DIMENSIONS = 64
+
+
+class FakeEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Deterministic bag-of-words embeddings, same words = same vector"""
+
+    calls = 0
+
+    def __init__(self) -> None:
+        pass
+
+    def __call__(self, input: Documents) -> List[np.ndarray]: # type: ignore
+        FakeEmbeddingFunction.calls += len(input)
+        embeddings = []
+        for text in input:
+            vector = np.zeros(DIMENSIONS, dtype=np.float32)
+            for word in re.findall(r"\w+", text.lower()):
+                vector[int(hashlib.md5(word.encode("UTF-8")).hexdigest(), 16) % DIMENSIONS] += 1
+            vector[0] += 1e-3    # empty texts still need a direction
+            embeddings.append(vector / np.linalg.norm(vector))
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "fake"
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict) -> 'FakeEmbeddingFunction':
+        return FakeEmbeddingFunction()
+
+
+@pytest.fixture
+def config() -> Config:
+    cfg = Config(InputTypes.AUTO, OutputTypes.PLAIN)
+    cfg.search_max_distance = 1e9
+    cfg.search_hybrid = True
+    cfg.rerank = False
+    cfg.response_cache = False
+    cfg.background_compression = False
+    cfg.memory_shortening = ShorteningStrategies.EXTRACTIVE
+    cfg.retention_interval = 0
+    cfg.ingestion_workers = 1
+    return cfg
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch, config) -> DBManager:
+    """DBManager with every file in a temporary folder and fake embeddings"""
+    monkeypatch.setenv("CHROMA_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(db_module, "_internal_dir", str(tmp_path))
+    monkeypatch.setattr(db_module, "_lexical_index_path", str(tmp_path / "bm25.pkl"))
+    monkeypatch.setattr(db_module, "_response_cache_path", str(tmp_path / "responses.sqlite3"))
+    monkeypatch.setattr(db_module, "create_embedding_function", lambda config, cache_path=None: FakeEmbeddingFunction())
+    monkeypatch.setattr("Athena.core.memory._conversation_log_path", str(tmp_path / "conversation.sqlite3"))
+    return DBManager(config=config)
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    """Writes a list of objects into a JSON file and returns its path"""
+    def write(objects: List[Any], name: str = "input.json") -> str:
+        path = tmp_path / name
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(objects, file)
+        return str(path)
+    return write
@@ -0,0 +1,56 @@
+from Athena.core.config import Config
+from Athena.common.types import (
+    EmbeddingBackends,
+    ShorteningStrategies
+)
+
+# config file from before there were any of the newer sections
+OLD_CONFIG = """[Response]
+ModelName = gpt-4.1-mini
+Temperature = 0.5
+MaxOutputTokens = 512
+TopP = 1.0
+Store = true
+
+[Parsing]
+TextParsingChunkSize = 256
+EnforceUniformChunks = true
+
+[Memory]
+Entries = 3
+TokensPerMemory = 200
+SearchResults = 3
+
+[Search]
+MaxTokens = 2048
+MaxDistance = 1.2
+MaxResults = 96"""
+
+
+def test_old_config_file_uses_defaults(tmp_path, monkeypatch):
+    defaults = Config()
+    (tmp_path / "config.ini").write_text(OLD_CONFIG)
+    monkeypatch.chdir(tmp_path)
+
+    config = Config()
+    assert config.response.temperature == 0.5
+    assert config.max_entries == 3
+    assert config.response.stream == defaults.response.stream
+    assert config.memory_shortening == defaults.memory_shortening
+    assert config.embedding_backend == defaults.embedding_backend
+    assert config.search_hybrid == defaults.search_hybrid
+    assert config.response_cache == defaults.response_cache
+    assert config.batch_requests_per_minute == defaults.batch_requests_per_minute
+
+
+def test_new_options_are_read(tmp_path, monkeypatch):
+    (tmp_path / "config.ini").write_text(
+        OLD_CONFIG.replace("SearchResults = 3", "SearchResults = 3\nShortening = truncate")
+        + "\n\n[Embedding]\nBackend = onnx\n\n[Async]\nWorkers = 2"
+    )
+    monkeypatch.chdir(tmp_path)
+
+    config = Config()
+    assert config.memory_shortening == ShorteningStrategies.TRUNCATE
+    assert config.embedding_backend == EmbeddingBackends.ONNX
+    assert config.async_workers == 2
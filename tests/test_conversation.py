@@ -0,0 +1,50 @@
+import sqlite3
+
+from Athena.core.conversation import ConversationLog
+
+
+def test_last_and_since_per_session():
+    log = ConversationLog(":memory:")
+    log.append([{"role": "user", "content": "a1"}, {"role": "assistant", "content": "a2"}], ["m1", "m2"], timestamp=1, session_id="a")
+    log.append([{"role": "user", "content": "b1"}], ["m3"], timestamp=2, session_id="b")
+    log.append([{"role": "user", "content": "a3"}], ["m4"], timestamp=3, session_id="a")
+
+    assert [m["content"] for m in log.last(2, "a")] == ["a2", "a3"]
+    assert [m["content"] for m in log.last(5, "b")] == ["b1"]
+    assert log.last(0, "a") == []
+    assert [m["content"] for m in log.since(2, session_id="a")] == ["a3"]
+    assert len(log) == 4 and log.last_seq == 4
+
+
+def test_replace_and_delete():
+    log = ConversationLog(":memory:")
+    log.append([{"role": "user", "content": "long question"}, {"role": "assistant", "content": "long answer"}], ["m1", "m2"])
+    log.replace(["m2"], [{"role": "assistant", "content": "short"}])
+    assert [m["content"] for m in log.last(2)] == ["long question", "short"]
+    log.delete(["m1"])
+    assert log.last(5) == [{"role": "assistant", "content": "short"}]
+
+
+def test_json_content_round_trip():
+    log = ConversationLog(":memory:")
+    log.append([{"role": "user", "content": "text"}, {"role": "assistant", "content": {"answer": [1, 2]}}], ["m1", "m2"])
+    log.replace(["m1"], [{"role": "user", "content": ["a", "b"]}])
+    assert log.last(2) == [
+        {"role": "user", "content": ["a", "b"]},
+        {"role": "assistant", "content": {"answer": [1, 2]}}
+    ]
+
+
+def test_old_logs_are_migrated(tmp_path):
+    path = str(tmp_path / "conversation.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE messages (seq INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL, "
+        "role TEXT NOT NULL, content TEXT NOT NULL, memory_id TEXT)"
+    )
+    connection.execute("INSERT INTO messages (timestamp, role, content) VALUES (1, 'user', '{\"not\": \"json\"}')")
+    connection.commit()
+    connection.close()
+
+    # old rows belong to the default session and are plain text
+    assert ConversationLog(path).last(1) == [{"role": "user", "content": '{"not": "json"}'}]
@@ -0,0 +1,41 @@
+import numpy as np
+
+from Athena.core.embeddings import CachedEmbeddingFunction
+from Athena.tests.conftest import FakeEmbeddingFunction
+
+
+def test_only_missing_texts_get_embedded(tmp_path):
+    inner = FakeEmbeddingFunction()
+    cache = CachedEmbeddingFunction(inner, "fake", str(tmp_path / "embeddings.sqlite3"))
+    calls = FakeEmbeddingFunction.calls
+
+    first = cache(["apple", "banana"])
+    second = cache(["banana", "cherry", "apple"])
+
+    assert FakeEmbeddingFunction.calls - calls == 3
+    assert np.allclose(second[0], first[1]) and np.allclose(second[2], first[0])
+    assert cache.stats['hits'] == 2 and cache.stats['misses'] == 3
+
+
+def test_cache_is_persistent_and_per_model(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    CachedEmbeddingFunction(FakeEmbeddingFunction(), "fake", path)(["apple"])
+
+    assert CachedEmbeddingFunction(FakeEmbeddingFunction(), "fake", path)._lookup(
+        [CachedEmbeddingFunction._hash(None, "apple")] # type: ignore
+    )[0] is not None
+    other = CachedEmbeddingFunction(FakeEmbeddingFunction(), "other", path)
+    other(["apple"])
+    assert other.stats['misses'] == 1
+
+
+def test_size_accounting_and_eviction(tmp_path):
+    cache = CachedEmbeddingFunction(FakeEmbeddingFunction(), "fake", str(tmp_path / "embeddings.sqlite3"))
+    vector = np.ones(16, dtype=np.float32)
+    cache._store({"a": vector, "b": vector})
+    cache._store({"a": vector, "b": vector})     # already stored, doesn't count twice
+    assert cache.stats['size'] == cache._stored_size() == 2 * vector.nbytes
+
+    cache.max_size = 5 * vector.nbytes
+    cache._store({str(i): vector for i in range(10)})
+    assert cache._size == cache._stored_size() <= cache.max_size
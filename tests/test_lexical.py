@@ -0,0 +1,73 @@
+import json
+
+from Athena.core.lexical import (
+    BM25Index,
+    document_text,
+    reciprocal_rank_fusion,
+    tokenize
+)
+
+
+def test_tokenize_keeps_compound_identifiers():
+    assert tokenize("Error ERR-404 in v1.2.3") == ["error", "err-404", "err", "404", "in", "v1.2.3", "v1", "2", "3"]
+
+
+def test_document_text_decodes_json():
+    document = json.dumps({"name": "Müller", "city": "Köln"})
+    assert "\\u00fc" in document
+    assert document_text(document) == '{"name": "Müller", "city": "Köln"}'
+    assert document_text("plain \\u00fc text") == "plain \\u00fc text"
+    assert document_text("{broken \\u00fc") == "{broken \\u00fc"
+
+
+def test_search_ranks_exact_terms():
+    index = BM25Index()
+    index.add(
+        ["1", "2", "3"],
+        ["printer shows ERR-404", "printer is out of paper", json.dumps({"owner": "Müller"})]
+    )
+    assert [doc_id for doc_id, _ in index.search("ERR-404")] == ["1"]
+    assert [doc_id for doc_id, _ in index.search("printer")][0] in ("1", "2")
+    assert [doc_id for doc_id, _ in index.search("müller")] == ["3"]
+    assert index.search("u00fc") == []
+
+
+def test_replace_and_remove():
+    index = BM25Index()
+    index.add(["1", "2"], ["apple", "banana"])
+    index.add(["1"], ["cherry"])
+    index.remove(["2"])
+    assert len(index) == 1
+    assert index.search("apple") == []
+    assert [doc_id for doc_id, _ in index.search("cherry")] == ["1"]
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "bm25.pkl")
+    index = BM25Index(path)
+    index.add(["1", "2"], ["apple pie", "banana bread"])
+    index.remove(["2"])
+    index.save()
+
+    loaded = BM25Index(path)
+    assert loaded.ids() == ["1"]
+    assert [doc_id for doc_id, _ in loaded.search("apple")] == ["1"]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == 1 / 62 + 1 / 61
+
+
+def test_sync_rebuilds_after_same_size_change(db):
+    db.collection.add(ids=["1", "2"], documents=["apple pie", "banana bread"])
+    db.sync_lexical_index()
+    assert sorted(db.lexical_index.ids()) == ["1", "2"]
+
+    # same amount of documents, but different ones
+    db.collection.delete(ids=["1"])
+    db.collection.add(ids=["3"], documents=["cherry tart"])
+    db.sync_lexical_index()
+    assert sorted(db.lexical_index.ids()) == ["2", "3"]
+    assert [doc_id for doc_id, _ in db.lexical_index.search("cherry")] == ["3"]
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from Athena.core.loader import JSONStreamLoader
+from Athena.processor.processor import Processor
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_array_is_streamed_across_chunks(tmp_path):
+    objects = [{"id": i, "text": "ä" * (i % 7), "nested": {"values": list(range(i % 5))}} for i in range(200)]
+    loader = JSONStreamLoader(write(tmp_path / "a.json", json.dumps(objects, ensure_ascii=False)), chunk_size=16)
+    assert list(loader.iter_array()) == objects
+    assert loader.progress == 1.0
+
+
+def test_numbers_at_chunk_borders(tmp_path):
+    loader = JSONStreamLoader(write(tmp_path / "a.json", "[1234567, 89, 1.5e10]"), chunk_size=3)
+    assert list(loader.iter_array()) == [1234567, 89, 1.5e10]
+
+
+def test_single_object_and_empty_files(tmp_path):
+    assert list(JSONStreamLoader(write(tmp_path / "o.json", '﻿ {"a": 1}')).iter_array()) == [{"a": 1}]
+    assert list(JSONStreamLoader(write(tmp_path / "e.json", "[]")).iter_array()) == []
+    assert list(JSONStreamLoader(write(tmp_path / "n.json", "  ")).iter_array()) == []
+
+
+def test_invalid_json_raises(tmp_path):
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONStreamLoader(write(tmp_path / "a.json", '[{"a": 1}, {"b": '), chunk_size=4).iter_array())
+
+
+def test_jsonl_skips_blank_lines(tmp_path):
+    loader = JSONStreamLoader(write(tmp_path / "a.jsonl", '{"a": 1}\n\n{"a": 2}\n'))
+    assert list(loader.iter_lines()) == [{"a": 1}, {"a": 2}]
+
+
+def test_processor_keeps_data_after_streaming(db, config, json_file):
+    path = json_file([{"k": i, "v": "x"} for i in range(50)])
+    processor = Processor(db, config, path, insert_json=True)
+    assert db.collection.count() == 50
+    assert len(processor.data) == 50
+    assert processor.data[0] == {"k": 0, "v": "x"}
@@ -0,0 +1,66 @@
+import numpy as np
+
+from Athena.core.packer import (
+    ContextPacker,
+    MESSAGE_OVERHEAD,
+    SOURCE_WEIGHTS,
+    group_turns,
+    knapsack,
+    message_tokens
+)
+
+
+def turn(question, answer):
+    return [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+
+def test_knapsack_finds_best_combination():
+    chosen = knapsack(np.asarray([5, 4, 3]), np.asarray([10.0, 7.0, 6.0]), 7)
+    assert chosen.tolist() == [False, True, True]
+    assert not knapsack(np.asarray([8]), np.asarray([1.0]), 7).any()
+
+
+def test_group_turns():
+    messages = [{"role": "assistant", "content": "hi"}, *turn("q1", "a1"), *turn("q2", "a2")]
+    assert [len(t) for t in group_turns(messages)] == [1, 2, 2]
+    assert message_tokens(turn("q1", "a1")) == 2 * (message_tokens("q1") + MESSAGE_OVERHEAD)
+
+
+def test_scores_come_from_relevance():
+    packer = ContextPacker(1000)
+    candidates = packer.candidates('similar', ["a", "b"], [0.5, 0.25])
+    assert [c.score for c in candidates] == [SOURCE_WEIGHTS['similar'] * 0.5, SOURCE_WEIGHTS['similar'] * 0.25]
+    # recent turns have no relevance, newer ones are worth more
+    assert [c.score for c in packer.candidates('recent', ["new", "old"])] == [1.0, 0.5]
+
+
+def test_everything_fits():
+    packer = ContextPacker(1000)
+    packed = packer.pack(packer.candidates('search', ["a b c", "d e f"], [0.9, 0.1]), fixed_tokens=10)
+    assert packed.contents('search') == ["a b c", "d e f"]
+    assert packed.report()['sources']['search']['dropped'] == 0
+
+
+def test_relevant_documents_win_and_turns_stay_whole():
+    long = " ".join(["word"] * 60)
+    packer = ContextPacker(200)
+    recent = group_turns([*turn("old question", long), *turn("new question", "short answer")])[::-1]
+    candidates = (
+        packer.candidates('search', [long, long], [0.05, 0.95])
+        + packer.candidates('recent', recent)
+    )
+    packed = packer.pack(candidates, fixed_tokens=50)
+
+    assert packed.tokens <= 200
+    assert packed.contents('search') == [long]
+    assert [c.rank for c in packed.selected if c.source == 'search'] == [1]
+    # turns are kept or dropped as a whole
+    for kept in packed.contents('recent'):
+        assert [message["role"] for message in kept] == ["user", "assistant"]
+    assert packed.contents('recent')[0][0]["content"] == "new question"
+
+
+def test_nothing_fits():
+    packer = ContextPacker(10)
+    packed = packer.pack(packer.candidates('search', ["a"]), fixed_tokens=20)
+    assert packed.selected == [] and len(packed.dropped) == 1
@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from Athena.core.gpt import GPTQuery
+from Athena.core.response_cache import (
+    ResponseCache,
+    config_key,
+    ids_key
+)
+from Athena.core.search import SearchEngine
+from Athena.common.types import QueryData
+
+
+class FakeResponses:
+    """Stands in for client.responses, every request answers with its number"""
+
+    def __init__(self) -> None:
+        self.requests = []
+
+    def create(self, stream=False, **params):
+        self.requests.append(params)
+        text = f"answer {len(self.requests)}"
+        usage = SimpleNamespace(
+            input_tokens=10,
+            output_tokens=2,
+            total_tokens=12,
+            input_tokens_details=SimpleNamespace(cached_tokens=0)
+        )
+        if not stream:
+            return SimpleNamespace(output_text=text, status="completed", usage=usage)
+        return FakeStream([
+            SimpleNamespace(type="response.output_text.delta", delta=text),
+            SimpleNamespace(type="response.completed", response=SimpleNamespace(status="completed", usage=usage))
+        ])
+
+
+class FakeStream:
+    def __init__(self, events) -> None:
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def test_hit_and_threshold(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), threshold=0.95)
+    cache.set("config", "ids", vector(1, 0), "answer")
+    assert cache.get("config", "ids", vector(1, 0.1)) == "answer"
+    assert cache.get("config", "ids", vector(1, 1)) is None
+    assert cache.get("config", "other ids", vector(1, 0)) is None
+    assert cache.get("other config", "ids", vector(1, 0)) is None
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 3
+
+
+def test_lru_persistence_and_invalidation(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path, max_size=2, fingerprint="a")
+    cache.set("c", "1", vector(1, 0), "first")
+    cache.set("c", "2", vector(1, 0), "second")
+    cache.get("c", "1", vector(1, 0))
+    cache.set("c", "3", vector(1, 0), "third")     # evicts the least recently used one
+    assert cache.get("c", "2", vector(1, 0)) is None
+    cache.close()
+
+    reopened = ResponseCache(path, max_size=2, fingerprint="a")
+    assert reopened.get("c", "1", vector(1, 0)) == "first"
+    assert reopened.get("c", "3", vector(1, 0)) == "third"
+    reopened.close()
+
+    changed = ResponseCache(path, max_size=2, fingerprint="b")
+    assert len(changed) == 0
+
+
+def test_keys():
+    assert ids_key(["b", "a"]) == ids_key(["a", "b"])
+    assert config_key({'model': "m", 'input': [1]}) == config_key({'model': "m", 'input': [2]})
+    assert config_key({'model': "m"}) != config_key({'model': "n"})
+
+
+def ask(db, search, query, session_id):
+    gpt = GPTQuery(
+        db,
+        QueryData(query, None, context=db.query_context(query)),
+        db.chat_history.config,
+        instant_request=False,
+        search_engine=search,
+        session_id=session_id
+    )
+    answer = "".join(gpt.stream_response())
+    return gpt, answer
+
+
+def setup_cache(db, config, tmp_path):
+    db.collection.add(ids=["1", "2"], documents=["the eiffel tower is in paris", "the colosseum is in rome"])
+    db.response_cache = ResponseCache(str(tmp_path / "cache.sqlite3"), fingerprint=db.fingerprint())
+    db.openai_client = SimpleNamespace(responses=FakeResponses())
+    return SearchEngine(config, db)
+
+
+def test_repeated_question_hits_cache(db, config, tmp_path):
+    search = setup_cache(db, config, tmp_path)
+
+    first, answer = ask(db, search, "where is the eiffel tower", "alice")
+    second, repeated = ask(db, search, "where is the eiffel tower", "alice")
+
+    assert not first.cached
+    assert second.cached
+    assert repeated == answer
+    assert len(db.openai_client.responses.requests) == 1
+
+
+def test_memories_dont_leak_into_other_sessions(db, config, tmp_path):
+    search = setup_cache(db, config, tmp_path)
+
+    ask(db, search, "where is the colosseum", "alice")
+    ask(db, search, "where is the eiffel tower", "alice")    # cached with alice's memories
+    bob, _ = ask(db, search, "where is the colosseum", "bob")
+    bob_again, _ = ask(db, search, "where is the eiffel tower", "bob")
+
+    assert bob.cached                   # no memories yet, shared by every session
+    assert not bob_again.cached         # bob has other memories than alice
+    assert len(db.openai_client.responses.requests) == 3
+
+
+def test_incomplete_responses_arent_cached(db, config, tmp_path):
+    search = setup_cache(db, config, tmp_path)
+    responses = db.openai_client.responses
+    create = responses.create
+
+    def incomplete(stream=False, **params):
+        rsp = create(stream=stream, **params)
+        rsp.events[-1].response.status = "incomplete"
+        return rsp
+    responses.create = incomplete
+
+    ask(db, search, "where is the eiffel tower", "alice")
+    again, _ = ask(db, search, "where is the eiffel tower", "alice")
+    assert not again.cached
+    assert len(responses.requests) == 2
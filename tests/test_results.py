@@ -0,0 +1,57 @@
+import numpy as np
+
+from Athena.core.results import ResultSet
+
+
+def results(ids, distances, scores=None):
+    return ResultSet(
+        np.asarray(ids, dtype=np.str_),
+        np.asarray(distances, dtype=np.float32),
+        [f"document {i}" for i in ids],
+        [{"id": i} for i in ids],
+        None if scores is None else np.asarray(scores, dtype=np.float32)
+    )
+
+
+def test_from_query_result():
+    result = ResultSet.from_query_result({
+        "ids": [["a", "b"], ["c"]],
+        "distances": [[0.1, 0.2], [0.3]],
+        "documents": [["A", "B"], ["C"]],
+        "metadatas": None
+    }, index=1)
+    assert result.ids.tolist() == ["c"]
+    assert result.documents == ["C"]
+    assert result.metadatas == [None]
+
+
+def test_select_with_mask_and_slice():
+    result = results(["a", "b", "c"], [0.1, 0.5, 0.2], [0.9, 0.1, 0.5])
+    masked = result.select(np.asarray([True, False, True]))
+    assert masked.ids.tolist() == ["a", "c"]
+    assert masked.documents == ["document a", "document c"]
+    assert masked.metadatas == [{"id": "a"}, {"id": "c"}]
+    assert masked.scores.tolist() == [0.8999999761581421, 0.5]
+    assert result.select(slice(1, 3)).ids.tolist() == ["b", "c"]
+    # the original isn't modified
+    assert len(result) == 3
+
+
+def test_filters():
+    result = results(["a", "b", "c"], [0.1, 0.5, 0.2])
+    assert result.filter_by_distance(0.3).ids.tolist() == ["a", "c"]
+    assert result.filter_by_tokens(10, np.asarray([4, 6, 1])).ids.tolist() == ["a", "b"]
+    assert result.filter_by_tokens(3, np.asarray([4, 6, 1])).ids.tolist() == []
+
+
+def test_merge_keeps_closest_duplicate():
+    merged = ResultSet.merge([results(["a", "b"], [0.4, 0.2]), results(["a", "c"], [0.1, 0.3])])
+    assert sorted(zip(merged.ids.tolist(), merged.distances.tolist())) == [
+        ("a", np.float32(0.1)), ("b", np.float32(0.2)), ("c", np.float32(0.3))
+    ]
+
+
+def test_relevance():
+    result = results(["a", "b"], [0.0, np.nan])
+    assert result.relevance().tolist() == [1.0, 0.0]
+    assert result.with_scores([0.3, 0.7]).relevance().tolist() == [0.30000001192092896, 0.699999988079071]
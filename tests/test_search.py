@@ -0,0 +1,51 @@
+from Athena.core.search import SearchEngine
+from Athena.processor.processor import Processor
+
+CITIES = [
+    {"city": "Paris", "year": 2018, "rating": 4.5, "open": True},
+    {"city": "Paris", "year": 2021, "rating": 3.0, "open": False},
+    {"city": "Berlin", "year": 2022, "rating": 4.0, "open": True},
+    {"city": "Rome", "year": 2015, "rating": 2.5, "open": True},
+]
+
+
+def ingest(db, config, json_file):
+    Processor(db, config, json_file(CITIES), insert_json=True)
+    return SearchEngine(config, db)
+
+
+def years(results):
+    return sorted(metadata["year"] for metadata in results.metadatas)
+
+
+def test_numeric_metadata_stays_numeric(db, config, json_file):
+    ingest(db, config, json_file)
+    metadatas = db.collection.get(include=["metadatas"])["metadatas"]
+    assert all(isinstance(metadata["year"], int) for metadata in metadatas)
+    assert all(isinstance(metadata["rating"], float) for metadata in metadatas)
+    assert all(isinstance(metadata["open"], bool) for metadata in metadatas)
+
+
+def test_range_filter(db, config, json_file):
+    search = ingest(db, config, json_file)
+    assert years(search.search_collection("city", filter_key={"year": {"$gte": 2020}})) == [2021, 2022]
+    # numeric strings work as well
+    assert years(search.search_collection("city", filter_key={"year": {"$lt": "2019"}})) == [2015, 2018]
+
+
+def test_equality_filters(db, config, json_file):
+    search = ingest(db, config, json_file)
+    assert years(search.search_collection("city", filter_key={"year": 2021})) == [2021]
+    assert years(search.search_collection("city", filter_key={"city": "Paris", "open": True})) == [2018]
+
+
+def test_build_where(db, config):
+    search = SearchEngine(config, db)
+    assert search.build_where(None) is None
+    assert search.build_where({"city": "Paris"}) == {"city": "Paris"}
+    assert search.build_where({"city": "Paris", "year": {"$gte": "2020", "$in": ["1"]}}) == {
+        "$and": [{"city": "Paris"}, {"year": {"$gte": 2020, "$in": ["1"]}}]
+    }
+    assert search.build_where([{"rating": {"$lt": "2.5"}}, {"$or": [{"a": "1"}]}]) == {
+        "$and": [{"rating": {"$lt": 2.5}}, {"$or": [{"a": "1"}]}]
+    }
@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from colorama import (
+    Fore,
+    Style
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional
+)
+from Athena.core.config import Config
+from Athena.core.db import DBManager
+from Athena.core.search import SearchEngine
+from Athena.core.asynchronous import (
+    AsyncGPTQuery,
+    AsyncRateLimiter,
+    AsyncSearchEngine
+)
+from Athena.common.logger import get_logger
+from Athena.common.types import (
+    QueryData,
+    InputTypes,
+    OutputTypes
+)
+
+CLEAR_STYLE = Style.RESET_ALL
+
+log = get_logger()
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        db: DBManager,
+        config: Config,
+        search_engine: SearchEngine,
+        schema_path: Optional[str] = None,
+        add_to_memory: bool = False
+    ) -> None:
+        """__init__ Initialises BatchRunner
+
+        Answers a whole JSONL file of queries (one {"query": ..., "id": ...}
+        object per line, "id" is optional). Up to `batch_concurrency`
+        questions are in flight at once, and every OpenAI request goes through
+        one shared rate limiter (`batch_requests_per_minute`).
+
+        Every question gets its own session, so the questions don't
+        see each other's memories. By default nothing is added to the memories.
+
+        Answers are written as JSONL in the order of the input. The output
+        file is always a complete prefix of the input, so an interrupted run
+        can be resumed by running it again with the same files (see resume()).
+
+        Args:
+            db (DBManager): DBManager
+            config (Config): Configuration
+            search_engine (SearchEngine): Search engine for VData
+            schema_path (Optional[str], optional): Path to JSON schema. Defaults to None.
+            add_to_memory (bool, optional): If questions and answers should be added to memories. Defaults to False.
+        """
+        self.db = db
+        self.config = config
+        self.search = AsyncSearchEngine(search_engine)
+        self.schema_path = schema_path
+        self.add_to_memory = add_to_memory
+        self.failed = 0
+
+    @staticmethod
+    def load_queries(path: str) -> List[Dict[str, Any]]:
+        """load_queries Loads the queries of a JSONL file
+
+        Args:
+            path (str): Path to the JSONL file
+
+        Raises:
+            ValueError: If a line has no query
+
+        Returns:
+            List[Dict[str, Any]]: One dictionary per query
+        """
+        queries = []
+        with open(path, "r", encoding="utf-8") as file:
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if isinstance(item, str):
+                    item = {'query': item}
+                if not isinstance(item, dict) or not item.get('query'):
+                    raise ValueError(f"Line {number} of '{path}' has no query.")
+                queries.append(item)
+        return queries
+
+    @staticmethod
+    def resume(
+        path: str,
+        queries: List[Dict[str, Any]]
+    ) -> int:
+        """resume Checks how many queries were already answered
+
+        Reads the output file of an earlier run and cuts off everything
+        after the last complete answer (like a half-written line).
+        The first failed query (its "error" is set) is cut off too, so
+        it gets asked again together with every query after it.
+
+        Args:
+            path (str): Path to the output file
+            queries (List[Dict[str, Any]]): Queries of the run
+
+        Raises:
+            ValueError: If the output file belongs to different queries
+
+        Returns:
+            int: Amount of answered queries
+        """
+        if not os.path.exists(path):
+            return 0
+
+        done = 0
+        valid_bytes = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not line.endswith(b"\n") or record.get('index') != done or record.get('error'):
+                    break
+                if done >= len(queries) or record.get('query') != queries[done]['query']:
+                    raise ValueError(f"'{path}' doesn't belong to these queries (line {done + 1}).")
+                done += 1
+                valid_bytes += len(line)
+
+        if valid_bytes < os.path.getsize(path):
+            with open(path, "r+b") as file:
+                file.truncate(valid_bytes)
+        return done
+
+    async def answer(
+        self,
+        index: int,
+        item: Dict[str, Any],
+        rate_limiter: AsyncRateLimiter
+    ) -> Dict[str, Any]:
+        """answer Answers a single query
+
+        Args:
+            index (int): Position of the query in the input
+            item (Dict[str, Any]): Query (and its id)
+            rate_limiter (AsyncRateLimiter): Shared rate limiter
+
+        Returns:
+            Dict[str, Any]: Output record
+        """
+        record: Dict[str, Any] = {
+            'index': index,
+            'id': item.get('id'),
+            'query': item['query']
+        }
+        start = time.perf_counter()
+        session_id = self.db.new_session()
+        gpt: Optional[AsyncGPTQuery] = None
+        try:
+            gpt = AsyncGPTQuery(
+                self.db,
+                QueryData(item['query'], None, context=self.db.query_context(item['query'])),
+                self.config,
+                self.schema_path,
+                search_engine=self.search,
+                session_id=session_id,
+                rate_limiter=rate_limiter
+            )
+            record['answer'] = await gpt.new_response(add_to_memory=self.add_to_memory)
+            record['error'] = None
+        except Exception as e:
+            self.failed += 1
+            log.info(f"answer: Query {index} failed ({e!r})")
+            record['answer'] = None
+            record['error'] = repr(e)
+        finally:
+            self.db.end_session(session_id)
+
+        result = gpt.data.result if gpt else None
+        record['retrieved_ids'] = [str(i) for i in result.ids] if result is not None else []
+        record['usage'] = gpt.usage if gpt else {}
+        record['cached'] = gpt.cached if gpt else False
+        record['prefix_tokens'] = gpt.template.prefix_tokens if gpt else None
+        record['timings'] = {**(gpt.timings if gpt else {}), 'request': (time.perf_counter() - start) * 1000}
+        return record
+
+    async def run(
+        self,
+        queries_path: str,
+        output_path: str
+    ) -> int:
+        """run Answers every query of a JSONL file
+
+        Args:
+            queries_path (str): Path to the JSONL file with the queries
+            output_path (str): Path to the JSONL output (continued if it exists)
+
+        Returns:
+            int: Amount of queries answered in this run
+        """
+        queries = self.load_queries(queries_path)
+        done = self.resume(output_path, queries)
+        if done:
+            print(f"{Fore.CYAN}Resuming after {done}/{len(queries)} answered queries{CLEAR_STYLE}")
+
+        rate_limiter = AsyncRateLimiter(self.config.batch_requests_per_minute)
+        todo = iter(range(done, len(queries)))
+        finished: Dict[int, Dict[str, Any]] = {}
+        next_index = done
+        start = time.perf_counter()
+
+        with open(output_path, "a", encoding="utf-8") as output:
+            def write_ready() -> None:
+                # answers finish out of order, but only complete prefixes get written
+                nonlocal next_index
+                while next_index in finished:
+                    output.write(json.dumps(finished.pop(next_index), ensure_ascii=False, default=str) + "\n")
+                    next_index += 1
+                output.flush()
+
+            async def worker() -> None:
+                for index in todo:
+                    finished[index] = await self.answer(index, queries[index], rate_limiter)
+                    write_ready()
+                    print(f"\r{Fore.GREEN}[{next_index}/{len(queries)}]{CLEAR_STYLE} answered", end="", flush=True)
+
+            workers = max(1, min(self.config.batch_concurrency, len(queries) - done))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        print()
+
+        answered = len(queries) - done
+        elapsed = time.perf_counter() - start
+        log.info(f"run: Answered {answered} queries ({self.failed} failed) in {elapsed:.1f} s")
+        print(
+            f"{Fore.CYAN}Answered {answered} queries in {elapsed:.1f} s "
+            f"({answered / elapsed if elapsed else 0:.2f} queries/s, {self.failed} failed){CLEAR_STYLE}"
+        )
+        return answered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Athena batch mode",
+        description="Answers every query of a JSONL file using the existing database"
+    )
+    parser.add_argument("queries", type=str, help="JSONL file with one {\"query\": ...} object per line")
+    parser.add_argument("output", type=str, help="JSONL file for the answers (continued if it exists)")
+    parser.add_argument("--schema", type=str, default=None, help="JSON schema for structured outputs")
+    parser.add_argument("--output-type", type=str, default=OutputTypes.MD.name, help="Type of output text")
+    parser.add_argument("--concurrency", type=int, default=None, help="Questions in flight at once")
+    parser.add_argument("--rpm", type=float, default=None, help="Max OpenAI requests per minute (0 = unlimited)")
+    parser.add_argument("--remember", action="store_true", help="Add questions and answers to the memories")
+    args = parser.parse_args()
+
+    cfg = Config(InputTypes.AUTO, OutputTypes[args.output_type])
+    if args.concurrency is not None:
+        cfg.batch_concurrency = args.concurrency
+    if args.rpm is not None:
+        cfg.batch_requests_per_minute = args.rpm
+
+    dbm = DBManager(config=cfg)
+    runner = BatchRunner(dbm, cfg, SearchEngine(cfg, dbm), args.schema, add_to_memory=args.remember)
+    asyncio.run(runner.run(args.queries, args.output))
+    dbm.chat_history.flush()
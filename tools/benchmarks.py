@@ -116,11 +116,16 @@ class Benchmark:
             for user_input in self.settings.user_inputs:
                 start = time.perf_counter()
                 
-                clean_results = self.search.search_collection(
-                    user_input
+                context = self.db.query_context(user_input)
+                query_data = QueryData(user_input, None, context=context)
+                gpt_response = GPTQuery(
+                    self.db, 
+                    query_data, 
+                    self.config, 
+                    self.settings.schema_path, 
+                    instant_request=True, 
+                    search_engine=self.search
                 )
-                query_data = QueryData(user_input, clean_results)
-                gpt_response = GPTQuery(self.db, query_data, self.config, self.settings.schema_path, instant_request=True)
                 
                 end = time.perf_counter()
                 